@@ -0,0 +1,562 @@
+"""
+Keywords benchmark against local Xena chassis emulator.
+
+Measures latency and number of chassis round trips per keyword, scaling with number of ports and end to end run of the
+samples suite so performance changes can be compared without chassis.
+
+Emulated network round trip time can be set with XENA_EMULATOR_LATENCY environment variable (seconds, default 0).
+Library import and creation time must be below XENA_STARTUP_THRESHOLD environment variable (seconds, default 1).
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import inspect
+import contextlib
+import subprocess
+import tempfile
+import unittest
+from collections import OrderedDict
+
+import robot
+from trafficgenerator.tgn_utils import TgnError
+
+from xenavalkyrie_robot.xena_robot import XenaRobot
+from xenavalkyrie_robot.xena_broker import XenaBroker
+from xenavalkyrie_robot.test.xena_emulator import XenaEmulator
+
+samples_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'samples')
+config_file = os.path.join(samples_dir, 'test_config.xpc')
+latency = float(os.environ.get('XENA_EMULATOR_LATENCY', 0))
+startup_threshold = float(os.environ.get('XENA_STARTUP_THRESHOLD', 1))
+
+# Measured in a fresh interpreter - library import, library object creation and keywords discovery (libdoc, dry-run).
+startup_script = '''
+import sys, time, json
+start = time.perf_counter()
+from xenavalkyrie_robot.xena_robot import XenaRobot
+imported = time.perf_counter()
+xena_robot = XenaRobot(api='socket', user='robot')
+created = time.perf_counter()
+from robot.running.testlibraries import TestLibrary
+keywords = len(TestLibrary.from_name('xenavalkyrie_robot.xena_robot.XenaRobot').keywords)
+discovered = time.perf_counter()
+heavy = ['pypacker', 'requests', 'xenavalkyrie.xena_app', 'xenavalkyrie.xena_tshark',
+         'xenavalkyrie.xena_statistics_view']
+print(json.dumps({'import': imported - start, 'create': created - imported, 'discover': discovered - created,
+                  'keywords': keywords, 'loaded': [m for m in heavy if m in sys.modules]}))
+'''
+
+# Parallel (pabot like) worker - argv: emulator port, worker index, broker address (empty - direct chassis session).
+worker_script = '''
+import sys, time, json
+from xenavalkyrie_robot.xena_robot import XenaRobot
+port, index, broker = int(sys.argv[1]), int(sys.argv[2]), sys.argv[3]
+start = time.perf_counter()
+xena_robot = XenaRobot(api='socket', user='worker_{}'.format(index), log_level='NONE', broker=broker or None)
+xena_robot.add_chassis('127.0.0.1', port)
+locations = ['127.0.0.1/{}/{}'.format(index // 8, 2 * (index % 8) + i) for i in range(2)]
+xena_robot.reserve_ports(*locations)
+xena_robot.load_configs(sys.argv[4])
+xena_robot.run_traffic_blocking()
+xena_robot.get_statistics('port')
+xena_robot.release_ports()
+print(json.dumps({'session': time.perf_counter() - start}))
+'''
+
+# Emulated chassis time of session commands, serialized between all chassis connections.
+broker_command_times = {'C_LOGON': 0.02, 'P_RESERVATION': 0.01}
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.emulator = XenaEmulator(latency=latency).start()
+        self.chassis = '127.0.0.1'
+        self.port0 = self.chassis + '/0/0'
+        self.port1 = self.chassis + '/0/1'
+
+    def tearDown(self):
+        self.emulator.stop()
+
+    def test_keywords(self):
+        """ Latency and round trips of each keyword, all public keywords must be measured. """
+        xena_robot = XenaRobot(api='socket', user='robot', instrumentation=True)
+        temp_dir = tempfile.mkdtemp()
+        cap_file = os.path.join(temp_dir, 'benchmark.pcap')
+        modifier = {'position': 4, 'min_val': 10, 'max_val': 20}
+        # Label is keyword name, optionally followed by ' - variant'.
+        keywords = OrderedDict([
+            ('Add Chassis', lambda: xena_robot.add_chassis(self.chassis, self.emulator.port)),
+            ('Add Chassis List', lambda: xena_robot.add_chassis_list(self.chassis, port=self.emulator.port)),
+            ('Reserve Ports', lambda: xena_robot.reserve_ports(self.port0, self.port1)),
+            ('Reserve Ports By Force', lambda: xena_robot.reserve_ports_by_force(self.port0, self.port1)),
+            ('Load Config', lambda: xena_robot.load_config(self.port0, config_file)),
+            ('Load Config Incremental', lambda: xena_robot.load_config_incremental(self.port0, config_file)),
+            ('Load Configs', lambda: xena_robot.load_configs(config_file)),
+            ('Save Config', lambda: xena_robot.save_config(self.port0, os.path.join(temp_dir, 'benchmark.xpc'))),
+            ('Save Configs', lambda: xena_robot.save_configs(os.path.join(temp_dir, 'benchmark_{}.xpc'))),
+            ('Get Port Attribute', lambda: xena_robot.get_port_attribute(self.port0, 'p_txmode')),
+            ('Get Port Attributes', lambda: xena_robot.get_port_attributes(self.port0, 'p_speed', 'p_comment')),
+            ('Set Port Attributes', lambda: xena_robot.set_port_attributes(self.port0, p_comment='"bench"')),
+            ('Exec Port Command', lambda: xena_robot.exec_port_command(self.port0, 'p_comment', '?')),
+            ('Get Stream Attribute', lambda: xena_robot.get_stream_attribute(self.port0, '0', 'ps_packetlimit')),
+            ('Get Stream Attributes', lambda: xena_robot.get_stream_attributes(self.port0, '0', 'ps_packetlimit',
+                                                                               'ps_comment')),
+            ('Set Stream Attributes', lambda: xena_robot.set_stream_attributes(self.port0, '0',
+                                                                               ps_packetlimit=100)),
+            ('Exec Stream Command', lambda: xena_robot.exec_stream_command(self.port0, '0', 'ps_comment', '?')),
+            ('Get Supported Packet Headers', lambda: xena_robot.get_supported_packet_headers()),
+            ('Get Packet', lambda: xena_robot.get_packet(self.port0, '1')),
+            ('Get Packet Headers', lambda: xena_robot.get_packet_headers(self.port0, '1')),
+            ('Get Packet Header', lambda: xena_robot.get_packet_header(self.port0, '1', 'IP6')),
+            ('Set Packet Header Fields', lambda: xena_robot.set_packet_header_fields(self.port0, '1', 'IP6',
+                                                                                     src_s='11::11')),
+            ('Edit Packet', lambda: xena_robot.edit_packet(self.port0, '1', 'ethernet:dst_s=22:22:22:22:22:22')),
+            ('Begin Packet Edit', lambda: xena_robot.begin_packet_edit(self.port0, '1')),
+            ('Edit Packet - in edit', lambda: xena_robot.edit_packet(self.port0, '1',
+                                                                     'ethernet:dst_s=33:33:33:33:33:33')),
+            ('Commit Packet Edit', lambda: xena_robot.commit_packet_edit(self.port0, '1')),
+            ('Begin Packet Edit - to abort', lambda: xena_robot.begin_packet_edit(self.port0, '1')),
+            ('Abort Packet Edit', lambda: xena_robot.abort_packet_edit(self.port0, '1')),
+            ('Get Modifier', lambda: xena_robot.get_modifier(self.port0, '0', '0')),
+            ('Get Modifiers', lambda: xena_robot.get_modifiers(self.port0, '0')),
+            ('Set Modifiers', lambda: xena_robot.set_modifiers(self.port0, '0', modifier, modifier)),
+            ('Reset Port', lambda: xena_robot.reset_port(self.port1)),
+            ('Add Stream', lambda: xena_robot.add_stream(self.port1, 'bench')),
+            ('Add Streams', lambda: xena_robot.add_streams(self.port1, 16, 'ip udp', 'ip:src_s=10.0.0.1+1',
+                                                           modifiers=[modifier])),
+            ('Add Packet Headers', lambda: xena_robot.add_packet_headers(self.port1, '0', 'ip', 'udp')),
+            ('Add Modifier', lambda: xena_robot.add_modifier(self.port1, '0', '4')),
+            ('Set Modifier Attributes', lambda: xena_robot.set_modifier_attributes(self.port1, '0', '0',
+                                                                                   min_val='10', max_val='20')),
+            ('Remove Modifier', lambda: xena_robot.remove_modifier(self.port1, '1', '0')),
+            ('Clear Statistics', lambda: xena_robot.clear_statistics()),
+            ('Start Capture', lambda: xena_robot.start_capture(self.port1)),
+            ('Start Statistics Sampling', lambda: xena_robot.start_statistics_sampling(0.01, 'port')),
+            ('Start Traffic', lambda: xena_robot.start_traffic()),
+            ('Wait For Traffic', lambda: xena_robot.wait_for_traffic()),
+            ('Stop Traffic', lambda: xena_robot.stop_traffic()),
+            ('Run Traffic Blocking', lambda: xena_robot.run_traffic_blocking()),
+            ('Stop Statistics Sampling', lambda: xena_robot.stop_statistics_sampling()),
+            ('Get Statistics Samples', lambda: xena_robot.get_statistics_samples('port', self.port0,
+                                                                                 'pt_total_packets')),
+            ('Get Statistics Summary', lambda: xena_robot.get_statistics_summary('port', self.port0,
+                                                                                 'pt_total_packets')),
+            ('Stop Capture', lambda: xena_robot.stop_capture(self.port1)),
+            ('Get Statistics - port', lambda: xena_robot.get_statistics('port')),
+            ('Get Statistics - stream', lambda: xena_robot.get_statistics('stream')),
+            ('Get Statistics - tpld', lambda: xena_robot.get_statistics('tpld')),
+            ('Get Statistics For', lambda: xena_robot.get_statistics_for('port', self.port0, 'pt_total_packets')),
+            ('Save Capture To File', lambda: xena_robot.save_capture_to_file(self.port1, cap_file, 'pcap')),
+            ('Save Captures To Files', lambda: xena_robot.save_captures_to_files(
+                os.path.join(temp_dir, 'benchmark_{}.pcapng'), self.port1)),
+            ('Create Tshark', lambda: xena_robot.create_tshark(temp_dir)),
+            ('Analyze Packets', lambda: xena_robot.analyze_packets(cap_file, 'ipv6.src')),
+            ('Send Command', lambda: xena_robot.send_command(self.chassis, '0/0 p_comment "bench"')),
+            ('Send Command Return', lambda: xena_robot.send_command_return(self.chassis, '0/0 p_comment ?')),
+            ('Send Command Return Multilines', lambda: xena_robot.send_command_return_multilines(
+                self.chassis, '0/0 p_info ?')),
+            ('Send Commands', lambda: xena_robot.send_commands(self.chassis, '0/0 p_comment "bench"',
+                                                               '0/1 p_comment "bench"')),
+            ('Send Commands Return', lambda: xena_robot.send_commands_return(self.chassis, '0/0 p_comment ?',
+                                                                             '0/1 p_comment ?')),
+            ('Get Attributes Cache Counters', lambda: xena_robot.get_attributes_cache_counters()),
+            ('Get Performance Report', lambda: xena_robot.get_performance_report()),
+            ('Remove Stream', lambda: xena_robot.remove_stream(self.port1, '0')),
+            ('Release Ports', lambda: xena_robot.release_ports()),
+        ])
+        public = set(name for name, _ in inspect.getmembers(XenaRobot, inspect.isfunction)
+                     if not name.startswith('_'))
+        measured = set(label.split(' - ')[0].lower().replace(' ', '_') for label in keywords)
+        self.assertEqual(public - measured, set(), 'Keywords missing from benchmark')
+        self.assertEqual(measured - public, set(), 'Benchmark labels that are not keywords')
+        results = OrderedDict()
+        for keyword, run_keyword in keywords.items():
+            results[keyword] = self._measure(run_keyword)
+        self._report('keywords (emulated latency {} seconds)'.format(latency), results)
+        self.assertEqual(results['Analyze Packets'][1], 0)
+        self.assertEqual(results['Get Performance Report'][1], 0)
+
+    def test_instrumentation(self):
+        """ Instrumentation counters should match the chassis counters. """
+        xena_robot = XenaRobot(api='socket', user='robot', instrumentation=True)
+        xena_robot.add_chassis(self.chassis, self.emulator.port)
+        xena_robot.reserve_ports(self.port0, self.port1)
+        before = self.emulator.get_counters()
+        xena_robot.load_configs(config_file)
+        xena_robot.get_statistics('port')
+        after = self.emulator.get_counters()
+        report = xena_robot.get_performance_report(reset=True)
+        self.assertEqual(report['Load Configs']['calls'], 1)
+        self.assertNotIn('Load Config', report)
+        self.assertEqual(report['Load Configs']['commands'] + report['Get Statistics']['commands'],
+                         after['commands'] - before['commands'])
+        self.assertEqual(report['Load Configs']['bytes_sent'] + report['Get Statistics']['bytes_sent'],
+                         after['bytes_received'] - before['bytes_received'])
+        self.assertFalse(xena_robot.get_performance_report())
+        with self.assertRaises(ValueError):
+            XenaRobot(api='socket', user='robot').get_performance_report()
+
+    def test_load_configs(self):
+        """ Load Configs on ports of one chassis - real sequential run versus concurrent run, commands are pipelined. """
+        xena_robot = XenaRobot(api='socket', user='robot')
+        xena_robot.add_chassis(self.chassis, self.emulator.port)
+        ports = ['{}/0/{}'.format(self.chassis, index) for index in range(4)]
+        xena_robot.reserve_ports(*ports)
+        results = OrderedDict()
+        results['Load Configs - 1 worker'] = self._measure(lambda: xena_robot.load_configs(config_file, workers=1))
+        results['Load Configs - 8 workers'] = self._measure(lambda: xena_robot.load_configs(config_file, workers=8))
+        self._report('load configs - {} ports'.format(len(ports)), results)
+        self.assertLessEqual(results['Load Configs - 1 worker'][1], 2 * len(ports))
+        self.assertLessEqual(results['Load Configs - 8 workers'][1], 2 * len(ports))
+        self.assertEqual(xena_robot.get_stream_attribute(ports[3], '1', 'ps_packetlimit'), '8000')
+
+    def test_load_config_incremental(self):
+        """ Reload of the same configuration should skip all commands. """
+        xena_robot = XenaRobot(api='socket', user='robot')
+        xena_robot.add_chassis(self.chassis, self.emulator.port)
+        xena_robot.reserve_ports(self.port0, self.port1)
+        results = OrderedDict()
+        results['full'] = self._measure(lambda: xena_robot.load_config(self.port0, config_file))
+        self.assertEqual(xena_robot.load_config_incremental(self.port0, config_file)['sent'], 0)
+        results['incremental - same'] = self._measure(lambda: xena_robot.load_config_incremental(self.port0,
+                                                                                                 config_file))
+        xena_robot.set_stream_attributes(self.port0, '0', ps_packetlimit='100')
+        self.assertEqual(xena_robot.load_config_incremental(self.port0, config_file)['mode'], 'full')
+        xena_robot.set_stream_attributes(self.port0, '0', ps_packetlimit='100')
+        result = xena_robot.load_config_incremental(self.port0, config_file, refresh=True)
+        self.assertEqual(result['mode'], 'incremental')
+        self.assertEqual(result['sent'], 1)
+        self.assertEqual(xena_robot.get_stream_attribute(self.port0, '0', 'ps_packetlimit'), '8000')
+        self.assertEqual(xena_robot.load_config_incremental(self.port1, config_file)['mode'], 'full')
+        xena_robot.set_stream_attributes(self.port0, '1', ps_ratepps='10')
+        results['incremental - refresh'] = self._measure(lambda: xena_robot.load_config_incremental(
+            self.port0, config_file, refresh=True))
+        self._report('load config incremental', results)
+        self.assertEqual(results['incremental - same'][1], 0)
+
+    def test_attributes_cache(self):
+        """ Attributes cache and Get Port/Stream Attributes versus single attribute reads. """
+        xena_robot = XenaRobot(api='socket', user='robot', attributes_cache_ttl=60)
+        xena_robot.add_chassis(self.chassis, self.emulator.port)
+        xena_robot.reserve_ports(self.port0)
+        xena_robot.load_config(self.port0, config_file)
+        port_attributes = ['p_speed', 'p_txmode', 'p_comment', 'p_ipaddress']
+        stream_attributes = ['ps_packetlimit', 'ps_ratepps', 'ps_comment', 'ps_enable']
+
+        results = OrderedDict()
+        results['Get Port Attribute x 4'] = self._measure(
+            lambda: [xena_robot.get_port_attribute(self.port0, attribute) for attribute in port_attributes])
+        xena_robot.load_config(self.port0, config_file)
+        results['Get Port Attributes'] = self._measure(
+            lambda: xena_robot.get_port_attributes(self.port0, *port_attributes))
+        results['Get Port Attributes - cached'] = self._measure(
+            lambda: xena_robot.get_port_attributes(self.port0, *port_attributes))
+        results['Get Stream Attributes'] = self._measure(
+            lambda: xena_robot.get_stream_attributes(self.port0, '0', *stream_attributes))
+        results['Get Stream Attribute - cached'] = self._measure(
+            lambda: xena_robot.get_stream_attribute(self.port0, '0', 'ps_packetlimit'))
+        self._report('attributes cache', results)
+        self.assertEqual(results['Get Port Attributes'][1], 1)
+        self.assertEqual(results['Get Port Attributes - cached'][1], 0)
+        self.assertEqual(results['Get Stream Attribute - cached'][1], 0)
+
+        attributes = xena_robot.get_port_attributes(self.port0, *port_attributes)
+        self.assertEqual(attributes['p_comment'], xena_robot.get_port_attribute(self.port0, 'p_comment'))
+        self.assertNotIn('"', attributes['p_comment'])
+        xena_robot.set_stream_attributes(self.port0, '0', ps_packetlimit='123')
+        self.assertEqual(xena_robot.get_stream_attribute(self.port0, '0', 'ps_packetlimit'), '123')
+        xena_robot.send_command(self.chassis, '0/0 p_comment "changed"')
+        self.assertEqual(xena_robot.get_port_attributes(self.port0, 'p_comment')['p_comment'], 'changed')
+        xena_robot.get_port_attribute(self.port0, 'p_traffic')
+        self.assertEqual(xena_robot.get_port_attribute(self.port0, 'p_traffic').lower(), 'off')
+        counters = xena_robot.get_attributes_cache_counters(reset=True)
+        self.assertEqual(counters['hits'], 10)
+        self.assertEqual(xena_robot.get_attributes_cache_counters()['hits'], 0)
+        self.assertRaises(TgnError, xena_robot.get_port_attributes, self.port0, 'p_nosuchattribute')
+
+    def test_packet_headers(self):
+        """ Get Packet Headers versus Get Packet Header per header, decoded headers cache. """
+        xena_robot = XenaRobot(api='socket', user='robot')
+        xena_robot.add_chassis(self.chassis, self.emulator.port)
+        xena_robot.reserve_ports(self.port0)
+        xena_robot.load_config(self.port0, config_file)
+        names = ['ethernet', 'vlan[0]', 'ip6', 'tcp']
+        results = OrderedDict()
+        results['Get Packet Header x 4'] = self._measure(
+            lambda: [xena_robot.get_packet_header(self.port0, '1', name) for name in names])
+        xena_robot.load_config(self.port0, config_file)
+        results['Get Packet Headers'] = self._measure(lambda: xena_robot.get_packet_headers(self.port0, '1'))
+        results['Get Packet Headers - cached'] = self._measure(lambda: xena_robot.get_packet_headers(self.port0, '1'))
+        self._report('packet headers', results)
+        self.assertEqual(results['Get Packet Headers - cached'][1], 0)
+
+        headers = xena_robot.get_packet_headers(self.port0, '1')
+        self.assertEqual(list(headers), names)
+        self.assertEqual(headers['tcp'], xena_robot.get_packet_header(self.port0, '1', 'TCP'))
+        self.assertNotIn('vlan', headers['ethernet'])
+        xena_robot.edit_packet(self.port0, '1', 'ip6:src_s=11::11', 'tcp:sport=1234')
+        headers = xena_robot.get_packet_headers(self.port0, '1')
+        self.assertEqual(headers['ip6']['src'], '11::11')
+        self.assertEqual(headers['tcp']['sport'], '1234')
+        xena_robot.send_command(self.chassis, '0/0 ps_packetheader [1] 0x{}'.format('00' * 64))
+        self.assertEqual(xena_robot.get_packet_header(self.port0, '1', 'ethernet')['dst'], '00:00:00:00:00:00')
+        xena_robot.load_config(self.port0, config_file)
+        self.assertRaises(ValueError, xena_robot.get_packet_header, self.port0, '1', 'udp')
+
+    def test_modifiers(self):
+        """ Get/Set Modifiers versus per modifier keywords on stream with 10 modifiers. """
+        xena_robot = XenaRobot(api='socket', user='robot')
+        xena_robot.add_chassis(self.chassis, self.emulator.port)
+        xena_robot.reserve_ports(self.port0)
+        stream = str(xena_robot.add_stream(self.port0, 'modifiers'))
+        modifiers = [{'position': 4 * index, 'min_val': index, 'max_val': 100 + index} for index in range(10)]
+        modifiers.append({'type': 'extended', 'position': 40, 'mask': '0xFFFFFFFF', 'action': 'random'})
+
+        results = OrderedDict()
+        results['Set Modifiers'] = self._measure(lambda: xena_robot.set_modifiers(self.port0, stream, *modifiers))
+        results['Get Modifiers'] = self._measure(lambda: xena_robot.get_modifiers(self.port0, stream))
+        results['Get Modifier x 10'] = self._measure(
+            lambda: [xena_robot.get_modifier(self.port0, stream, str(index)) for index in range(10)])
+        results['Set Modifier Attributes x 10'] = self._measure(
+            lambda: [xena_robot.set_modifier_attributes(self.port0, stream, str(index), max_val=str(200 + index))
+                     for index in range(10)])
+        self._report('modifiers', results)
+        self.assertLessEqual(results['Set Modifiers'][1], 2)
+        self.assertLessEqual(results['Get Modifiers'][1], 2)
+
+        result = xena_robot.get_modifiers(self.port0, stream)
+        self.assertEqual(len(result), 11)
+        self.assertEqual([m['max_val'] for m in result[:10]], [200 + index for index in range(10)])
+        self.assertEqual(result[3]['position'], 12)
+        self.assertEqual(result[3]['action'], 'increment')
+        self.assertEqual(result[10]['type'], 'extended')
+        self.assertEqual(result[10]['action'], 'random')
+        self.assertNotIn('max_val', result[10])
+        xena_robot.set_modifiers(self.port0, stream, *result[:2])
+        self.assertEqual(xena_robot.get_modifiers(self.port0, stream), result[:2] + result[10:])
+        self.assertEqual(xena_robot.get_modifier(self.port0, stream, '1')['max_val'], 201)
+        xena_robot.set_modifiers(self.port0, stream, dict(result[10], action='decrement'))
+        self.assertEqual([m['action'] for m in xena_robot.get_modifiers(self.port0, stream)],
+                         ['increment', 'increment', 'decrement'])
+
+    def test_add_streams(self):
+        """ Bulk stream creation versus per stream keywords. """
+        xena_robot = XenaRobot(api='socket', user='robot')
+        xena_robot.add_chassis(self.chassis, self.emulator.port)
+        xena_robot.reserve_ports(self.port0)
+
+        def add_streams_one_by_one(count):
+            for index in range(count):
+                stream = str(xena_robot.add_stream(self.port0, 'single {}'.format(index)))
+                xena_robot.set_stream_attributes(self.port0, stream, ps_packetlimit='80')
+                xena_robot.add_packet_headers(self.port0, stream, 'vlan', 'ip', 'udp')
+                xena_robot.edit_packet(self.port0, stream, 'vlan[0]:vid={}'.format(100 + index),
+                                       'ip:src_s=10.0.0.{}'.format(1 + index))
+                xena_robot.add_modifier(self.port0, stream, '4')
+
+        results = OrderedDict()
+        results['one by one - 10 streams'] = self._measure(lambda: add_streams_one_by_one(10))
+        bulk = {}
+        results['add streams - 1000 streams'] = self._measure(lambda: bulk.update(xena_robot.add_streams(
+            self.port0, 1000, 'vlan ip udp', 'vlan[0]:vid=100+1', 'ip:src_s=10.0.0.1+1', 'ip:ttl=32',
+            name='bulk {}', modifiers=['4'], ps_packetlimit='80')))
+        self._report('add streams', results)
+        print('add streams - {:.0f} streams per second'.format(bulk['streams_per_second']))
+
+        self.assertEqual(bulk['indices'], list(range(10, 1010)))
+        self.assertEqual(xena_robot.get_stream_attribute(self.port0, 'bulk 1009', 'ps_packetlimit'), '80')
+        self.assertEqual(int(xena_robot.get_packet_header(self.port0, '1009', 'vlan[0]')['tci'], 0), 1099)
+        self.assertEqual(xena_robot.get_packet_header(self.port0, '1009', 'ip')['src'], '10.0.3.232')
+        self.assertEqual(xena_robot.get_modifier(self.port0, '1009', '0')['max_val'], 65535)
+        self.assertLess(results['add streams - 1000 streams'][1], results['one by one - 10 streams'][1])
+
+        # Pending packet edits of existing streams survive stream creation.
+        xena_robot.begin_packet_edit(self.port0, '0')
+        xena_robot.edit_packet(self.port0, '0', 'ip:src_s=9.9.9.9')
+        self.assertEqual(xena_robot.add_streams(self.port0, 2, 'ip', name='more {}')['indices'], [1010, 1011])
+        xena_robot.commit_packet_edit(self.port0, '0')
+        self.assertEqual(xena_robot.get_packet_header(self.port0, '0', 'ip')['src'], '9.9.9.9')
+        self.assertEqual(xena_robot.get_stream_attribute(self.port0, 'more 1011', 'ps_comment'), 'more 1011')
+
+    def test_wait_for_traffic(self):
+        """ Wait For Traffic returns per port stop times and statistics snapshots. """
+        self.emulator.traffic_time_scale = 0.1
+        xena_robot = XenaRobot(api='socket', user='robot')
+        xena_robot.add_chassis(self.chassis, self.emulator.port)
+        xena_robot.reserve_ports(self.port0, self.port1)
+        xena_robot.load_configs(config_file)
+        for stream in ['0', '1']:
+            xena_robot.set_stream_attributes(self.port1, stream, ps_packetlimit='2000')
+
+        xena_robot.start_traffic()
+        result = xena_robot.wait_for_traffic(views='port', snapshot_interval=0.2)
+        print('stop times - {}, snapshots - {}'.format(dict(result['stop_times']), len(result['snapshots'])))
+        self.assertLess(result['stop_times'][self.port1], result['stop_times'][self.port0])
+        times = [snapshot['time'] for snapshot in result['snapshots']]
+        self.assertTrue(times)
+        self.assertEqual(times, sorted(times))
+        self.assertEqual(result['snapshots'][-1]['port'][self.port0]['pt_total']['packets'], 16000)
+
+        xena_robot.start_traffic(self.port0)
+        with self.assertRaises(TgnError):
+            xena_robot.wait_for_traffic(self.port0, timeout=0.3)
+        xena_robot.stop_traffic(self.port0)
+
+    def test_ports_scale(self):
+        """ Reserve, load config and read statistics on 1, 16 and 128 ports - round trips per port should be flat. """
+        self.emulator.stop()
+        self.emulator = XenaEmulator(latency=latency, modules=8, ports_per_module=16).start()
+        results = OrderedDict()
+        for num_ports in [1, 16, 128]:
+            xena_robot = XenaRobot(api='socket', user='robot_{}'.format(num_ports))
+            xena_robot.add_chassis(self.chassis, self.emulator.port)
+            locations = ['{}/{}/{}'.format(self.chassis, index // 16, index % 16) for index in range(num_ports)]
+
+            def scale_flow():
+                xena_robot.reserve_ports(*locations)
+                xena_robot.load_configs(config_file)
+                xena_robot.get_statistics('port')
+                xena_robot.release_ports()
+
+            elapsed, round_trips, commands = self._measure(scale_flow)
+            results['{} ports'.format(num_ports)] = (elapsed, round_trips, commands)
+            results['{} ports - per port'.format(num_ports)] = (elapsed / num_ports, round_trips / num_ports,
+                                                                 commands / num_ports)
+        self._report('ports scale', results)
+        for num_ports in [1, 16, 128]:
+            print('{} ports - {:.1f} ports per second'.format(num_ports,
+                                                             num_ports / results['{} ports'.format(num_ports)][0]))
+        self.assertLessEqual(results['128 ports - per port'][1], results['1 ports - per port'][1] * 1.5)
+
+    def test_samples_suite(self):
+        """ Run the samples robot suite end to end against the emulator. """
+        out_dir = tempfile.mkdtemp()
+        suite = os.path.join(out_dir, 'xena_samples.robot')
+        with open(os.path.join(samples_dir, 'xena_samples.robot')) as f:
+            text = f.read()
+        report = os.path.join(out_dir, 'performance.json').replace('\\', '/')
+        text = re.sub(r'(Library\s+)xenavalkyrie\.xena_robot(.*)',
+                      r'\1xenavalkyrie_robot.xena_robot\2    performance_report={}'.format(report), text)
+        text = text.replace('${CURDIR}', samples_dir.replace('\\', '/'))
+        with open(suite, 'w') as f:
+            f.write(text)
+        variables = ['CHASSIS:{}'.format(self.chassis), 'CHASSIS_PORT:{}'.format(self.emulator.port),
+                     'CAP_FILE:{}'.format(os.path.join(out_dir, 'samples.pcap'))]
+        elapsed, round_trips, commands = self._measure(
+            lambda: self.assertEqual(robot.run(suite, outputdir=out_dir, variable=variables, stdout=open(
+                os.devnull, 'w')), 0, 'samples suite failed, see {}'.format(out_dir)))
+        self._report('samples suite', {'samples suite': (elapsed, round_trips, commands)})
+        with open(report) as f:
+            keywords = json.load(f)
+        self.assertEqual(keywords['Load Configs']['calls'], 1)
+        self.assertLessEqual(sum(k['commands'] for k in keywords.values()), commands)
+
+    def test_logging(self):
+        """ Keywords overhead with logging off, INFO and DEBUG (sync, async and rate limited). """
+        modes = OrderedDict([('warm up', {'log_level': 'NONE'}),
+                             ('NONE', {'log_level': 'NONE'}),
+                             ('INFO', {'log_level': 'INFO'}),
+                             ('DEBUG', {'log_level': 'DEBUG'}),
+                             ('DEBUG async', {'log_level': 'DEBUG', 'async_logging': True}),
+                             ('DEBUG rate 100', {'log_level': 'DEBUG', 'debug_rate': 100})])
+        results = OrderedDict()
+        log_file = os.path.join(tempfile.mkdtemp(), 'benchmark.log')
+        with open(log_file, 'w') as log, contextlib.redirect_stdout(log):
+            for mode, arguments in modes.items():
+                xena_robot = XenaRobot(api='socket', user='robot', **arguments)
+                xena_robot.add_chassis(self.chassis, self.emulator.port)
+                xena_robot.reserve_ports(self.port0)
+
+                def keywords_flow():
+                    xena_robot.load_config(self.port0, config_file)
+                    xena_robot.add_streams(self.port0, 100, 'ip udp', 'ip:src_s=1.1.1.1+1')
+                    for _ in range(100):
+                        xena_robot.get_port_attribute(self.port0, 'p_txmode')
+                    xena_robot.get_statistics('stream')
+
+                results[mode] = self._measure(keywords_flow)
+                xena_robot.release_ports()
+        XenaRobot(api='socket', user='robot', log_level='NONE')
+        self._report('logging', results)
+        self.assertEqual(len(set((round_trips, commands) for _, round_trips, commands in results.values())), 1)
+
+    def test_broker(self):
+        """ Parallel workers (two suites each) with direct chassis sessions and through the session broker. """
+        self.emulator.stop()
+        self.emulator = XenaEmulator(latency=latency, command_times=broker_command_times).start()
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        results = OrderedDict()
+        sessions = OrderedDict()
+        workers_counts = [1, 2, 4, 8, 16]
+        for num_workers in workers_counts:
+            for mode in ['direct', 'broker']:
+                broker = XenaBroker().start() if mode == 'broker' else None
+                address = '127.0.0.1:{}'.format(broker.port) if broker else ''
+                outputs = []
+
+                def parallel_flow():
+                    for _ in range(2):
+                        workers = [subprocess.Popen([sys.executable, '-c', worker_script, str(self.emulator.port),
+                                                     str(index), address, config_file], env=env,
+                                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                                   for index in range(num_workers)]
+                        outputs.extend((w.communicate()[0], w.returncode) for w in workers)
+
+                name = '{} workers - {}'.format(num_workers, mode)
+                results[name] = self._measure(parallel_flow)
+                self.assertEqual([code for _, code in outputs], [0] * len(outputs))
+                sessions[name] = sum(json.loads(out.decode().splitlines()[-1])['session'] for out, _ in outputs)
+                sessions[name] /= len(outputs)
+                if broker:
+                    counters = broker.get_counters()
+                    broker.stop()
+                    self.assertEqual(counters['chassis'], 1)
+                    self.assertEqual(counters['leases'], 0)
+                    self.assertEqual(counters['reserved'], 2 * num_workers)
+        self._report('broker', results)
+        for name, session in sessions.items():
+            print('{} - {:.1f} msec mean worker session'.format(name, session * 1000))
+        for num_workers in workers_counts:
+            direct, broker = [results['{} workers - {}'.format(num_workers, mode)] for mode in ['direct', 'broker']]
+            print('{} workers - broker {:.2f}x elapsed, {:.2f}x round trips of direct'.format(
+                num_workers, broker[0] / direct[0], broker[1] / direct[1]))
+        self.assertLess(results['8 workers - broker'][2], results['8 workers - direct'][2])
+        self.assertTrue(all(port.reserved_by is None for port in self.emulator.ports.values()))
+
+    def test_startup(self):
+        """ Library import and creation must not load heavy subsystems or create the session. """
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        runs = [json.loads(subprocess.check_output([sys.executable, '-c', startup_script], env=env,
+                                                   stderr=subprocess.DEVNULL).decode().splitlines()[-1])
+                for _ in range(3)]
+        best = {phase: min(run[phase] for run in runs) for phase in ['import', 'create', 'discover']}
+        self._report('startup', OrderedDict((phase, (elapsed, 0, 0)) for phase, elapsed in best.items()))
+        self.assertEqual(runs[0]['loaded'], [])
+        self.assertGreater(runs[0]['keywords'], 0)
+        self.assertLess(best['import'] + best['create'], startup_threshold)
+
+    #
+    # Private methods.
+    #
+
+    def _measure(self, operation):
+        """
+        :return: (elapsed time, number of round trips, number of commands).
+        """
+        before = self.emulator.get_counters()
+        start = time.perf_counter()
+        operation()
+        elapsed = time.perf_counter() - start
+        after = self.emulator.get_counters()
+        return elapsed, after['round_trips'] - before['round_trips'], after['commands'] - before['commands']
+
+    @staticmethod
+    def _report(title, results):
+        print('\nBenchmark - {}'.format(title))
+        print('{:<32}{:>12}{:>14}{:>12}'.format('', 'msec', 'round trips', 'commands'))
+        for name, (elapsed, round_trips, commands) in results.items():
+            print('{:<32}{:>12.2f}{:>14.1f}{:>12.1f}'.format(name, elapsed * 1000, round_trips, commands))
@@ -0,0 +1,92 @@
+"""
+Tests for chassis session broker against local Xena chassis emulator.
+"""
+
+import unittest
+
+from trafficgenerator.tgn_utils import TgnError
+
+from xenavalkyrie_robot.xena_robot import XenaRobot
+from xenavalkyrie_robot.xena_broker import XenaBroker
+from xenavalkyrie_robot.test.xena_emulator import XenaEmulator
+
+
+class BrokerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.emulator = XenaEmulator().start()
+        self.broker = XenaBroker(connections=1).start()
+        self.broker_address = '127.0.0.1:{}'.format(self.broker.port)
+        self.port0 = '127.0.0.1/0/0'
+        self.port1 = '127.0.0.1/0/1'
+
+    def tearDown(self):
+        self.broker.stop()
+        self.emulator.stop()
+
+    def test_shared_connection(self):
+        worker1 = self._worker('worker1')
+        worker2 = self._worker('worker2')
+        worker1.reserve_ports(self.port0)
+        worker2.reserve_ports(self.port1)
+        worker1.set_port_attributes(self.port0, p_comment='"worker1"')
+        worker2.set_port_attributes(self.port1, p_comment='"worker2"')
+        self.assertEqual(worker2.get_port_attribute(self.port1, 'p_comment').strip('"'), 'worker2')
+        self.assertEqual(self.emulator.ports['0/0'].attributes['P_COMMENT'], '"worker1"')
+        counters = self.broker.get_counters()
+        self.assertEqual(counters['sessions'], 2)
+        self.assertEqual(counters['chassis'], 1)
+        self.assertEqual(counters['connections'], 1)
+        self.assertEqual(counters['leases'], 2)
+        self.assertEqual(self.emulator.ports['0/0'].reserved_by, 'xena_broker')
+
+    def test_leases(self):
+        worker1 = self._worker('worker1')
+        worker2 = self._worker('worker2')
+        worker1.reserve_ports(self.port0)
+        self.assertRaises(TgnError, worker2.reserve_ports, self.port0)
+        worker2.reserve_ports_by_force(self.port0)
+        self.assertRaises(Exception, worker1.set_port_attributes, self.port0, p_comment='"worker1"')
+        worker2.set_port_attributes(self.port0, p_comment='"worker2"')
+        worker2.release_ports()
+        counters = self.broker.get_counters()
+        self.assertEqual(counters['leases'], 0)
+        self.assertEqual(counters['reserved'], 1)
+        worker1.reserve_ports(self.port0)
+        self.assertEqual(self.broker.get_counters()['leases'], 1)
+        self.broker.stop()
+        self.assertIsNone(self.emulator.ports['0/0'].reserved_by)
+
+    def test_traffic(self):
+        worker = self._worker('worker')
+        worker.reserve_ports(self.port0, self.port1)
+        worker.add_stream(self.port0)
+        worker.set_stream_attributes(self.port0, '0', ps_packetlimit=100)
+        worker.run_traffic_blocking()
+        self.assertEqual(int(worker.get_statistics('port')[self.port1]['pr_total']['packets']), 100)
+
+    def test_module_and_chassis_commands(self):
+        worker1 = self._worker('worker1')
+        worker2 = self._worker('worker2')
+        self.emulator.ports_per_module = 2
+        worker1.reserve_ports(self.port0)
+        worker2.reserve_ports(self.port1)
+        commands = ['0 m_comment "worker1"', 'c_comment "worker1"', '0 m_portcount ?']
+        self.assertEqual(worker1.send_commands_return('127.0.0.1', *commands, fail_on_error=False),
+                         ['<NOTRESERVED>', '<NOTVALID>', '0  M_PORTCOUNT  2'])
+        worker2.release_ports()
+        worker1.reserve_ports(self.port0, self.port1)
+        self.assertEqual(worker1.send_commands_return('127.0.0.1', '0 m_comment "worker1"'), ['<OK>'])
+
+    def test_logoff_in_batch(self):
+        worker = self._worker('worker')
+        worker.reserve_ports(self.port0)
+        replies = worker.send_commands_return('127.0.0.1', '0/0 p_comment "a"', '0/0 p_comment ?', 'c_logoff',
+                                              '0/0 p_comment ?', fail_on_error=False)
+        self.assertEqual(replies, ['<OK>', '0/0  P_COMMENT  "a"', '<OK>', '<NOTLOGGEDON>'])
+        self.assertEqual(self.broker.get_counters()['leases'], 0)
+
+    def _worker(self, user):
+        worker = XenaRobot(api='socket', user=user, log_level='NONE', broker=self.broker_address)
+        worker.add_chassis('127.0.0.1', self.emulator.port)
+        return worker
@@ -0,0 +1,50 @@
+"""
+Tests for port and stream attributes cache.
+"""
+
+import time
+import unittest
+
+from xenavalkyrie_robot.xena_cache import XenaAttributesCache
+
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.port0, self.port1 = object(), object()
+        self.cache = XenaAttributesCache(ttl=0.2)
+
+    def test_get_put(self):
+        self.assertIsNone(self.cache.get(self.port0, None, 'p_txmode'))
+        self.cache.put(self.port0, None, 'P_TXMODE', 'NORMAL')
+        self.cache.put(self.port0, 0, 'ps_packetlimit', '100')
+        self.assertEqual(self.cache.get(self.port0, None, 'p_txmode'), 'NORMAL')
+        self.assertEqual(self.cache.get(self.port0, 0, 'ps_packetlimit'), '100')
+        self.assertIsNone(self.cache.get(self.port0, 1, 'ps_packetlimit'))
+        self.assertEqual(self.cache.get_counters(), {'hits': 2, 'misses': 2, 'size': 2})
+        time.sleep(0.25)
+        self.assertIsNone(self.cache.get(self.port0, None, 'p_txmode'))
+        self.assertEqual(self.cache.get_counters()['size'], 0)
+
+    def test_dynamic(self):
+        for attribute in ['p_traffic', 'pt_total', 'pr_tpldtraffic', 'ps_state']:
+            self.cache.put(self.port0, None, attribute, 'on')
+            self.assertIsNone(self.cache.get(self.port0, None, attribute))
+        self.assertEqual(self.cache.get_counters(), {'hits': 0, 'misses': 0, 'size': 0})
+
+    def test_invalidate(self):
+        self.cache.put(self.port0, None, 'p_txmode', 'NORMAL')
+        self.cache.put(self.port0, 0, 'ps_packetlimit', '100')
+        self.cache.put(self.port1, None, 'p_txmode', 'BURST')
+        self.cache.invalidate(self.port0)
+        self.assertIsNone(self.cache.get(self.port0, None, 'p_txmode'))
+        self.assertIsNone(self.cache.get(self.port0, 0, 'ps_packetlimit'))
+        self.assertEqual(self.cache.get(self.port1, None, 'p_txmode'), 'BURST')
+        self.cache.reset_counters()
+        self.assertEqual(self.cache.get_counters(), {'hits': 0, 'misses': 0, 'size': 1})
+
+    def test_disabled(self):
+        cache = XenaAttributesCache()
+        cache.put(self.port0, None, 'p_txmode', 'NORMAL')
+        self.assertIsNone(cache.get(self.port0, None, 'p_txmode'))
+        self.assertEqual(cache.get_counters(), {'hits': 0, 'misses': 0, 'size': 0})
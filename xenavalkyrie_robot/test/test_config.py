@@ -0,0 +1,69 @@
+"""
+Tests for parsed xpc configurations.
+"""
+
+import os
+import time
+import tempfile
+import unittest
+
+from xenavalkyrie_robot.xena_config import XpcConfig, get_xpc_config
+
+config_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'samples', 'test_config.xpc')
+
+
+class ConfigTest(unittest.TestCase):
+
+    def setUp(self):
+        with open(config_file) as f:
+            self.lines = f.read().splitlines()
+        self.config = XpcConfig(self.lines)
+
+    def test_parse(self):
+        self.assertTrue(self.config.reset)
+        self.assertEqual(self.config.entries[('P_COMMENT', None)][0], '"Port 1"')
+        self.assertEqual(self.config.entries[('PS_MODIFIER', '0,0')][0], '4 0xFFFF0000 INC 1')
+        self.assertEqual(self.config.commands[0], 'P_RESET')
+        self.assertEqual(len(self.config.commands), len([line for line in self.lines if not line.startswith(';')]))
+
+    def test_diff_same(self):
+        self.assertEqual(self.config.diff(XpcConfig(self.lines)), [])
+        fullconfig = ['0/0  {}'.format(line) for line in self.lines if line and not line.startswith(';')]
+        self.assertEqual(self.config.diff(XpcConfig(line.split(' ', 1)[1] for line in fullconfig)), [])
+
+    def test_diff_attributes(self):
+        state = XpcConfig(line.replace('"Port 1"', '"Port 2"').replace('[1]  8000', '[1]  100')
+                          for line in self.lines)
+        self.assertEqual(self.config.diff(state), ['P_COMMENT  "Port 1"', 'PS_PACKETLIMIT  [1]  8000'])
+
+    def test_diff_new_objects(self):
+        """ New stream and new modifiers are sent in full, dependent commands are sent together. """
+        state = XpcConfig(line.replace('PS_INDICES  0 1', 'PS_INDICES  0').replace('[0]  1', '[0]  0')
+                          for line in self.lines if '[1]' not in line)
+        lines = self.config.diff(state)
+        self.assertEqual(lines[0], 'PS_INDICES  0 1')
+        self.assertIn('PS_MODIFIER  [0,0]  4 0xFFFF0000 INC 1', lines)
+        self.assertEqual(len([line for line in lines if '[1]' in line]),
+                         len([line for line in self.lines if '[1]' in line]))
+        state = XpcConfig(line.replace('ETHERNET VLAN IPV6 TCP', 'ETHERNET') for line in self.lines)
+        self.assertEqual(self.config.diff(state), ['PS_HEADERPROTOCOL  [1]  ETHERNET VLAN IPV6 TCP',
+                                                   [line for line in self.lines if 'PS_PACKETHEADER  [1]' in line][0]])
+
+    def test_diff_uncovered(self):
+        """ Settings the configuration does not set require full load, deleted objects do not. """
+        self.assertIsNone(self.config.diff(XpcConfig(self.lines + ['P_FAULTSIGNALING  NORMAL'])))
+        state = XpcConfig(line.replace('PS_INDICES  0 1', 'PS_INDICES  0 1 2') for line in self.lines)
+        state.entries[('PS_COMMENT', '2')] = ('"deleted"', 'PS_COMMENT  [2]  "deleted"')
+        state.entries[('PS_MODIFIER', '0,5')] = ('4 0xFFFF0000 INC 1', 'PS_MODIFIER  [0,5]  4 0xFFFF0000 INC 1')
+        self.assertEqual(self.config.diff(state), ['PS_INDICES  0 1'])
+
+    def test_cache(self):
+        file_name = os.path.join(tempfile.mkdtemp(), 'config.xpc')
+        with open(file_name, 'w') as f:
+            f.write('\n'.join(self.lines))
+        self.assertIs(get_xpc_config(file_name), get_xpc_config(file_name))
+        config = get_xpc_config(file_name)
+        time.sleep(0.01)
+        with open(file_name, 'w') as f:
+            f.write('\n'.join(self.lines[:20]))
+        self.assertIsNot(get_xpc_config(file_name), config)
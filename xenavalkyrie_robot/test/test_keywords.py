@@ -0,0 +1,135 @@
+"""
+Keywords functional tests against local Xena chassis emulator.
+"""
+
+import os
+import time
+import tempfile
+import unittest
+
+from trafficgenerator.tgn_utils import TgnError
+
+from xenavalkyrie_robot.xena_robot import XenaRobot
+from xenavalkyrie_robot.xena_pcap import _read_records
+from xenavalkyrie_robot.test.xena_emulator import XenaEmulator
+
+config_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'samples', 'test_config.xpc')
+
+
+class KeywordsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.emulator = XenaEmulator().start()
+        self.port0 = '127.0.0.1/0/0'
+        self.port1 = '127.0.0.1/0/1'
+        self.robot = XenaRobot(api='socket', user='robot', log_level='NONE')
+        self.robot.add_chassis('127.0.0.1', self.emulator.port)
+        self.robot.reserve_ports(self.port0, self.port1)
+
+    def tearDown(self):
+        self.emulator.stop()
+
+    def test_packet_edit(self):
+        self.robot.add_stream(self.port1, 'edit')
+        self.robot.begin_packet_edit(self.port1, 'edit')
+        self.robot.add_packet_headers(self.port1, 'edit', 'IP')
+        self.robot.abort_packet_edit(self.port1, 'edit')
+        self.assertNotIn('ip', self.robot.get_packet_headers(self.port1, 'edit'))
+        with self.assertRaisesRegex(ValueError, 'No packet edit in progress'):
+            self.robot.commit_packet_edit(self.port1, 'edit')
+
+        self.robot.load_config(self.port0, config_file)
+        self.robot.begin_packet_edit(self.port0, '0')
+        self.robot.set_packet_header_fields(self.port0, '0', 'ethernet', src_s='11:11:11:11:11:11')
+        self.robot.load_config(self.port0, config_file)
+        with self.assertRaisesRegex(ValueError, 'aborted'):
+            self.robot.commit_packet_edit(self.port0, '0')
+        self.assertNotEqual(self.robot.get_packet_header(self.port0, '0', 'ethernet')['src'], '11:11:11:11:11:11')
+        self.robot.begin_packet_edit(self.port0, '0')
+        self.robot.reset_port(self.port0)
+        self.assertEqual(self.robot._packet_edits, {})
+
+    def test_add_streams(self):
+        self.robot.load_config(self.port0, config_file)
+        indices = self.robot.add_streams(self.port0, 3, 'ip', name='added {}')['indices']
+        self.assertEqual(indices, [2, 3, 4])
+        streams = [str(s) for s in [0, 1] + indices]
+        tpld_ids = [self.robot.get_stream_attribute(self.port0, s, 'ps_tpldid') for s in streams]
+        self.assertEqual(len(set(tpld_ids)), len(streams))
+        for stream in streams:
+            self.assertEqual(self.robot.get_stream_attribute(self.port0, stream, 'ps_enable'), 'ON')
+
+    def test_statistics_sampling(self):
+        self.robot.load_configs(config_file)
+        port0 = self.robot._port_name_or_index_to_object(self.port0)
+        objects = list(port0.objects.values())
+        self.robot.start_statistics_sampling(0.01, 'port', 'stream', 'tpld')
+        self.robot.run_traffic_blocking()
+        time.sleep(0.1)
+        samples = self.robot.stop_statistics_sampling()
+        self.assertTrue(all(samples.values()))
+        self.assertEqual(list(port0.objects.values()), objects)
+        self.assertEqual(self.robot.get_statistics_samples('port', self.port0, 'pt_total_packets')[-1][1],
+                         self.robot.get_statistics('port')[self.port0]['pt_total']['packets'])
+        self.assertEqual(self.robot.get_statistics_samples('stream', '0/0/0', 'pt_stream_packets')[-1][1],
+                         self.robot.get_statistics('port')[self.port0]['pt_total']['packets'] // 2)
+        self.assertTrue(self.robot.get_statistics_samples('tpld', '0/1/0', 'pr_tpldtraffic_pac'))
+
+    def test_statistics_for(self):
+        self.robot.add_stream(self.port0, 'same')
+        self.robot.add_stream(self.port0, 'same')
+        self.robot.run_traffic_blocking()
+        stats = self.robot.get_statistics_for('stream', self.port0, 'pt_stream_packets')
+        self.assertEqual(list(stats), ['0/0/0', '0/0/1'])
+        stats = self.robot.get_statistics_for('port', [self.port0, self.port1], 'pt_total', 'pr_total_packets')
+        self.assertEqual(len(stats[self.port0]), 5)
+        with self.assertRaisesRegex(ValueError, 'pt_total_foo'):
+            self.robot.get_statistics_for('port', self.port0, 'pt_total_foo')
+        with self.assertRaisesRegex(ValueError, 'pt_foo'):
+            self.robot.get_statistics_for('port', self.port0, 'pt_foo')
+
+    def test_save_capture(self):
+        self.robot.add_stream(self.port0)
+        self.robot.set_stream_attributes(self.port0, '0', ps_packetlimit=600, ps_packetlength='FIXED 100 100')
+        self.robot.start_capture(self.port1)
+        self.robot.run_traffic_blocking()
+        self.robot.stop_capture(self.port1)
+        cap_file = os.path.join(tempfile.mkdtemp(), 'capture.pcap')
+        round_trips = self.emulator.get_counters()['round_trips']
+        self.robot.save_capture_to_file(self.port1, cap_file, 'pcap', timestamps=True)
+        self.assertLessEqual(self.emulator.get_counters()['round_trips'] - round_trips, 20)
+        with open(cap_file, 'rb') as f:
+            records = list(_read_records(f.read()))
+        self.assertEqual(len(records), 600)
+        self.assertEqual(set(orig_len for _, orig_len in records), {len(records[0][0]) + 4})
+        with self.assertRaises(TgnError):
+            self.robot.save_captures_to_files(os.path.join(tempfile.mkdtemp(), 'capture_{}.txt'), self.port1)
+
+    def test_add_chassis_list(self):
+        """ Concurrent Add Chassis List as first keyword - all chassis are added to the same session. """
+        emulators = [XenaEmulator(ip='127.0.0.2').start()]
+        try:
+            emulators.extend(XenaEmulator(ip='127.0.0.{}'.format(index), port=emulators[0].port).start()
+                             for index in range(3, 8))
+            robot = XenaRobot(api='socket', user='robot', log_level='NONE')
+            robot.add_chassis_list(*['127.0.0.{}'.format(index) for index in range(2, 8)], port=emulators[0].port)
+            self.assertEqual(len(robot.xm.session.chassis_list), 6)
+        finally:
+            for emulator in emulators:
+                emulator.stop()
+
+    def test_multi_chassis_traffic(self):
+        emulator = XenaEmulator(ip='127.0.0.2').start()
+        try:
+            self.robot.add_chassis('127.0.0.2', emulator.port)
+            self.robot.reserve_ports(self.port0, self.port1, '127.0.0.2/0/0', '127.0.0.2/0/1')
+            for port in [self.port0, '127.0.0.2/0/0']:
+                self.robot.add_stream(port)
+                self.robot.set_stream_attributes(port, '0', ps_packetlimit=100)
+            self.robot.run_traffic_blocking()
+            stats = self.robot.get_statistics('port')
+            self.assertEqual(stats['127.0.0.2/0/1']['pr_total']['packets'], 100)
+            self.assertEqual(stats[self.port1]['pr_total']['packets'], 100)
+        finally:
+            self.robot.release_ports()
+            emulator.stop()
@@ -0,0 +1,53 @@
+"""
+Tests for library logging configuration.
+"""
+
+import io
+import time
+import logging
+import unittest
+
+from xenavalkyrie_robot.xena_logging import configure_logger
+
+
+class LoggingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = logging.getLogger('test_xena_logging')
+        self.stream = io.StringIO()
+
+    def tearDown(self):
+        configure_logger(self.logger, 'NONE', stream=io.StringIO())
+
+    def test_level(self):
+        configure_logger(self.logger, 'info', stream=self.stream)
+        self.logger.debug('debug %s', 'line')
+        self.logger.info('info %s', 'line')
+        self.assertEqual(self.stream.getvalue(), 'info line\n')
+        configure_logger(self.logger, 'NONE', stream=self.stream)
+        self.logger.error('error line')
+        self.assertEqual(self.stream.getvalue(), 'info line\n')
+        self.assertEqual(len(self.logger.handlers), 1)
+        self.assertRaises(ValueError, configure_logger, self.logger, 'verbose')
+
+    def test_asynchronous(self):
+        configure_logger(self.logger, 'DEBUG', asynchronous=True, stream=self.stream)
+        for index in range(1000):
+            self.logger.debug('line %d', index)
+        configure_logger(self.logger, 'DEBUG', stream=io.StringIO())
+        lines = self.stream.getvalue().splitlines()
+        self.assertEqual(lines, ['line {}'.format(index) for index in range(1000)])
+
+    def test_debug_rate(self):
+        configure_logger(self.logger, 'DEBUG', debug_rate=10, stream=self.stream)
+        while int(time.monotonic() + 0.05) != int(time.monotonic()):
+            time.sleep(0.01)
+        for index in range(100):
+            self.logger.debug('line %d', index)
+        self.logger.info('info line')
+        lines = self.stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 11)
+        self.assertEqual(lines[-1], 'info line')
+        time.sleep(1)
+        self.logger.debug('next line')
+        self.assertEqual(self.stream.getvalue().splitlines()[-1], '(90 debug records dropped) next line')
@@ -0,0 +1,99 @@
+"""
+Tests for pure Python pcap utilities.
+"""
+
+import os
+import struct
+import tempfile
+import unittest
+
+from pypacker import ppcap
+from pypacker.layer12.ethernet import Ethernet, Dot1Q
+from pypacker.layer3.ip import IP
+from pypacker.layer3.ip6 import IP6
+from pypacker.layer4.tcp import TCP
+from pypacker.layer4.udp import UDP
+
+from xenavalkyrie_robot.xena_pcap import PcapWriter, PcapFilterError, get_pcap_index
+
+
+class PcapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.packets = []
+        for index in range(10):
+            packet = Ethernet() + IP(src_s='1.1.1.{}'.format(index)) + UDP(sport=index)
+            self.packets.append(packet.bin())
+
+    def test_pcap_writer(self):
+        file_name = os.path.join(self.temp_dir, 'test.pcap')
+        with PcapWriter(file_name) as writer:
+            for index, packet in enumerate(self.packets):
+                writer.write(packet, index * 1500000000)
+        reader = ppcap.Reader(filename=file_name)
+        records = list(reader)
+        reader.close()
+        assert [bytes(packet) for _, packet in records] == self.packets
+        assert records[3][0] == 3 * 1500000000
+
+    def test_pcapng_writer(self):
+        file_name = os.path.join(self.temp_dir, 'test.pcapng')
+        with PcapWriter(file_name, snaplen=40) as writer:
+            for packet in self.packets:
+                writer.write(packet, 1)
+        with open(file_name, 'rb') as f:
+            data = f.read()
+        offset = 0
+        blocks = []
+        while offset < len(data):
+            block_type, length = struct.unpack_from('<II', data, offset)
+            assert struct.unpack_from('<I', data, offset + length - 4)[0] == length
+            blocks.append((block_type, data[offset + 8:offset + length - 4]))
+            offset += length
+        assert [b[0] for b in blocks] == [0x0a0d0d0a, 1] + [6] * len(self.packets)
+        _, _, _, captured_len, orig_len = struct.unpack_from('<IIIII', blocks[2][1])
+        assert captured_len == 40
+        assert orig_len == len(self.packets[0])
+        assert blocks[2][1][20:60] == self.packets[0][:40]
+
+    def test_pcap_index(self):
+        for extension in ['pcap', 'pcapng']:
+            file_name = os.path.join(self.temp_dir, 'index.' + extension)
+            with PcapWriter(file_name) as writer:
+                for packet in self.packets:
+                    writer.write(packet)
+                vlan_ip6_tcp = (Ethernet(src_s='00:00:00:00:00:11', vlan=[Dot1Q(vid=17)]) + IP6(src_s='11::11') +
+                                TCP(dport=80))
+                writer.write(vlan_ip6_tcp.bin())
+            index = get_pcap_index(file_name)
+            assert index.count() == 11
+            assert index.count('ip.src', 'ip.dst') == 10
+            assert index.count('ip.src == 1.1.1.3') == 1
+            assert index.count('udp.srcport >= 5 && ip') == 5
+            assert index.count('!vlan') == 10
+            assert index.count('vlan.id == 17', 'ipv6.src == 11::11', 'tcp.dstport == 80') == 1
+            assert index.count('eth.src == 00:00:00:00:00:11') == 1
+            assert index.count('frame.len > 0') == 11
+            assert get_pcap_index(file_name) is index
+            with self.assertRaises(PcapFilterError):
+                index.count('http.request')
+
+    def test_malformed_files(self):
+        for extension in ['pcap', 'pcapng']:
+            file_name = os.path.join(self.temp_dir, 'valid.' + extension)
+            with PcapWriter(file_name) as writer:
+                for packet in self.packets:
+                    writer.write(packet)
+            with open(file_name, 'rb') as f:
+                data = f.read()
+            corrupted = [data[:-10]]
+            if extension == 'pcapng':
+                corrupted.append(data[:4] + struct.pack('<I', 0) + data[8:])
+                corrupted.append(data[:4] + struct.pack('<I', 30) + data[8:])
+            for index, corrupted_data in enumerate(corrupted):
+                corrupted_name = os.path.join(self.temp_dir, 'corrupted_{}.{}'.format(index, extension))
+                with open(corrupted_name, 'wb') as f:
+                    f.write(corrupted_data)
+                with self.assertRaises(ValueError):
+                    get_pcap_index(corrupted_name)
@@ -0,0 +1,62 @@
+"""
+Performance (micro) benchmarks for Xena robot library internals that do not require chassis.
+"""
+
+import os
+import time
+import tempfile
+import unittest
+
+from pypacker.layer12.ethernet import Ethernet
+from pypacker.layer3.ip import IP
+from pypacker.layer4.udp import UDP
+
+from xenavalkyrie_robot.xena_robot import _packet_headers_registry
+from xenavalkyrie_robot.xena_pcap import PcapWriter, get_pcap_index
+
+
+class PerformanceTest(unittest.TestCase):
+
+    def test_packet_headers_registry(self):
+        """ Headers modules are scanned and imported once - per stream cost is only the lookup. """
+        headers = ['vlan', 'ip', 'ip6', 'tcp', 'udp']
+        classes = [_packet_headers_registry.get_class(header) for header in headers]
+        modules_names = _packet_headers_registry._modules_names
+        modules = dict(_packet_headers_registry._modules)
+        for num_streams in [10, 100, 1000]:
+            start = time.perf_counter()
+            for _ in range(num_streams):
+                for header in headers:
+                    _packet_headers_registry.get_class(header)()
+            per_call = (time.perf_counter() - start) / num_streams
+            print('{} streams - {:.2f} usec per stream'.format(num_streams, per_call * 1e6))
+        self.assertEqual([_packet_headers_registry.get_class(header) for header in headers], classes)
+        self.assertIs(_packet_headers_registry._modules_names, modules_names)
+        self.assertEqual(_packet_headers_registry._modules, modules)
+
+    def test_supported_packet_headers(self):
+        names = _packet_headers_registry.get_names()
+        for header in ['vlan', 'ip', 'ip6', 'tcp', 'udp']:
+            self.assertIn(header, names)
+        with self.assertRaises(ValueError):
+            _packet_headers_registry.get_class('no_such_header')
+
+    def test_pcap_analyzer(self):
+        """ Repeated analysis of the same capture should not decode the file again. """
+        file_name = os.path.join(tempfile.mkdtemp(), 'perf.pcap')
+        with PcapWriter(file_name) as writer:
+            for index in range(20000):
+                writer.write((Ethernet() + IP(src_s='1.1.{}.{}'.format(index // 256 % 256, index % 256)) +
+                              UDP(sport=index % 65536)).bin())
+        start = time.perf_counter()
+        index = get_pcap_index(file_name)
+        assert index.count('ip.src', 'ip.dst') == 20000
+        first_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(10):
+            assert get_pcap_index(file_name).count('ip.src', 'ip.dst') == 20000
+            assert get_pcap_index(file_name).count('udp.srcport < 100') == 100
+            self.assertIs(get_pcap_index(file_name), index)
+        cached_time = (time.perf_counter() - start) / 20
+        print('20000 packets - decode + count {:.3f} seconds, cached count {:.5f} seconds'.format(first_time,
+                                                                                              cached_time))
@@ -0,0 +1,109 @@
+"""
+Tests for pipelined CLI commands.
+"""
+
+import time
+import socket
+import threading
+import unittest
+
+from xenavalkyrie_robot.xena_robot import XenaRobot
+from xenavalkyrie_robot.test.xena_emulator import XenaEmulator
+
+
+class _LineServer(threading.Thread):
+    """ Minimal line based CLI server - replies to each received chunk after fixed latency. """
+
+    def __init__(self, latency):
+        super(_LineServer, self).__init__()
+        self.daemon = True
+        self.latency = latency
+        self.round_trips = 0
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+
+    def run(self):
+        connection, _ = self.server.accept()
+        buffer = b''
+        while True:
+            data = connection.recv(65536)
+            if not data:
+                return
+            time.sleep(self.latency)
+            self.round_trips += 1
+            buffer += data
+            *lines, buffer = buffer.split(b'\n')
+            connection.sendall(b''.join(self.reply(line.decode().strip()) for line in lines))
+
+    @staticmethod
+    def reply(command):
+        if command == 'SYNC':
+            return b'<SYNC>\n'
+        if command.startswith('bad'):
+            return b'#Syntax error in command\n'
+        if command.startswith('invalid'):
+            return b'<NOTVALID>\n'
+        if command.endswith('?'):
+            return '{} value\n'.format(command[:-1].strip().upper()).encode()
+        return b'<OK>\n'
+
+
+class PipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = _LineServer(latency=0.005)
+        self.server.start()
+        self.robot = XenaRobot(api='socket', user='robot')
+        self.robot.add_chassis('127.0.0.1', self.server.port)
+
+    def test_send_commands(self):
+        self.robot.send_commands('127.0.0.1', *['0/0 p_comment "{}"'.format(i) for i in range(10)])
+        replies = self.robot.send_commands_return('127.0.0.1', '0/0 p_comment ?', '0/1 p_speed ?')
+        assert replies == ['0/0 P_COMMENT value', '0/1 P_SPEED value']
+        with self.assertRaises(Exception):
+            self.robot.send_commands('127.0.0.1', '0/0 p_comment "a"', 'bad command', '0/0 p_comment "b"')
+        replies = self.robot.send_commands_return('127.0.0.1', 'bad command', '0/0 p_comment ?',
+                                                  fail_on_error=False)
+        assert replies == ['#Syntax error in command', '0/0 P_COMMENT value']
+
+    def test_status_replies(self):
+        """ Set commands must reply <OK>, queries must not reply with status. """
+        with self.assertRaises(Exception):
+            self.robot.send_commands_return('127.0.0.1', 'invalid c_comment "x"')
+        with self.assertRaises(Exception):
+            self.robot.send_commands_return('127.0.0.1', 'invalid c_comment ?')
+        replies = self.robot.send_commands_return('127.0.0.1', 'invalid c_comment "x"', 'invalid c_comment ?',
+                                                  '0/0 p_comment "x"', fail_on_error=False)
+        assert replies == ['<NOTVALID>', '<NOTVALID>', '<OK>']
+
+    def test_value_replies(self):
+        emulator = XenaEmulator().start()
+        try:
+            robot = XenaRobot(api='socket', user='robot', log_level='NONE')
+            robot.add_chassis('127.0.0.1', emulator.port)
+            robot.reserve_ports('127.0.0.1/0/0')
+            robot.send_commands('127.0.0.1', '0/0 p_comment "Syntax of names"')
+            replies = robot.send_commands_return('127.0.0.1', '0/0 p_comment ?')
+            assert replies[0].endswith('"Syntax of names"')
+        finally:
+            emulator.stop()
+
+    def test_pipeline_speedup(self):
+        commands = ['0/0 p_comment ?'] * 100
+        round_trips = self.server.round_trips
+        start = time.time()
+        for command in commands:
+            self.robot.send_command_return('127.0.0.1', command)
+        sequential = time.time() - start
+        sequential_round_trips = self.server.round_trips - round_trips
+        round_trips = self.server.round_trips
+        start = time.time()
+        self.robot.send_commands_return('127.0.0.1', *commands)
+        pipelined = time.time() - start
+        pipelined_round_trips = self.server.round_trips - round_trips
+        print('100 commands - sequential {:.3f} seconds ({} round trips), pipelined {:.3f} seconds ({} round '
+              'trips)'.format(sequential, sequential_round_trips, pipelined, pipelined_round_trips))
+        self.assertEqual(sequential_round_trips, 100)
+        self.assertLess(pipelined_round_trips * 10, sequential_round_trips)
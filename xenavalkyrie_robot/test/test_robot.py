@@ -5,6 +5,8 @@ Base class for all traffic generators tests.
 """
 
 from os import path
+import time
+import tempfile
 import unittest
 
 from xenavalkyrie_robot.xena_robot import XenaRobot
@@ -48,6 +50,44 @@ class RobotTest(unittest.TestCase):
         self.robot.set_modifier_attributes(port1, '0', '0', min_val='10', max_val='20', action='decrement')
         self.robot.remove_modifier(port1, '0', '0')
 
+    def test_load_save_configs(self):
+        self.robot.reserve_ports_by_force(port0, port1)
+        config_file = path.join(path.dirname(path.dirname(__file__)), 'samples', 'test_config.xpc')
+        temp_dir = tempfile.mkdtemp()
+        assert self.robot.load_configs(config_file)['elapsed'] > 0
+        self.robot.set_stream_attributes(port1, '0', ps_packetlimit=1234)
+        self.robot.save_configs({port0: path.join(temp_dir, 'config_0.xpc'),
+                                 port1: path.join(temp_dir, 'config_1.xpc')})
+        assert path.isfile(path.join(temp_dir, 'config_0.xpc'))
+        assert path.isfile(path.join(temp_dir, 'config_1.xpc'))
+        self.robot.load_configs({port0: path.join(temp_dir, 'config_1.xpc'),
+                                 port1: path.join(temp_dir, 'config_0.xpc')}, workers=1)
+        assert int(self.robot.get_stream_attribute(port0, '0', 'ps_packetlimit')) == 1234
+        assert int(self.robot.get_stream_attribute(port1, '0', 'ps_packetlimit')) != 1234
+
+    def test_packet_edit(self):
+        self.robot.reserve_ports_by_force(port0, port1)
+        self.robot.reset_port(port1)
+        self.robot.add_stream(port1, 'edit')
+        self.robot.begin_packet_edit(port1, 'edit')
+        self.robot.add_packet_headers(port1, 'edit', 'VLAN', 'IP6', 'UDP')
+        self.robot.set_packet_header_fields(port1, 'edit', 'VLAN[0]', vid=17)
+        self.robot.commit_packet_edit(port1, 'edit')
+        self.robot.edit_packet(port1, 'edit', 'ethernet:src_s=11:11:11:11:11:11', 'IP6:src_s=11::11')
+        assert self.robot.get_packet_header(port1, 'edit', 'IP6')['src'] == '11::11'
+
+    def test_streams_resolver(self):
+        self.robot.reserve_ports_by_force(port0, port1)
+        self.robot.reset_port(port1)
+        self.robot.add_stream(port1, 'first')
+        self.robot.add_stream(port1, 'second')
+        assert self.robot.get_stream_attribute(port1, 'second', 'ps_comment') == 'second'
+        self.robot.remove_stream(port1, 'first')
+        with self.assertRaises(ValueError):
+            self.robot.get_stream_attribute(port1, 'first', 'ps_comment')
+        self.robot.load_config(port1, path.join(path.dirname(path.dirname(__file__)), 'samples', 'test_config.xpc'))
+        assert self.robot.get_stream_attribute('1', '0', 'ps_packetlimit')
+
     def test_run_traffic(self):
         self.robot.reserve_ports_by_force(port0, port1)
         self.robot.load_config(port0, path.join(path.dirname(path.dirname(__file__)), 'samples', 'test_config.xpc'))
@@ -60,5 +100,51 @@ class RobotTest(unittest.TestCase):
         self.robot.g
         print(stats)
 
+    def test_synchronized_traffic(self):
+        self.robot.reserve_ports_by_force(port0, port1)
+        self.robot.load_configs(path.join(path.dirname(path.dirname(__file__)), 'samples', 'test_config.xpc'))
+        self.robot.clear_statistics()
+        self.robot.run_traffic_blocking()
+        assert self.robot.get_statistics('port')[port1]['pt_total']['packets'] == 160
+
+    def test_statistics_for(self):
+        self.robot.reserve_ports_by_force(port0, port1)
+        self.robot.load_configs(path.join(path.dirname(path.dirname(__file__)), 'samples', 'test_config.xpc'))
+        start = time.time()
+        self.robot.get_statistics('tpld')
+        full_time = time.time() - start
+        start = time.time()
+        stats = self.robot.get_statistics_for('tpld', {port1: ['0']}, 'pr_tpldtraffic_pac')
+        subset_time = time.time() - start
+        print('full statistics - {:.3f} seconds, subset - {:.3f} seconds'.format(full_time, subset_time))
+        assert list(list(stats.values())[0].keys()) == ['pr_tpldtraffic_pac']
+        stats = self.robot.get_statistics_for('port', port0, 'pt_total', 'pr_total_packets')
+        assert len(stats[port0]) == 5
+
+    def test_statistics_sampling(self):
+        self.robot.reserve_ports_by_force(port0, port1)
+        self.robot.load_configs(path.join(path.dirname(path.dirname(__file__)), 'samples', 'test_config.xpc'))
+        self.robot.start_statistics_sampling(0.5, 'port', 'tpld')
+        self.robot.run_traffic_blocking()
+        self.robot.stop_statistics_sampling()
+        summary = self.robot.get_statistics_summary('port', port0, 'pt_total_packets')
+        assert summary['samples'] > 1
+        assert 0 < summary['max'] <= self.robot.get_statistics('port')[port0]['pt_total']['packets']
+        assert summary['min'] <= summary['mean'] <= summary['max']
+
+    def test_save_captures(self):
+        self.robot.reserve_ports_by_force(port0, port1)
+        self.robot.load_configs(path.join(path.dirname(path.dirname(__file__)), 'samples', 'test_config.xpc'))
+        self.robot.start_capture()
+        self.robot.run_traffic_blocking()
+        self.robot.stop_capture()
+        temp_dir = tempfile.mkdtemp()
+        self.robot.save_capture_to_file('0', path.join(temp_dir, 'robot_cap_file.pcap'), 'pcap', True)
+        self.robot.save_captures_to_files(path.join(temp_dir, 'robot_cap_file_{}.pcapng'))
+        packets = self.robot.analyze_packets(path.join(temp_dir, 'robot_cap_file.pcap'))
+        assert packets > 0
+        assert self.robot.analyze_packets(path.join(temp_dir, 'robot_cap_file_0_0.pcapng')) == packets
+        assert path.isfile(path.join(temp_dir, 'robot_cap_file_0_1.pcapng'))
+
     def test_misc_operations(self):
         print(self.robot.send_command_return(chassis, '0/0 p_comment ?'))
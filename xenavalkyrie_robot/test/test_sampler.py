@@ -0,0 +1,49 @@
+"""
+Tests for background statistics sampler.
+"""
+
+import os
+import json
+import time
+import tempfile
+import unittest
+
+from xenavalkyrie_robot.xena_sampler import XenaStatsSampler
+
+
+class SamplerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.packets = 0
+
+    def read_stats(self):
+        self.packets += 100
+        return {'0/0': {'pt_total': {'packets': self.packets, 'pps': 100}}}
+
+    def test_ring_buffer(self):
+        sampler = XenaStatsSampler(None, {'port': self.read_stats}, interval=0.01, size=5)
+        sampler.start()
+        time.sleep(0.2)
+        sampler.stop()
+        samples = sampler.get_samples('port', '0/0', 'pt_total_packets')
+        assert len(samples) == 5
+        assert [v for _, v in samples] == sorted(v for _, v in samples)
+        summary = sampler.get_summary('port', '0/0', 'pt_total_packets', percentile=50)
+        assert summary['min'] == samples[0][1]
+        assert summary['max'] == samples[-1][1]
+        assert summary['percentile'] == samples[2][1]
+        assert summary['rate'] > 0
+        assert sampler.get_summary('port', '0/0', 'pt_total_pps')['rate'] == 0
+        with self.assertRaises(ValueError):
+            sampler.get_summary('port', '0/1', 'pt_total_pps')
+
+    def test_stream_to_file(self):
+        file_name = os.path.join(tempfile.mkdtemp(), 'samples.jsonl')
+        sampler = XenaStatsSampler(None, {'port': self.read_stats}, interval=0.01, file_name=file_name)
+        sampler.start()
+        time.sleep(0.1)
+        samples = sampler.stop()
+        with open(file_name) as f:
+            lines = [json.loads(line) for line in f]
+        assert len(lines) == samples['port']
+        assert lines[-1]['counters']['0/0']['pt_total_packets'] == self.packets
@@ -0,0 +1,487 @@
+"""
+Local Xena chassis emulator.
+
+TCP server that speaks enough of the Xena CLI to run the Xena robot library keywords, the library tests and the
+sample robot suite without a chassis - logon, reservation, port and stream attributes, streams, packet headers,
+modifiers, traffic, statistics (ports, streams, TPLDs) and capture.
+
+On traffic start each transmitting port sends ps_packetlimit packets of each enabled stream to its peer port
+(0/0 <-> 0/1, 0/2 <-> 0/3 ...) and the statistics and capture buffers are updated immediately. Traffic state remains ON
+for the first p_traffic query and then for traffic_time_scale * (ps_packetlimit / ps_ratepps) seconds of the longest
+stream.
+
+Usage: python -m xenavalkyrie_robot.test.xena_emulator [--ip 127.0.0.1] [--port 22611] [--latency 0.001]
+"""
+
+import re
+import sys
+import time
+import socket
+import argparse
+import binascii
+import threading
+from collections import OrderedDict
+
+port_defaults = OrderedDict([('P_COMMENT', '""'),
+                             ('P_SPEED', '1000'),
+                             ('P_SPEEDSELECTION', 'AUTO'),
+                             ('P_TXMODE', 'NORMAL'),
+                             ('P_TXENABLE', 'ON'),
+                             ('P_TXTIMELIMIT', '0'),
+                             ('P_INTERFRAMEGAP', '20'),
+                             ('P_MACADDRESS', '0x04F4BC000000'),
+                             ('P_IPADDRESS', '0.0.0.0 0.0.0.0 0.0.0.0 0.0.0.0'),
+                             ('P_LATENCYMODE', 'LAST2LAST'),
+                             ('P_TPLDMODE', 'NORMAL'),
+                             ('P_MAXHEADERLENGTH', '128'),
+                             ('P_LOOPBACK', 'NONE'),
+                             ('P_CHECKSUM', 'OFF')])
+
+stream_defaults = OrderedDict([('PS_ENABLE', 'OFF'),
+                               ('PS_PACKETLIMIT', '-1'),
+                               ('PS_COMMENT', '""'),
+                               ('PS_RATEPPS', '1000'),
+                               ('PS_BURST', '-1 100'),
+                               ('PS_HEADERPROTOCOL', 'ETHERNET'),
+                               ('PS_PACKETHEADER', '0x00000000000004F4BC00000FFFFF'),
+                               ('PS_MODIFIERCOUNT', '0'),
+                               ('PS_MODIFIEREXTCOUNT', '0'),
+                               ('PS_PACKETLENGTH', 'FIXED 64 1518'),
+                               ('PS_PAYLOAD', 'INCREMENTING 0x00'),
+                               ('PS_TPLDID', '-1'),
+                               ('PS_INSERTFCS', 'ON')])
+
+modifier_defaults = {'PS_MODIFIER': '0 0xFFFF0000 INC 1',
+                     'PS_MODIFIERRANGE': '0 1 65535',
+                     'PS_MODIFIEREXT': '0 0xFFFFFFFF INC 1',
+                     'PS_MODIFIEREXTRANGE': '0 1 65535'}
+
+port_counters = OrderedDict([('PT_TOTAL', 4), ('PT_NOTPLD', 4), ('PT_EXTRA', 10), ('PR_TOTAL', 4), ('PR_NOTPLD', 4),
+                             ('PR_EXTRA', 8), ('PR_PFCSTATS', 9)])
+
+tpld_counters = OrderedDict([('PR_TPLDTRAFFIC', 4), ('PR_TPLDERRORS', 4), ('PR_TPLDLATENCY', 6),
+                             ('PR_TPLDJITTER', 6)])
+
+command_re = re.compile(r'^(?:(\d+)(?:/(\d+))?\s+)?([A-Za-z]\w*)\s*(?:\[\s*([\d,\s]+)\s*\])?\s*(.*?)\s*$')
+
+
+class _Port(object):
+
+    def __init__(self):
+        self.reserved_by = None
+        self.capture_limit = 10000
+        self.reset()
+
+    def reset(self):
+        self.attributes = OrderedDict(port_defaults)
+        self.streams = OrderedDict()
+        self.traffic = 'OFF'
+        self.traffic_reads = 0
+        self.traffic_end = 0
+        self.capture = 'OFF'
+        self.captured = []
+        self.counters = {c: [0] * n for c, n in port_counters.items()}
+        self.stream_counters = {}
+        self.tplds = OrderedDict()
+
+    def clear_tx(self):
+        self.counters.update({c: [0] * n for c, n in port_counters.items() if c.startswith('PT_')})
+        self.stream_counters = {}
+
+    def clear_rx(self):
+        self.counters.update({c: [0] * n for c, n in port_counters.items() if c.startswith('PR_')})
+        self.tplds = OrderedDict()
+
+
+class XenaEmulator(object):
+    """ Emulated Xena chassis. """
+
+    def __init__(self, ip='127.0.0.1', port=0, latency=0, processing=0, modules=8, ports_per_module=16,
+                 password='xena', traffic_time_scale=0, command_times=None):
+        """
+        :param ip: IP address to listen on.
+        :param port: TCP port to listen on, 0 - any free port (see self.port after start).
+        :param latency: network round trip time in seconds, added once for each batch of commands received.
+        :param processing: processing time in seconds, added for each command.
+        :param modules: number of modules reported by the chassis.
+        :param ports_per_module: number of ports per module reported by the chassis.
+        :param password: chassis password.
+        :param traffic_time_scale: traffic duration factor, 0 - traffic stops immediately, 1 - real time.
+        :param command_times: {command: seconds} extra chassis time of set commands (e.g. C_LOGON, P_RESERVATION),
+            chassis work is serialized - commands of all connections wait for each other.
+        """
+
+        self.ip = ip
+        self.port = port
+        self.latency = latency
+        self.processing = processing
+        self.modules = modules
+        self.ports_per_module = ports_per_module
+        self.password = password
+        self.traffic_time_scale = traffic_time_scale
+        self.command_times = {c.upper(): t for c, t in (command_times or {}).items()}
+        self.ports = {}
+        self.commands = 0
+        self.round_trips = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self._lock = threading.RLock()
+        self._server = None
+        self._connections = []
+
+    def start(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.ip, self.port))
+        self._server.listen(64)
+        self.port = self._server.getsockname()[1]
+        thread = threading.Thread(target=self._accept, name='XenaEmulator')
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.close()
+            self._server = None
+        for connection in self._connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+                connection.close()
+            except OSError:
+                pass
+        self._connections = []
+
+    def get_counters(self):
+        """
+        :return: dictionary {commands, round_trips, bytes_received, bytes_sent} since emulator start.
+        """
+        return {'commands': self.commands, 'round_trips': self.round_trips, 'bytes_received': self.bytes_received,
+                'bytes_sent': self.bytes_sent}
+
+    def execute(self, session, line):
+        """ Execute single CLI command line.
+
+        :param session: connection session data {owner}.
+        :param line: command line.
+        :return: list of reply lines.
+        """
+
+        line = line.strip()
+        if not line:
+            return ['<OK>']
+        if line.upper() == 'SYNC':
+            return ['<SYNC>']
+        match = command_re.match(line)
+        if not match:
+            return ['#Syntax error in command']
+        module, port, command, index, arguments = match.groups()
+        command = command.upper()
+        query = arguments == '?'
+        with self._lock:
+            if not query and command in self.command_times:
+                time.sleep(self.command_times[command])
+            try:
+                if port is not None:
+                    return self._port_command(session, '{}/{}'.format(module, port), command, index, arguments,
+                                              query)
+                if module is not None:
+                    return self._module_command(module, command, query)
+                return self._chassis_command(session, command, arguments, query)
+            except (KeyError, IndexError, ValueError):
+                return ['<BADINDEX>']
+
+    #
+    # Private methods - commands.
+    #
+
+    def _chassis_command(self, session, command, arguments, query):
+        if command == 'C_LOGON':
+            if arguments.strip('"') != self.password:
+                return ['<BADVALUE>']
+            session['logon'] = True
+        elif command == 'C_OWNER':
+            if query:
+                return ['C_OWNER  "{}"'.format(session.get('owner', ''))]
+            session['owner'] = arguments.strip('"')
+        elif command == 'C_PORTCOUNTS' and query:
+            return ['C_PORTCOUNTS  {}'.format(' '.join([str(self.ports_per_module)] * self.modules))]
+        elif command in ['C_INFO', 'C_CONFIG'] and query:
+            return ['C_PORTCOUNTS  {}'.format(' '.join([str(self.ports_per_module)] * self.modules)),
+                    'C_NAME  "emulator"']
+        elif command == 'C_TRAFFIC':
+            values = arguments.split()
+            locations = ['{}/{}'.format(m, p) for m, p in zip(values[1::2], values[2::2])]
+            for location in locations:
+                self._set_traffic(location, values[0].upper())
+        elif query:
+            return ['{}  0'.format(command)]
+        return ['<OK>']
+
+    def _module_command(self, module, command, query):
+        if not query:
+            return ['<OK>']
+        if command == 'M_PORTCOUNT':
+            return ['{}  M_PORTCOUNT  {}'.format(module, self.ports_per_module)]
+        if command == 'M_CFPTYPE':
+            return ['{}  M_CFPTYPE  NOTCFP'.format(module)]
+        if command in ['M_INFO', 'M_CONFIG']:
+            return ['{}  M_CFPTYPE  NOTCFP'.format(module), '{}  M_PORTCOUNT  {}'.format(module,
+                                                                                       self.ports_per_module)]
+        return ['{}  {}  0'.format(module, command)]
+
+    def _port_command(self, session, location, command, index, arguments, query):
+        port = self._get_port(location)
+
+        def reply(value):
+            return ['{}  {}  {}{}'.format(location, command, '[{}]  '.format(index) if index is not None else '',
+                                          value)]
+
+        if command == 'P_RESERVATION':
+            if query:
+                if not port.reserved_by:
+                    return reply('RELEASED')
+                return reply('RESERVED_BY_YOU' if port.reserved_by == session.get('owner') else 'RESERVED_BY_OTHER')
+            action = arguments.lower()
+            if action == 'reserve':
+                if port.reserved_by and port.reserved_by != session.get('owner'):
+                    return ['<NOTVALID>']
+                port.reserved_by = session.get('owner')
+            elif action in ['release', 'relinquish']:
+                port.reserved_by = None
+            return ['<OK>']
+        if command == 'P_RESERVEDBY' and query:
+            return reply('"{}"'.format(port.reserved_by if port.reserved_by else ''))
+        if command == 'P_RECEIVESYNC' and query:
+            return reply('IN_SYNC')
+
+        if not query and port.reserved_by != session.get('owner'):
+            return ['<NOTRESERVED>']
+
+        if command == 'P_RESET':
+            port.reset()
+        elif command == 'P_TRAFFIC':
+            if query:
+                return reply(self._get_traffic(port))
+            self._set_traffic(location, arguments.upper())
+        elif command == 'P_CAPTURE':
+            if query:
+                return reply(port.capture)
+            port.capture = arguments.upper()
+            if port.capture == 'ON':
+                port.captured = []
+        elif command == 'PT_CLEAR':
+            port.clear_tx()
+        elif command == 'PR_CLEAR':
+            port.clear_rx()
+        elif command in port_counters and query:
+            return reply(' '.join(str(c) for c in port.counters[command]))
+        elif command == 'PR_TPLDS' and query:
+            return reply(' '.join(str(t) for t in port.tplds))
+        elif command in tpld_counters and query:
+            return reply(' '.join(str(c) for c in port.tplds[int(index)][command]))
+        elif command == 'PT_STREAM' and query:
+            packets, length = port.stream_counters.get(int(index), (0, 0))
+            return reply('0 0 {} {} 0 0'.format(packets * length, packets))
+        elif command == 'PC_STATS' and query:
+            return reply('{} {} 0'.format(1 if port.capture == 'ON' else 0, len(port.captured)))
+        elif command == 'PC_PACKET' and query:
+            return reply('0x{}'.format(binascii.hexlify(port.captured[int(index)][1]).decode().upper()))
+        elif command in ['PC_EXTRA', 'PC_INFO'] and query:
+            timestamp, packet = port.captured[int(index)]
+            return reply('{} 0 0 {}'.format(timestamp, len(packet) + 4))
+        elif command in ['P_CONFIG', 'P_INFO'] and query:
+            return self._port_config(location, port)
+        elif command == 'P_FULLCONFIG' and query:
+            lines = self._port_config(location, port)
+            lines.append('{}  PS_INDICES  {}'.format(location, ' '.join(str(s) for s in port.streams)))
+            for sid in port.streams:
+                lines.extend(self._stream_config(location, port, sid))
+            return lines
+        elif command == 'PS_INDICES':
+            if query:
+                return reply(' '.join(str(s) for s in port.streams))
+            indices = [int(i) for i in arguments.split()]
+            port.streams = OrderedDict((i, port.streams.get(i, self._new_stream())) for i in indices)
+        elif command == 'PS_CREATE':
+            port.streams[int(index)] = self._new_stream()
+        elif command == 'PS_DELETE':
+            del port.streams[int(index)]
+        elif command == 'PS_CONFIG' and query:
+            return self._stream_config(location, port, int(index))
+        elif command.startswith('PS_MODIFIER') and index and ',' in index:
+            sid, mid = [int(i) for i in index.split(',')]
+            stream = port.streams[sid]
+            count_attribute = 'PS_MODIFIEREXTCOUNT' if command.startswith('PS_MODIFIEREXT') else 'PS_MODIFIERCOUNT'
+            if mid >= int(stream['attributes'][count_attribute]):
+                return ['<BADINDEX>']
+            modifier = stream['modifiers'].setdefault((count_attribute, mid), {})
+            if query:
+                return reply(modifier.get(command, modifier_defaults[command]))
+            modifier[command] = arguments
+        elif command.startswith('PS_'):
+            stream = port.streams[int(index)]
+            if query:
+                if command not in stream['attributes']:
+                    return ['#Syntax error in command']
+                return reply(stream['attributes'][command])
+            stream['attributes'][command] = arguments
+            if command in ['PS_MODIFIERCOUNT', 'PS_MODIFIEREXTCOUNT']:
+                stream['modifiers'] = {k: v for k, v in stream['modifiers'].items()
+                                       if k[0] != command or k[1] < int(arguments)}
+        elif query:
+            if command not in port.attributes:
+                return ['#Syntax error in command']
+            return reply(port.attributes[command])
+        else:
+            port.attributes[command] = arguments
+        return ['<OK>']
+
+    #
+    # Private methods - traffic.
+    #
+
+    def _set_traffic(self, location, state):
+        port = self._get_port(location)
+        port.traffic = state
+        port.traffic_reads = 0
+        port.traffic_end = time.time()
+        if state != 'ON':
+            return
+        peer_location = '{}/{}'.format(location.split('/')[0], int(location.split('/')[1]) ^ 1)
+        peer = self._get_port(peer_location)
+        for sid, stream in port.streams.items():
+            attributes = stream['attributes']
+            if attributes['PS_ENABLE'] != 'ON':
+                continue
+            packets = int(attributes['PS_PACKETLIMIT'])
+            packets = packets if packets > 0 else int(attributes['PS_RATEPPS'])
+            port.traffic_end = max(port.traffic_end, time.time() + self.traffic_time_scale * packets /
+                                   max(1, float(attributes['PS_RATEPPS'])))
+            length = int(attributes['PS_PACKETLENGTH'].split()[1])
+            tx_packets, _ = port.stream_counters.get(sid, (0, length))
+            port.stream_counters[sid] = (tx_packets + packets, length)
+            for counter in ['PT_TOTAL', 'PT_NOTPLD' if int(attributes['PS_TPLDID']) < 0 else None]:
+                if counter:
+                    port.counters[counter][2] += packets * length
+                    port.counters[counter][3] += packets
+            tpld = int(attributes['PS_TPLDID'])
+            for counter in ['PR_TOTAL', 'PR_NOTPLD' if tpld < 0 else None]:
+                if counter:
+                    peer.counters[counter][2] += packets * length
+                    peer.counters[counter][3] += packets
+            if tpld >= 0:
+                tpld_stats = peer.tplds.setdefault(tpld, {c: [0] * n for c, n in tpld_counters.items()})
+                tpld_stats['PR_TPLDTRAFFIC'][2] += packets * length
+                tpld_stats['PR_TPLDTRAFFIC'][3] += packets
+            if peer.capture == 'ON':
+                header = binascii.unhexlify(attributes['PS_PACKETHEADER'][2:])
+                packet = header + bytes(max(0, length - 4 - len(header)))
+                for _ in range(min(packets, peer.capture_limit - len(peer.captured))):
+                    peer.captured.append((int(time.time() * 1e9), packet))
+
+    @staticmethod
+    def _get_traffic(port):
+        # Traffic runs for at least one p_traffic query so clients waiting for traffic to start will see it running.
+        port.traffic_reads += 1
+        if port.traffic == 'ON' and port.traffic_reads > 1 and time.time() >= port.traffic_end:
+            port.traffic = 'OFF'
+        return port.traffic
+
+    #
+    # Private methods - utilities.
+    #
+
+    def _get_port(self, location):
+        if location not in self.ports:
+            module, port = [int(i) for i in location.split('/')]
+            if module >= self.modules or port >= self.ports_per_module:
+                raise IndexError(location)
+            self.ports[location] = _Port()
+        return self.ports[location]
+
+    @staticmethod
+    def _new_stream():
+        return {'attributes': OrderedDict(stream_defaults), 'modifiers': {}}
+
+    @staticmethod
+    def _port_config(location, port):
+        return ['{}  {}  {}'.format(location, a, v) for a, v in port.attributes.items()]
+
+    @staticmethod
+    def _stream_config(location, port, sid):
+        stream = port.streams[sid]
+        lines = ['{}  {}  [{}]  {}'.format(location, a, sid, v) for a, v in stream['attributes'].items()]
+        for (count_attribute, mid), modifier in sorted(stream['modifiers'].items()):
+            for command, value in modifier.items():
+                lines.append('{}  {}  [{},{}]  {}'.format(location, command, sid, mid, value))
+        return lines
+
+    #
+    # Private methods - server.
+    #
+
+    def _accept(self):
+        while self._server:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._connections.append(connection)
+            thread = threading.Thread(target=self._serve, args=(connection,), name='XenaEmulatorConnection')
+            thread.daemon = True
+            thread.start()
+
+    def _serve(self, connection):
+        session = {}
+        partial = b''
+        while True:
+            try:
+                data = connection.recv(65536)
+            except OSError:
+                return
+            if not data:
+                connection.close()
+                return
+            lines = (partial + data).split(b'\n')
+            partial = lines.pop()
+            if not lines:
+                continue
+            if self.latency:
+                time.sleep(self.latency)
+            replies = []
+            for line in lines:
+                if self.processing:
+                    time.sleep(self.processing)
+                replies.extend(self.execute(session, line.decode('utf-8', 'replace')))
+            out = ''.join(r + '\n' for r in replies).encode('utf-8')
+            with self._lock:
+                self.commands += len([line for line in lines if line.strip() not in [b'', b'SYNC']])
+                self.round_trips += 1
+                self.bytes_received += len(data)
+                self.bytes_sent += len(out)
+            try:
+                connection.sendall(out)
+            except OSError:
+                return
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Xena chassis emulator')
+    parser.add_argument('--ip', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=22611)
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--processing', type=float, default=0)
+    parsed = parser.parse_args(args)
+    emulator = XenaEmulator(parsed.ip, parsed.port, parsed.latency, parsed.processing).start()
+    print('Xena emulator listening on {}:{}'.format(emulator.ip, emulator.port))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emulator.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
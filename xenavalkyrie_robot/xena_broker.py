@@ -0,0 +1,529 @@
+"""
+Chassis session broker for parallel (pabot) Xena Robot Framework execution.
+
+The broker is a local process that holds a pool of logged on chassis connections and serves XenaRobot instances over a
+local socket with the same CLI protocol as the chassis. Workers get port leases instead of chassis reservations:
+- c_logon/c_owner are answered by the broker, so workers do not pay chassis connection and logon time.
+- ports are reserved on the chassis by the broker owner and stay reserved (warm) after a worker releases them.
+- p_reservation/p_reservedby report the lease state, so a port leased by one worker is reserved by other for all other
+  workers and configuration commands on ports not leased by the worker are rejected with <NOTRESERVED>.
+- module configuration commands require leases on all ports of the module, chassis configuration commands (other than
+  c_traffic on leased ports) are rejected with <NOTVALID>.
+- all other commands (pipelined or not) are forwarded to one of the chassis connections, each worker is assigned to the
+  least loaded connection of the pool so commands of each worker keep their order.
+
+Start the broker and then run pabot with library argument broker=<ip:port>:
+    python -m xenavalkyrie_robot.xena_broker --port 22612
+    pabot --processes 8 --variable BROKER:127.0.0.1:22612 tests
+"""
+
+import re
+import time
+import socket
+import logging
+import argparse
+import threading
+
+from xenavalkyrie.api.xena_socket import XenaSocket
+
+from xenavalkyrie_robot.xena_pipeline import _LinesReader
+
+# Broker only command, first command on each worker connection - BROKER_CHASSIS <chassis ip> <chassis port>.
+broker_chassis_command = 'BROKER_CHASSIS'
+
+command_re = re.compile(r'^(?:(\d+)(?:/(\d+))?\s+)?([A-Za-z]\w*)\s*(\[[\d,\s]*\])?\s*(.*?)\s*$')
+
+
+def route_to_broker(api, broker):
+    """ Connect chassis of CLI API object through broker instead of directly.
+
+    :param api: CLI API object.
+    :type api: xenavalkyrie.api.xena_cli.XenaCliWrapper
+    :param broker: broker address - ip:port.
+    """
+    host, port = broker.rsplit(':', 1)
+
+    def add_chassis(chassis):
+        xena_socket = XenaSocket(api.logger, host, int(port))
+        xena_socket.connect()
+        api.sockets_list[chassis] = xena_socket
+        xena_socket.sendQueryVerify('{} {} {}'.format(broker_chassis_command, chassis.ip, chassis.port))
+        api.send_command(chassis, 'c_logon', '"{}"'.format(chassis.password))
+        api.send_command(chassis, 'c_owner', '"{}"'.format(chassis.owner))
+
+    api.add_chassis = add_chassis
+
+
+class XenaBroker(object):
+    """ Local chassis session broker. """
+
+    def __init__(self, ip='127.0.0.1', port=0, owner='xena_broker', connections=4, keepalive=10, logger=None):
+        """
+        :param ip: IP address to listen on.
+        :param port: TCP port to listen on, 0 - any free port (see self.port after start).
+        :param owner: owner name of the broker chassis sessions (ports are reserved by this owner).
+        :param connections: maximum number of connections per chassis.
+        :param keepalive: idle time in seconds before sending keep alive on chassis connections.
+        :param logger: python logger.
+        """
+        self.ip = ip
+        self.port = port
+        self.owner = owner
+        self.connections = int(connections)
+        self.keepalive = keepalive
+        self.logger = logger if logger else logging.getLogger('xena_broker')
+        self.counters = {'sessions': 0, 'forwarded': 0, 'local': 0}
+        self._chassis = {}
+        self._leases = {}
+        self._sessions = []
+        self._lock = threading.RLock()
+        self._server = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.ip, self.port))
+        self._server.listen(64)
+        self.port = self._server.getsockname()[1]
+        self._stop_event.clear()
+        for target, name in [(self._accept, 'XenaBroker'), (self._keep_alive, 'XenaBrokerKeepAlive')]:
+            thread = threading.Thread(target=target, name=name)
+            thread.daemon = True
+            thread.start()
+        self.logger.info('Broker listening on %s:%s', self.ip, self.port)
+        return self
+
+    def stop(self):
+        """ Stop serving workers, release all ports reserved by the broker and disconnect from all chassis. """
+        self._stop_event.set()
+        if self._server:
+            self._server.close()
+            self._server = None
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+            pools, self._chassis = list(self._chassis.values()), {}
+            self._leases = {}
+        for session in sessions:
+            session.close()
+        for pool in pools:
+            connections = [c for c in pool['connections'] if c.is_connected()]
+            if connections and pool['reserved']:
+                try:
+                    connections[0].execute(['{} p_reservation release'.format(location)
+                                            for location in pool['reserved']])
+                except IOError as e:
+                    self.logger.warning('Failed to release ports - %s', e)
+            for connection in connections:
+                connection.close()
+
+    def get_counters(self):
+        """
+        :return: dictionary {sessions, forwarded, local, chassis, connections, leases, reserved} - total sessions,
+            commands forwarded to chassis, commands answered by the broker, current number of chassis, chassis
+            connections, leased ports and ports reserved by the broker.
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            counters['chassis'] = len(self._chassis)
+            counters['connections'] = sum(len(p['connections']) for p in self._chassis.values())
+            counters['leases'] = len(self._leases)
+            counters['reserved'] = sum(len(p['reserved']) for p in self._chassis.values())
+            return counters
+
+    #
+    # Sessions services.
+    #
+
+    def logon(self, chassis, password):
+        """ Get chassis connection for new worker session, connect and logon to the chassis if needed.
+
+        :param chassis: (ip, port).
+        :return: chassis connection or None if password does not match the chassis password.
+        """
+        with self._lock:
+            pool = self._chassis.setdefault(chassis, {'password': password, 'connections': [], 'reserved': set(),
+                                                      'modules': {}, 'lock': threading.Lock()})
+        with pool['lock']:
+            if pool['connections'] and pool['password'] != password:
+                return None
+            connections = [c for c in pool['connections'] if c.is_connected()]
+            if len(connections) < self.connections and (not connections or min(c.users for c in connections)):
+                connections.append(_ChassisConnection(chassis, password, self.owner, self.logger))
+            pool['connections'] = connections
+            pool['password'] = password
+            connection = min(connections, key=lambda c: c.users)
+            connection.users += 1
+            return connection
+
+    def reserve(self, session, location):
+        """ Lease port to session, reserve the port on the chassis if it is not already reserved by the broker.
+
+        :return: reply lines.
+        """
+        key = session.chassis + (location,)
+        pool = self._chassis[session.chassis]
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease and lease is not session:
+                return ['<NOTVALID>']
+            self._leases[key] = session
+            if location in pool['reserved']:
+                return ['<OK>']
+        replies = session.connection.execute(['{} p_reservation reserve'.format(location)])[0]
+        with self._lock:
+            if replies == [XenaSocket.reply_ok]:
+                pool['reserved'].add(location)
+            elif self._leases.get(key) is session:
+                del self._leases[key]
+        return replies
+
+    def release(self, session, location, force=False):
+        """ Drop port lease, the port stays reserved by the broker.
+
+        :param force: True - drop lease of any session, False - drop only lease of session.
+        :return: True if lease was dropped.
+        """
+        key = session.chassis + (location,)
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease and (lease is session or force):
+                del self._leases[key]
+                return True
+        return False
+
+    def relinquish(self, session, location):
+        """ Relinquish port - drop lease of other session or relinquish reservation of other chassis user.
+
+        :return: reply lines.
+        """
+        if self.release(session, location, force=True):
+            return ['<OK>']
+        replies = session.connection.execute(['{} p_reservation relinquish'.format(location)])[0]
+        with self._lock:
+            self._chassis[session.chassis]['reserved'].discard(location)
+        return replies
+
+    def get_lease(self, session, location):
+        """
+        :return: session that holds the port lease or None.
+        """
+        with self._lock:
+            return self._leases.get(session.chassis + (location,))
+
+    def is_reserved(self, session, location):
+        """
+        :return: True if port is reserved by the broker.
+        """
+        with self._lock:
+            return location in self._chassis[session.chassis]['reserved']
+
+    def set_reserved(self, session, location):
+        with self._lock:
+            self._chassis[session.chassis]['reserved'].add(location)
+
+    def get_module_ports(self, session, module):
+        """ Get locations of all ports of module, module port count is read from the chassis once.
+
+        :return: list of port locations or None if the module port count could not be read.
+        """
+        pool = self._chassis[session.chassis]
+        with self._lock:
+            count = pool['modules'].get(module)
+        if count is None:
+            replies = session.connection.execute(['{} M_PORTCOUNT ?'.format(module)])[0]
+            if not replies or not replies[-1].split()[-1].isdigit():
+                return None
+            count = int(replies[-1].split()[-1])
+            with self._lock:
+                pool['modules'][module] = count
+        return ['{}/{}'.format(module, port) for port in range(count)]
+
+    def logoff(self, session):
+        """ Drop all session leases and detach the session from its chassis connection. """
+        with self._lock:
+            for key in [k for k, lease in self._leases.items() if lease is session]:
+                del self._leases[key]
+            if session.connection:
+                session.connection.users -= 1
+                session.connection = None
+
+    def end_session(self, session):
+        self.logoff(session)
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+
+    #
+    # Private methods.
+    #
+
+    def _accept(self):
+        while not self._stop_event.is_set():
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = _Session(self, connection)
+            with self._lock:
+                self._sessions.append(session)
+                self.counters['sessions'] += 1
+            thread = threading.Thread(target=session.serve, name='XenaBrokerSession')
+            thread.daemon = True
+            thread.start()
+
+    def _keep_alive(self):
+        while not self._stop_event.wait(1):
+            with self._lock:
+                connections = [c for p in self._chassis.values() for c in p['connections']]
+            for connection in connections:
+                if time.time() - connection.last_command_timestamp >= self.keepalive:
+                    try:
+                        connection.execute([])
+                    except IOError as e:
+                        self.logger.warning('Keep alive failed on %s - %s', connection, e)
+
+
+class _ChassisConnection(object):
+    """ Logged on chassis connection, shared by multiple sessions. """
+
+    def __init__(self, chassis, password, owner, logger):
+        self.chassis = chassis
+        self.users = 0
+        self.last_command_timestamp = time.time()
+        self._lock = threading.Lock()
+        self._sock = socket.create_connection(chassis, timeout=30)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = _LinesReader(self._sock)
+        replies = self.execute(['c_logon "{}"'.format(password), 'c_owner "{}"'.format(owner)])
+        if replies != [[XenaSocket.reply_ok]] * 2:
+            self.close()
+            raise IOError('Failed to logon to chassis {}:{} - {}'.format(chassis[0], chassis[1], replies))
+        logger.info('Broker connected to chassis %s:%s', *chassis)
+
+    def __str__(self):
+        return '{}:{}'.format(*self.chassis)
+
+    def is_connected(self):
+        return self._sock is not None
+
+    def execute(self, commands):
+        """ Send commands pipelined and read all replies.
+
+        :param commands: list of command lines, empty list - only synchronize (keep alive).
+        :return: list of reply lines per command.
+        """
+        with self._lock:
+            if not self._sock:
+                raise IOError('Chassis {} connection is closed'.format(self))
+            try:
+                self.last_command_timestamp = time.time()
+                self._sock.sendall(''.join('{}\nSYNC\n'.format(c) for c in commands).encode('utf-8')
+                                   if commands else b'SYNC\n')
+                results = []
+                for _ in commands or [None]:
+                    replies = []
+                    for reply in self._reader.lines():
+                        if reply.startswith('<SYNC>'):
+                            break
+                        replies.append(reply)
+                    results.append(replies)
+                return results if commands else []
+            except (OSError, IOError) as e:
+                self._sock.close()
+                self._sock = None
+                raise IOError('Chassis {} connection failed - {}'.format(self, e))
+
+    def close(self):
+        with self._lock:
+            if self._sock:
+                self._sock.close()
+                self._sock = None
+
+
+class _Session(object):
+    """ Single worker connection. """
+
+    def __init__(self, broker, sock):
+        self.broker = broker
+        self.sock = sock
+        self.chassis = None
+        self.owner = ''
+        self.connection = None
+
+    def __str__(self):
+        return self.owner
+
+    def serve(self):
+        partial = b''
+        try:
+            while True:
+                data = self.sock.recv(65536)
+                if not data:
+                    break
+                lines = (partial + data).split(b'\n')
+                partial = lines.pop()
+                if lines:
+                    replies = self.execute([line.decode('utf-8', 'replace').strip() for line in lines])
+                    self.sock.sendall(''.join(r + '\n' for r in replies).encode('utf-8'))
+        except (OSError, IOError) as e:
+            self.broker.logger.warning('Session %s closed - %s', self, e)
+        finally:
+            self.broker.end_session(self)
+            self.close()
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def execute(self, lines):
+        """ Execute batch of command lines - forwarded commands are sent to chassis together (pipelined).
+
+        :return: reply lines of all commands, in order.
+        """
+        replies = []
+        forward = []
+        local = 0
+        for line in lines:
+            handler = self._local_handler(line)
+            if handler is None:
+                slot = []
+                forward.append((line, slot))
+                replies.append(slot)
+                continue
+            local += 1
+            if callable(handler):
+                self._forward(forward)
+                handler = handler()
+            replies.append(handler)
+        self._forward(forward)
+        with self.broker._lock:
+            self.broker.counters['local'] += local
+            self.broker.counters['forwarded'] += len(lines) - local
+        return [reply for slot in replies for reply in slot]
+
+    def _forward(self, forward):
+        if forward:
+            for (_, slot), replies in zip(forward, self.connection.execute([line for line, _ in forward])):
+                slot.extend(replies)
+            del forward[:]
+
+    def _local_handler(self, line):
+        """
+        :return: None - forward line to chassis, list - local reply lines, callable - handler that must run after all
+            previous lines were forwarded and returns the reply lines.
+        """
+        if line.upper() == 'SYNC':
+            return ['<SYNC>']
+        match = command_re.match(line)
+        if not line or not match:
+            return None if self.connection else ['<NOTLOGGEDON>']
+        module, port, command, index, arguments = match.groups()
+        command = command.upper()
+        query = arguments.endswith('?')
+
+        if command == broker_chassis_command:
+            ip, chassis_port = arguments.split()
+            self.chassis = (ip, int(chassis_port))
+            return ['<OK>']
+        if command == 'C_LOGON':
+            return lambda: self._logon(arguments.strip('"'))
+        if not self.connection:
+            return ['<NOTLOGGEDON>']
+        if command == 'C_OWNER':
+            if query:
+                return ['C_OWNER  "{}"'.format(self.owner)]
+            self.owner = arguments.strip('"')
+            return ['<OK>']
+        if command == 'C_LOGOFF':
+            return self._logoff
+        if command == 'C_TRAFFIC':
+            values = arguments.split()
+            locations = ['{}/{}'.format(m, p) for m, p in zip(values[1::2], values[2::2])]
+            return None if all(self._leased(location) for location in locations) else ['<NOTRESERVED>']
+        if query and port is None:
+            return None
+        if module is None:
+            return ['<NOTVALID>']
+        if port is None:
+            return lambda: self._module_command(module, line)
+
+        location = '{}/{}'.format(module, port)
+        if command == 'P_RESERVATION':
+            if query:
+                return lambda: self._reservation(location, line)
+            action = arguments.lower()
+            if action == 'reserve':
+                return lambda: self.broker.reserve(self, location)
+            if action == 'relinquish':
+                return lambda: self.broker.relinquish(self, location)
+            return ['<OK>'] if self.broker.release(self, location) else ['<NOTRESERVED>']
+        if command == 'P_RESERVEDBY' and query:
+            lease = self.broker.get_lease(self, location)
+            return ['{}  P_RESERVEDBY  "{}"'.format(location, lease)] if lease else None
+        if not query and not self._leased(location):
+            return ['<NOTRESERVED>']
+        return None
+
+    def _logon(self, password):
+        if self.chassis is None:
+            return ['<NOTVALID>']
+        self.broker.logoff(self)
+        try:
+            self.connection = self.broker.logon(self.chassis, password)
+        except (OSError, IOError) as e:
+            self.broker.logger.warning('Failed to connect to chassis %s:%s - %s', self.chassis[0], self.chassis[1], e)
+            return ['<NOTLOGGEDON>']
+        return ['<OK>'] if self.connection else ['<BADVALUE>']
+
+    def _logoff(self):
+        self.broker.logoff(self)
+        return ['<OK>']
+
+    def _module_command(self, module, line):
+        locations = self.broker.get_module_ports(self, module)
+        if locations is None:
+            return ['<NOTVALID>']
+        if not all(self._leased(location) for location in locations):
+            return ['<NOTRESERVED>']
+        return self.connection.execute([line])[0]
+
+    def _reservation(self, location, line):
+        lease = self.broker.get_lease(self, location)
+        if lease:
+            state = 'RESERVED_BY_YOU' if lease is self else 'RESERVED_BY_OTHER'
+        elif self.broker.is_reserved(self, location):
+            state = 'RELEASED'
+        else:
+            replies = self.connection.execute([line])[0]
+            if not replies or not replies[-1].endswith('RESERVED_BY_YOU'):
+                return replies
+            self.broker.set_reserved(self, location)
+            state = 'RELEASED'
+        return ['{}  P_RESERVATION  {}'.format(location, state)]
+
+    def _leased(self, location):
+        return self.broker.get_lease(self, location) is self
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Xena chassis session broker')
+    parser.add_argument('--ip', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=22612)
+    parser.add_argument('--owner', default='xena_broker')
+    parser.add_argument('--connections', type=int, default=4)
+    parsed = parser.parse_args(args)
+    logging.basicConfig(level=logging.INFO)
+    broker = XenaBroker(parsed.ip, parsed.port, parsed.owner, parsed.connections).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        broker.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Caches for Xena Robot Framework library.
+
+Port and stream attributes cache - static (configuration) attributes values are kept for TTL seconds, or until the
+port configuration is changed by the library. Dynamic attributes - traffic state, reservation, sync, capture state and
+statistics - are never cached.
+File cache - objects built from files (parsed configurations, decoded captures) are kept as long as the file is not
+modified.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Attributes (or attributes prefixes) that change without configuration change.
+dynamic_attributes = ('p_traffic', 'p_reservation', 'p_reservedby', 'p_receivesync', 'p_status', 'p_capture',
+                      'p_fullconfig', 'p_info', 'ps_state', 'pc_', 'pt_', 'pr_')
+
+
+class XenaAttributesCache(object):
+    """ TTL cache of attributes values - {(port, stream index, attribute): (expiry time, value)}. """
+
+    def __init__(self, ttl=0):
+        """
+        :param ttl: time to keep values in seconds, 0 - cache is disabled.
+        """
+        self.ttl = float(ttl)
+        self.hits = 0
+        self.misses = 0
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, port, sid, attribute):
+        """
+        :param port: port object.
+        :param sid: stream index, None for port attributes.
+        :param attribute: attribute name.
+        :return: cached value or None if the value is not cached, expired or the attribute is not cacheable.
+        """
+        if not self._cacheable(attribute):
+            return None
+        with self._lock:
+            expiry, value = self._values.get((port, sid, attribute.lower()), (0, None))
+            if expiry > time.monotonic():
+                self.hits += 1
+                return value
+            self.misses += 1
+            return None
+
+    def put(self, port, sid, attribute, value):
+        if self._cacheable(attribute):
+            with self._lock:
+                self._values[(port, sid, attribute.lower())] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, port):
+        """ Drop all cached attributes of port and its streams. """
+        with self._lock:
+            for key in [k for k in self._values if k[0] is port]:
+                del self._values[key]
+
+    def clear(self):
+        with self._lock:
+            self._values = {}
+
+    def get_counters(self):
+        """
+        :return: dictionary {hits, misses, size}.
+        """
+        with self._lock:
+            now = time.monotonic()
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len([expiry for expiry, _ in self._values.values() if expiry > now])}
+
+    def reset_counters(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def _cacheable(self, attribute):
+        return self.ttl > 0 and not attribute.lower().startswith(dynamic_attributes)
+
+
+class XenaFileCache(object):
+    """ LRU cache of objects built from files - {file name: ((modification time, size), object)}. """
+
+    def __init__(self, load, size):
+        """
+        :param load: function that builds the object from file, called as load(file name).
+        :param size: maximum number of cached files.
+        """
+        self.load = load
+        self.size = size
+        self._objects = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_name):
+        """ Get object of file, build it only if it was not built before or the file changed since.
+
+        :param file_name: file name.
+        """
+        file_name = os.path.abspath(file_name)
+        file_stat = os.stat(file_name)
+        key = (file_stat.st_mtime_ns, file_stat.st_size)
+        with self._lock:
+            cached = self._objects.get(file_name)
+            if cached and cached[0] == key:
+                self._objects.move_to_end(file_name)
+                return cached[1]
+        loaded = self.load(file_name)
+        with self._lock:
+            self._objects[file_name] = (key, loaded)
+            self._objects.move_to_end(file_name)
+            while len(self._objects) > self.size:
+                self._objects.popitem(last=False)
+        return loaded
@@ -0,0 +1,121 @@
+"""
+Parsed xpc configurations for Xena Robot Framework library.
+
+Configuration files are parsed once and cached so the same configuration can be compared against port state (the last
+loaded configuration or a fresh p_fullconfig read) and only the commands that differ are sent to the port.
+"""
+
+import re
+from collections import OrderedDict
+
+from xenavalkyrie_robot.xena_cache import XenaFileCache
+
+line_re = re.compile(r'^(\w+)\s*(?:\[([\d,\s]*)\])?\s*(.*?)\s*$')
+
+# When the key command is sent, the dependent commands (same index) must be sent as well.
+dependent_commands = {'PS_HEADERPROTOCOL': ['PS_PACKETHEADER']}
+
+# Status commands reported by p_fullconfig that are not configuration settings.
+read_only_commands = ['P_SPEED']
+
+
+class XpcConfig(object):
+    """ Parsed port configuration - ordered {(command, index): (value, line)}. """
+
+    def __init__(self, lines):
+        """
+        :param lines: configuration lines (xpc file lines or p_fullconfig output without port index).
+        """
+        self.reset = False
+        self.entries = OrderedDict()
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith(';'):
+                continue
+            command, index, value = line_re.match(line).groups()
+            command = command.upper()
+            if command == 'P_RESET':
+                self.reset = True
+                continue
+            index = re.sub(r'\s', '', index) if index is not None else None
+            self.entries[(command, index)] = (' '.join(value.split()), line)
+
+    @property
+    def commands(self):
+        """
+        :return: all configuration lines as loaded by full load.
+        """
+        return (['P_RESET'] if self.reset else []) + [line for _, line in self.entries.values()]
+
+    def diff(self, state):
+        """ Get commands required to bring port from state to this configuration.
+
+        Objects (streams, modifiers, filters...) created by changed indices/count commands are treated as new so all
+        their commands are sent.
+        Settings of state that this configuration does not set (and does not delete with indices/count commands) are
+        not reset by incremental load, in this case the port must be fully loaded (with P_RESET).
+
+        :param state: current port configuration.
+        :type state: XpcConfig
+        :return: list of configuration lines to send, in configuration order, or None if full load is required.
+        """
+        if not self.covers(state):
+            return None
+        old = OrderedDict((key, value) for key, (value, _) in state.entries.items())
+        for (command, index), (value, _) in self.entries.items():
+            old_value = old.get((command, index))
+            if old_value == value:
+                continue
+            if command.endswith('_INDICES'):
+                prefix = command[:-len('INDICES')]
+                created = set(value.split()) - set(old_value.split() if old_value else [])
+                for key in [k for k in old if k[0].startswith(prefix) and k[1] and k[1].split(',')[0] in created]:
+                    del old[key]
+            elif command in ['PS_MODIFIERCOUNT', 'PS_MODIFIEREXTCOUNT']:
+                for key in [k for k in old if k[1] and k[1].startswith(index + ',')]:
+                    del old[key]
+            for dependent in dependent_commands.get(command, []):
+                old.pop((dependent, index), None)
+        return [line for key, (value, line) in self.entries.items() if old.get(key) != value]
+
+    def covers(self, state):
+        """ Check if this configuration sets or deletes every setting of state.
+
+        Read only commands and zero counts/empty indices (same as after P_RESET) do not have to be set.
+
+        :param state: current port configuration.
+        :type state: XpcConfig
+        """
+        indices = dict((command[:-len('INDICES')], value.split()) for (command, _), (value, _) in self.entries.items()
+                       if command.endswith('_INDICES'))
+        for (command, index), (value, _) in state.entries.items():
+            if (command, index) in self.entries or command in read_only_commands:
+                continue
+            if command.endswith(('COUNT', '_INDICES')) and value in ['0', '']:
+                continue
+            ids = index.split(',') if index else []
+            if ids and any(command.startswith(prefix) and ids[0] not in values for prefix, values in indices.items()):
+                continue
+            if len(ids) == 2 and command.startswith('PS_MODIFIER'):
+                count = 'PS_MODIFIEREXTCOUNT' if command.startswith('PS_MODIFIEREXT') else 'PS_MODIFIERCOUNT'
+                if int(ids[1]) >= int(self.entries.get((count, ids[0]), ('0', None))[0]):
+                    continue
+            return False
+        return True
+
+
+def get_xpc_config(file_name):
+    """ Get parsed xpc configuration, parse the file only if it was not parsed before or changed since.
+
+    :param file_name: xpc file name.
+    :rtype: XpcConfig
+    """
+    return _configs_cache.get(file_name)
+
+
+def _read_xpc_config(file_name):
+    with open(file_name) as f:
+        return XpcConfig(f.read().splitlines())
+
+
+_configs_cache = XenaFileCache(_read_xpc_config, 32)
@@ -0,0 +1,110 @@
+"""
+Logging configuration for Xena Robot Framework library.
+
+Every chassis command and reply is logged at DEBUG level. To keep logging off the command hot path:
+- records below the configured level are dropped by the logger before they are created.
+- in asynchronous mode records are passed through a queue and formatted and written by a background thread.
+- DEBUG records can be rate limited, dropped records are counted and reported with the next written DEBUG record.
+"""
+
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+log_levels = {'NONE': logging.CRITICAL + 1,
+              'ERROR': logging.ERROR,
+              'WARNING': logging.WARNING,
+              'INFO': logging.INFO,
+              'DEBUG': logging.DEBUG}
+
+
+def configure_logger(logger, level='DEBUG', asynchronous=False, debug_rate=0, stream=None):
+    """ Configure library logger, replacing handlers installed by previous configuration.
+
+    Handlers added by the user are kept and in this case no handler is installed.
+
+    :param logger: python logger.
+    :param level: NONE/ERROR/WARNING/INFO/DEBUG.
+    :param asynchronous: True - format and write records in background thread, False - write inline.
+    :param debug_rate: maximum number of DEBUG records per second, 0 - unlimited.
+    :param stream: output stream, default sys.stdout.
+    """
+    if str(level).upper() not in log_levels:
+        raise ValueError('Invalid log level {}, valid levels - {}'.format(level, list(log_levels)))
+    logger.setLevel(log_levels[str(level).upper()])
+    for handler in [h for h in logger.handlers if isinstance(h, (_XenaStreamHandler, _XenaQueueHandler))]:
+        logger.removeHandler(handler)
+        handler.close()
+    if logger.handlers:
+        return
+
+    handler = _XenaStreamHandler(stream if stream else sys.stdout)
+    if asynchronous:
+        handler = _XenaQueueHandler(handler)
+    if int(debug_rate):
+        handler.addFilter(_DebugRateFilter(int(debug_rate)))
+    logger.addHandler(handler)
+
+
+class _XenaStreamHandler(logging.StreamHandler):
+    """ Stream handler installed by the library (so it can be replaced on reconfiguration). """
+    pass
+
+
+class _XenaQueueHandler(QueueHandler):
+    """ Queue handler with its own background listener.
+
+    Unlike the standard QueueHandler, records are not formatted in the calling thread - formatting is done by the
+    listener thread just before the record is written.
+    """
+
+    def __init__(self, target):
+        super().__init__(queue.SimpleQueue())
+        self.listener = QueueListener(self.queue, target)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def prepare(self, record):
+        return record
+
+    def close(self):
+        """ Write all queued records and stop the listener. """
+        if self.listener._thread:
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+        atexit.unregister(self.close)
+        super().close()
+
+
+class _DebugRateFilter(logging.Filter):
+    """ Pass at most rate DEBUG records per second, other levels always pass. """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._window = 0
+        self._count = 0
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        window = int(time.monotonic())
+        with self._lock:
+            if window != self._window:
+                self._window = window
+                self._count = 0
+            if self._count >= self.rate:
+                self.dropped += 1
+                return False
+            self._count += 1
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            record.msg = '({} debug records dropped) {}'.format(dropped, record.msg)
+        return True
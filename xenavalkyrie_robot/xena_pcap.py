@@ -0,0 +1,308 @@
+"""
+Pure Python pcap utilities for Xena Robot Framework library.
+
+Write captured packets to pcap/pcapng files record by record so capture export does not require Wireshark and does
+not hold the capture buffer in memory.
+Analyze pcap/pcapng files in process - common L2-L4 fields are decoded once into columns and filters are evaluated
+over the columns.
+"""
+
+import os
+import re
+import mmap
+import socket
+import struct
+import operator
+from array import array
+from itertools import repeat
+from collections import OrderedDict
+
+from xenavalkyrie_robot.xena_cache import XenaFileCache
+
+LINKTYPE_ETHERNET = 1
+
+PCAP_MAGIC_USEC = 0xa1b2c3d4
+PCAP_MAGIC_NSEC = 0xa1b23c4d
+PCAPNG_SHB = 0x0a0d0d0a
+
+
+class PcapWriter(object):
+    """ Incremental pcap/pcapng writer.
+
+    File format is selected by file extension - pcapng for .pcapng files, else pcap (nanosecond resolution).
+    """
+
+    def __init__(self, file_name, snaplen=65535, linktype=LINKTYPE_ETHERNET):
+        """
+        :param file_name: output file name.
+        :param snaplen: maximum number of bytes to save per packet.
+        :param linktype: packets link type.
+        """
+
+        self.snaplen = snaplen
+        self.pcapng = os.path.splitext(file_name)[1].lower() == '.pcapng'
+        self.packets = 0
+        self._file = open(file_name, 'wb')
+        if self.pcapng:
+            self._write_block(0x0a0d0d0a, struct.pack('<IHHq', 0x1a2b3c4d, 1, 0, -1))
+            # if_tsresol option (9) = nanoseconds.
+            options = struct.pack('<HHB3x', 9, 1, 9) + struct.pack('<HH', 0, 0)
+            self._write_block(0x00000001, struct.pack('<HHI', linktype, 0, snaplen) + options)
+        else:
+            self._file.write(struct.pack('<IHHiIII', PCAP_MAGIC_NSEC, 2, 4, 0, 0, snaplen, linktype))
+
+    def write(self, packet, timestamp=0, orig_len=None):
+        """ Write single packet record.
+
+        :param packet: packet bytes.
+        :param timestamp: packet timestamp in nanoseconds.
+        :param orig_len: original packet length, if None - len(packet).
+        """
+
+        orig_len = orig_len if orig_len else len(packet)
+        packet = packet[:self.snaplen]
+        if self.pcapng:
+            padding = b'\x00' * (-len(packet) % 4)
+            body = struct.pack('<IIIII', 0, timestamp >> 32, timestamp & 0xffffffff, len(packet), orig_len)
+            self._write_block(0x00000006, body + packet + padding)
+        else:
+            seconds, nanoseconds = divmod(timestamp, 1000000000)
+            self._file.write(struct.pack('<IIII', seconds, nanoseconds, len(packet), orig_len))
+            self._file.write(packet)
+        self.packets += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    #
+    # Private methods.
+    #
+
+    def _write_block(self, block_type, body):
+        length = 12 + len(body)
+        self._file.write(struct.pack('<II', block_type, length) + body + struct.pack('<I', length))
+
+
+class PcapFilterError(ValueError):
+    pass
+
+
+class PcapIndex(object):
+    """ Decoded columns of all packets in pcap/pcapng file.
+
+    Supported filter fields (Wireshark names) - frame.len, eth.src, eth.dst, eth.type, vlan.id, vlan.priority,
+    ip.src, ip.dst, ip.proto, ip.ttl, ipv6.src, ipv6.dst, ipv6.nxt, ipv6.hlim, tcp.srcport, tcp.dstport, udp.srcport,
+    udp.dstport and protocols names eth, vlan, ip, ipv6, tcp, udp.
+    """
+
+    protocols = ['eth', 'vlan', 'ip', 'ipv6', 'tcp', 'udp']
+
+    fields = OrderedDict([('frame.len', ('frame', 'I', int)),
+                          ('eth.dst', ('eth', 'Q', '_mac')),
+                          ('eth.src', ('eth', 'Q', '_mac')),
+                          ('eth.type', ('eth', 'I', int)),
+                          ('vlan.id', ('vlan', 'I', int)),
+                          ('vlan.priority', ('vlan', 'I', int)),
+                          ('ip.src', ('ip', 'I', '_ip')),
+                          ('ip.dst', ('ip', 'I', '_ip')),
+                          ('ip.proto', ('ip', 'I', int)),
+                          ('ip.ttl', ('ip', 'I', int)),
+                          ('ipv6.src', ('ipv6', None, '_ip6')),
+                          ('ipv6.dst', ('ipv6', None, '_ip6')),
+                          ('ipv6.nxt', ('ipv6', 'I', int)),
+                          ('ipv6.hlim', ('ipv6', 'I', int)),
+                          ('tcp.srcport', ('tcp', 'I', int)),
+                          ('tcp.dstport', ('tcp', 'I', int)),
+                          ('udp.srcport', ('udp', 'I', int)),
+                          ('udp.dstport', ('udp', 'I', int))])
+
+    operators = {'==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt,
+                 '>=': operator.ge}
+
+    filter_re = re.compile(r'^\s*(!?)\s*([\w.]+)\s*(?:(==|!=|<=|>=|<|>)\s*(\S+))?\s*$')
+
+    def __init__(self, file_name):
+        """ Read and decode all packets.
+
+        :param file_name: pcap/pcapng file name.
+        """
+
+        self.packets = 0
+        self.columns = {f: (array(t) if t else []) for f, (_, t, _) in self.fields.items()}
+        self.masks = {p: bytearray() for p in self.protocols}
+        if os.path.getsize(file_name):
+            with open(file_name, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    error = self._decode_all(data)
+            if error:
+                raise ValueError('Failed to read {} - {}'.format(file_name, error))
+        # Each packet is represented by one byte (0/1) of the masks so masks can be combined with integer operators.
+        self.masks = {p: int.from_bytes(m, 'little') for p, m in self.masks.items()}
+        self.masks['frame'] = int.from_bytes(b'\x01' * self.packets, 'little')
+
+    def count(self, *filters):
+        """ Count packets that match all filters.
+
+        :param filters: list of filters - field presence (ip.src), negated presence (!vlan) or comparison
+                        (ip.src == 1.1.1.1, udp.dstport != 53). Each filter may contain multiple && separated terms.
+        :return: number of matching packets.
+        """
+        mask = self.masks['frame']
+        for read_filter in filters:
+            for term in read_filter.split('&&'):
+                mask &= self._evaluate(term)
+        return bin(mask).count('1')
+
+    #
+    # Private methods.
+    #
+
+    def _evaluate(self, term):
+        match = self.filter_re.match(term)
+        if not match or (match.group(2) not in self.fields and match.group(2) not in self.protocols):
+            raise PcapFilterError('Unsupported filter {}'.format(term))
+        negate, field, op, value = match.groups()
+        protocol = field if field in self.protocols else self.fields[field][0]
+        mask = self.masks[protocol]
+        if op:
+            if field in self.protocols:
+                raise PcapFilterError('Protocol {} can not be compared'.format(field))
+            converter = self.fields[field][2]
+            try:
+                value = getattr(self, converter)(value) if isinstance(converter, str) else int(value, 0)
+            except Exception as e:
+                raise PcapFilterError('Invalid value in filter {} - {}'.format(term, e))
+            results = bytes(map(self.operators[op], self.columns[field], repeat(value)))
+            mask &= int.from_bytes(results, 'little')
+        return self.masks['frame'] ^ mask if negate else mask
+
+    def _decode_all(self, data):
+        # Separate method so all memoryviews into data are released before the mmap is closed, errors are returned and
+        # not raised because the traceback would keep the memoryviews alive.
+        try:
+            for packet, orig_len in _read_records(data):
+                self._decode(packet, orig_len)
+        except ValueError as e:
+            return str(e)
+        return None
+
+    def _decode(self, packet, orig_len):
+        values = dict.fromkeys(self.fields, 0)
+        values['ipv6.src'] = values['ipv6.dst'] = b''
+        present = dict.fromkeys(self.protocols, 0)
+        values['frame.len'] = orig_len
+        if len(packet) >= 14:
+            present['eth'] = 1
+            values['eth.dst'] = int.from_bytes(packet[0:6], 'big')
+            values['eth.src'] = int.from_bytes(packet[6:12], 'big')
+            eth_type, = struct.unpack_from('>H', packet, 12)
+            offset = 14
+            while eth_type in (0x8100, 0x88a8, 0x9100) and len(packet) >= offset + 4:
+                tci, next_type = struct.unpack_from('>HH', packet, offset)
+                if not present['vlan']:
+                    present['vlan'] = 1
+                    values['vlan.priority'] = tci >> 13
+                    values['vlan.id'] = tci & 0xfff
+                eth_type = next_type
+                offset += 4
+            values['eth.type'] = eth_type
+            l4_proto = None
+            if eth_type == 0x0800 and len(packet) >= offset + 20:
+                present['ip'] = 1
+                ver_ihl, ttl, l4_proto = packet[offset], packet[offset + 8], packet[offset + 9]
+                values['ip.ttl'], values['ip.proto'] = ttl, l4_proto
+                values['ip.src'], values['ip.dst'] = struct.unpack_from('>II', packet, offset + 12)
+                fragment_offset = struct.unpack_from('>H', packet, offset + 6)[0] & 0x1fff
+                l4_proto = None if fragment_offset else l4_proto
+                offset += (ver_ihl & 0x0f) * 4
+            elif eth_type == 0x86dd and len(packet) >= offset + 40:
+                present['ipv6'] = 1
+                l4_proto, hlim = packet[offset + 6], packet[offset + 7]
+                values['ipv6.nxt'], values['ipv6.hlim'] = l4_proto, hlim
+                values['ipv6.src'] = bytes(packet[offset + 8:offset + 24])
+                values['ipv6.dst'] = bytes(packet[offset + 24:offset + 40])
+                offset += 40
+            if l4_proto in (6, 17) and len(packet) >= offset + 4:
+                l4 = 'tcp' if l4_proto == 6 else 'udp'
+                present[l4] = 1
+                values[l4 + '.srcport'], values[l4 + '.dstport'] = struct.unpack_from('>HH', packet, offset)
+        for field, value in values.items():
+            self.columns[field].append(value)
+        for protocol, mask in self.masks.items():
+            mask.append(present[protocol])
+        self.packets += 1
+
+    @staticmethod
+    def _mac(value):
+        return int(re.sub('[:.-]', '', value), 16)
+
+    @staticmethod
+    def _ip(value):
+        return struct.unpack('>I', socket.inet_aton(value))[0]
+
+    @staticmethod
+    def _ip6(value):
+        return socket.inet_pton(socket.AF_INET6, value)
+
+
+def get_pcap_index(file_name):
+    """ Get decoded pcap index, decode the file only if it was not decoded before or changed since.
+
+    :param file_name: pcap/pcapng file name.
+    :rtype: PcapIndex
+    """
+    return _indices_cache.get(file_name)
+
+
+_indices_cache = XenaFileCache(PcapIndex, 8)
+
+
+def _read_records(data):
+    """ Iterate over pcap/pcapng records.
+
+    :param data: pcap/pcapng file content (mmap).
+    :return: generator of (packet memoryview, original length).
+    :raises ValueError: if a block or record length is invalid or exceeds the file.
+    """
+    if len(data) < 24:
+        raise ValueError('Not a pcap/pcapng file')
+    view = memoryview(data)
+    magic, = struct.unpack_from('<I', data, 0)
+    if magic == PCAPNG_SHB:
+        offset = 0
+        endian = '<' if struct.unpack_from('<I', data, 8)[0] == 0x1a2b3c4d else '>'
+        while offset + 12 <= len(data):
+            block_type, length = struct.unpack_from(endian + 'II', data, offset)
+            if length < 12 or length % 4 or offset + length > len(data):
+                raise ValueError('Invalid pcapng block length {} at offset {}'.format(length, offset))
+            if block_type == 0x00000006:
+                if length < 32:
+                    raise ValueError('Invalid pcapng packet block length {} at offset {}'.format(length, offset))
+                captured_len, orig_len = struct.unpack_from(endian + 'II', data, offset + 20)
+                if 32 + captured_len > length:
+                    raise ValueError('Invalid pcapng packet length {} at offset {}'.format(captured_len, offset))
+                yield view[offset + 28:offset + 28 + captured_len], orig_len
+            elif block_type == 0x00000003:
+                orig_len, = struct.unpack_from(endian + 'I', data, offset + 8)
+                yield view[offset + 12:offset + min(length - 4, 12 + orig_len)], orig_len
+            offset += length
+        return
+    if magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+        endian = '<'
+    elif struct.unpack_from('>I', data, 0)[0] in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+        endian = '>'
+    else:
+        raise ValueError('Not a pcap/pcapng file')
+    offset = 24
+    while offset + 16 <= len(data):
+        captured_len, orig_len = struct.unpack_from(endian + 'II', data, offset + 8)
+        if offset + 16 + captured_len > len(data):
+            raise ValueError('Invalid pcap packet length {} at offset {}'.format(captured_len, offset))
+        yield view[offset + 16:offset + 16 + captured_len], orig_len
+        offset += 16 + captured_len
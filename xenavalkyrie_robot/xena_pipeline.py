@@ -0,0 +1,90 @@
+"""
+Pipelined CLI commands for Xena Robot Framework library.
+
+Send a batch of CLI commands on the chassis socket without waiting for each reply, then match replies to commands in
+order. Each command is followed by SYNC so single line replies, multi line replies and errors are all delimited by the
+<SYNC> reply.
+"""
+
+import time
+from collections import deque
+
+from trafficgenerator.tgn_utils import TgnError
+from xenavalkyrie.api.xena_socket import XenaSocket
+
+
+class XenaPipelineError(TgnError):
+    pass
+
+
+def send_pipelined(chassis, commands, window=100):
+    """ Send list of CLI commands pipelined on chassis socket.
+
+    :param chassis: chassis object.
+    :type chassis: xenavalkyrie.xena_app.XenaChassis
+    :param commands: list of full CLI commands (module/port command [index] arguments).
+    :param window: maximum number of commands to send before reading their replies.
+    :return: list of (reply lines, error) per command, error is None for successful commands. Set commands succeed
+        only with <OK> reply (same as sendQueryVerify), queries fail on chassis errors and status replies (<...>).
+    """
+
+    sockets_list = getattr(chassis.api, 'sockets_list', None)
+    if sockets_list is None:
+        raise XenaPipelineError('Pipelined commands require socket API')
+    xena_socket = sockets_list[chassis]
+    if not xena_socket.is_connected():
+        raise XenaPipelineError('Pipelined commands on disconnected chassis {}'.format(chassis))
+
+    results = []
+    xena_socket.access_semaphor.acquire()
+    try:
+        reader = _LinesReader(xena_socket.bsocket.sock)
+        for first in range(0, len(commands), int(window)):
+            batch = commands[first:first + int(window)]
+            xena_socket.last_command_timestamp = time.time()
+            xena_socket.bsocket.sock.sendall(''.join('{}\nSYNC\n'.format(c.strip()) for c in batch).encode('utf-8'))
+            for command in batch:
+                replies = []
+                for reply in reader.lines():
+                    if reply.startswith('<SYNC>'):
+                        break
+                    if '---^' not in reply and '^---' not in reply:
+                        replies.append(reply)
+                results.append((replies, _reply_error(command, replies)))
+    except Exception as e:
+        xena_socket.bsocket.disconnect()
+        raise IOError('Failed to read pipelined replies, error: {}'.format(e))
+    finally:
+        xena_socket.access_semaphor.release()
+    return results
+
+
+def _reply_error(command, replies):
+    """
+    :return: the error reply of command or None if the command succeeded.
+    """
+    if command.strip().endswith('?'):
+        return next((r for r in replies if r.startswith(XenaSocket.reply_errors + ('<',))), None)
+    if replies != [XenaSocket.reply_ok]:
+        return next((r for r in replies if r != XenaSocket.reply_ok), '<NOREPLY>')
+    return None
+
+
+class _LinesReader(object):
+    """ Read lines from socket. """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.partial = b''
+        self.complete = deque()
+
+    def lines(self):
+        while True:
+            while not self.complete:
+                data = self.sock.recv(65536)
+                if not data:
+                    raise IOError('Connection closed by chassis')
+                lines = (self.partial + data).split(b'\n')
+                self.partial = lines.pop()
+                self.complete.extend(lines)
+            yield self.complete.popleft().decode('utf-8').strip('\r')
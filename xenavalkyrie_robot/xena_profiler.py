@@ -0,0 +1,162 @@
+"""
+Keywords instrumentation for Xena Robot Framework library.
+
+When enabled, each keyword call records wall time, number of chassis commands, bytes sent to and received from the
+chassis and local processing time - wall time minus the time spent waiting for chassis replies. Chassis traffic is
+counted on the chassis sockets so all access paths (API calls, pipelined commands etc.) are counted.
+
+When disabled the library methods are not wrapped at all.
+"""
+
+import json
+import time
+import functools
+import threading
+from collections import OrderedDict
+
+counters_names = ['commands', 'bytes_sent', 'bytes_received', 'wait']
+
+
+class XenaProfiler(object):
+    """ Collect per keyword performance counters. Also serves as library listener to write the report at suite end. """
+
+    ROBOT_LISTENER_API_VERSION = 3
+
+    def __init__(self, file_name=None):
+        """
+        :param file_name: optional json file to write the report to when the library goes out of scope.
+        """
+        self.file_name = file_name
+        self.keywords = OrderedDict()
+        self.counters = dict.fromkeys(counters_names, 0)
+        self._lock = threading.Lock()
+        self._active = 0
+
+    def instrument(self, library, sockets, exclude=()):
+        """ Wrap all public methods of library object with counting wrappers.
+
+        :param library: library object.
+        :param sockets: method that returns list of all chassis XenaSocket objects.
+        :param exclude: list of methods names not to instrument.
+        """
+        for name in dir(library):
+            if name.startswith('_') or name in exclude or isinstance(getattr(type(library), name, None), property):
+                continue
+            method = getattr(library, name)
+            if callable(method):
+                setattr(library, name, self._wrap(_keyword_name(name), method, sockets))
+
+    def get_report(self):
+        """
+        :return: dictionary {keyword: {calls, wall, local, wait, commands, bytes_sent, bytes_received, max}}, times
+            are in seconds and are the sum of all keyword calls.
+        """
+        with self._lock:
+            return OrderedDict((k, OrderedDict(v)) for k, v in self.keywords.items())
+
+    def reset(self):
+        with self._lock:
+            self.keywords = OrderedDict()
+
+    def write(self, file_name):
+        with open(file_name, 'w') as f:
+            json.dump(self.get_report(), f, indent=2)
+
+    def close(self):
+        """ Robot listener - called when the library goes out of scope. """
+        if self.file_name:
+            self.write(self.file_name)
+
+    #
+    # Counters updates - called from chassis sockets.
+    #
+
+    def sent(self, data):
+        commands = sum(1 for line in data.split(b'\n')[:-1] if line.strip() and line.strip() != b'SYNC')
+        with self._lock:
+            self.counters['commands'] += commands
+            self.counters['bytes_sent'] += len(data)
+
+    def received(self, data, wait):
+        with self._lock:
+            self.counters['bytes_received'] += len(data)
+            self.counters['wait'] += wait
+
+    #
+    # Private methods.
+    #
+
+    def _wrap(self, name, method, sockets):
+
+        @functools.wraps(method)
+        def keyword(*args, **kwargs):
+            with self._lock:
+                self._active += 1
+                outer = self._active == 1
+                before = dict(self.counters)
+            try:
+                if not outer:
+                    return method(*args, **kwargs)
+                self._attach(sockets())
+                start = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    self._attach(sockets())
+                    self._record(name, time.perf_counter() - start, before)
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+        return keyword
+
+    def _attach(self, sockets):
+        for xena_socket in sockets:
+            sock = xena_socket.bsocket.sock
+            if sock is not None and not isinstance(sock, _CountingSocket):
+                xena_socket.bsocket.sock = _CountingSocket(sock, self)
+
+    def _record(self, name, wall, before):
+        with self._lock:
+            stats = self.keywords.setdefault(name, OrderedDict([('calls', 0), ('wall', 0.0), ('local', 0.0),
+                                                                ('wait', 0.0), ('commands', 0), ('bytes_sent', 0),
+                                                                ('bytes_received', 0), ('max', 0.0)]))
+            delta = {c: self.counters[c] - before[c] for c in counters_names}
+            stats['calls'] += 1
+            stats['wall'] += wall
+            stats['wait'] += delta['wait']
+            stats['local'] += max(0.0, wall - delta['wait'])
+            stats['commands'] += delta['commands']
+            stats['bytes_sent'] += delta['bytes_sent']
+            stats['bytes_received'] += delta['bytes_received']
+            stats['max'] = max(stats['max'], wall)
+
+
+class _CountingSocket(object):
+    """ Socket wrapper that reports sent/received data to profiler. """
+
+    def __init__(self, sock, profiler):
+        self._sock = sock
+        self._profiler = profiler
+
+    def send(self, data):
+        sent = self._sock.send(data)
+        self._profiler.sent(bytes(data[:sent]))
+        return sent
+
+    def sendall(self, data):
+        self._sock.sendall(data)
+        self._profiler.sent(bytes(data))
+
+    def recv(self, size):
+        start = time.perf_counter()
+        data = self._sock.recv(size)
+        self._profiler.received(data, time.perf_counter() - start)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+def _keyword_name(method_name):
+    return ' '.join(word.capitalize() for word in method_name.split('_'))
@@ -9,28 +9,36 @@ Wrappers should follow:
 - try to avoid default values
 
 Limitations:
-- no multi chassis support
 - no multi-line support
 
 @author yoram@ignissoft.com
 """
 
 from __future__ import unicode_literals
-import sys
 import os
 import getpass
 import logging
 import re
+import binascii
+import ipaddress
+import pkgutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from importlib import import_module
 from collections import OrderedDict
-import site
 
-from trafficgenerator.tgn_utils import ApiType
-from xenavalkyrie.xena_app import init_xena
-from xenavalkyrie.xena_port import XenaCaptureBufferType
-from xenavalkyrie.xena_stream import XenaModifierType, XenaModifierAction
-from xenavalkyrie.xena_statistics_view import XenaPortsStats, XenaStreamsStats, XenaTpldsStats
-from xenavalkyrie.xena_tshark import Tshark, TsharkAnalyzer
+from trafficgenerator.tgn_utils import ApiType, TgnError
+from xenavalkyrie.api.xena_socket import XenaSocket
+
+from xenavalkyrie_robot.xena_sampler import XenaStatsSampler
+from xenavalkyrie_robot.xena_pcap import PcapWriter, PcapFilterError, get_pcap_index
+from xenavalkyrie_robot.xena_pipeline import send_pipelined
+from xenavalkyrie_robot.xena_config import XpcConfig, get_xpc_config
+from xenavalkyrie_robot.xena_profiler import XenaProfiler
+from xenavalkyrie_robot.xena_logging import configure_logger
+from xenavalkyrie_robot.xena_cache import XenaAttributesCache
+from xenavalkyrie_robot.xena_broker import route_to_broker
 
 __version__ = '0.4.0'
 ROBOT_LIBRARY_DOC_FORMAT = 'reST'
@@ -44,19 +52,69 @@ class XenaRobot():
     # Session management.
     #
 
-    def __init__(self, api='socket', user=None, ip=None, port=57911):
+    def __init__(self, api='socket', user=None, ip=None, port=57911, instrumentation=False, performance_report=None,
+                 log_level='DEBUG', async_logging=False, debug_rate=0, attributes_cache_ttl=0, broker=None):
         """ Create Xena Valkyrie app object.
 
+        | Library | XenaRobot | socket | robot | instrumentation=True | performance_report=${OUTPUT DIR}/perf.json |
+        | Library | XenaRobot | socket | robot | log_level=INFO | async_logging=True |
+        | Library | XenaRobot | socket | robot | attributes_cache_ttl=60 |
+        | Library | XenaRobot | socket | robot | broker=127.0.0.1:22612 |
+
         :param api: API type - socket or rest
         :param user: user name for session and login
         :param ip: optional REST server IP address
         :param port: optional REST server TCP port
+        :param instrumentation: True - collect per keyword performance counters (see Get Performance Report).
+        :param performance_report: json file to write performance report to at suite end, implies instrumentation.
+        :param log_level: NONE/ERROR/WARNING/INFO/DEBUG. DEBUG logs every chassis command and reply.
+        :param async_logging: True - format and write log records in background thread.
+        :param debug_rate: maximum number of DEBUG log records per second, 0 - unlimited.
+        :param attributes_cache_ttl: time in seconds to cache static port/stream attributes values read by Get Port/Stream
+            Attribute(s), 0 - no cache. Cached values of port are dropped when the port configuration is changed by the
+            library (see Get Attributes Cache Counters).
+        :param broker: optional chassis session broker address - ip:port (see xena_broker module). All chassis are
+            accessed through the broker, for parallel (pabot) execution with shared chassis connections and port
+            leases. Socket API only.
         """
-        user = user if user else getpass.getuser()
         self.logger = logging.getLogger('log')
-        self.logger.setLevel(logging.DEBUG)
-        self.logger.addHandler(logging.StreamHandler(sys.stdout))
-        self.xm = init_xena(ApiType[api], self.logger, user, ip, port)
+        configure_logger(self.logger, log_level, str(async_logging).lower() == 'true', debug_rate)
+        self._xm_args = (ApiType[api], user if user else getpass.getuser(), ip, port)
+        if broker and self._xm_args[0] != ApiType.socket:
+            raise ValueError('Broker is supported only with socket API')
+        self._broker = broker
+        self._xm = None
+        self._xm_lock = threading.Lock()
+        self.ports = OrderedDict()
+        self._ports_list = []
+        self._streams_index = {}
+        self._packet_edits = {}
+        self._aborted_packet_edits = set()
+        self._packet_headers = {}
+        self._streams_lock = threading.RLock()
+        self._ports_state = {}
+        self._attributes_cache = XenaAttributesCache(attributes_cache_ttl)
+        self._traffic_start = None
+        self._sampler = None
+        self.tshark = None
+        self._profiler = None
+        if instrumentation or performance_report:
+            self._profiler = XenaProfiler(performance_report)
+            self._profiler.instrument(self, self._sockets, exclude=['get_performance_report'])
+            self.ROBOT_LIBRARY_LISTENER = self._profiler
+
+    @property
+    def xm(self):
+        """ Xena app object, created on first access so loading the library (libdoc, dry-run...) is cheap. """
+        if not self._xm:
+            with self._xm_lock:
+                if not self._xm:
+                    api, user, ip, port = self._xm_args
+                    xm = _xena('xena_app').init_xena(api, self.logger, user, ip, port)
+                    if self._broker:
+                        route_to_broker(xm.session.api, self._broker)
+                    self._xm = xm
+        return self._xm
 
     def add_chassis(self, chassis='None', port=22611, password='xena'):
         """ Add chassis.
@@ -67,6 +125,17 @@ class XenaRobot():
         """
         self.xm.session.add_chassis(chassis, port, password)
 
+    def add_chassis_list(self, *chassis, port=22611, password='xena'):
+        """ Add multiple chassis, connect to all chassis concurrently.
+
+        :param chassis: list of chassis IP addresses
+        :param port: chassis port number (same for all chassis)
+        :param password: chassis password (same for all chassis)
+        """
+        session = self.xm.session
+        with ThreadPoolExecutor(max_workers=max(1, len(chassis))) as executor:
+            list(executor.map(lambda ip: session.add_chassis(ip, port, password), chassis))
+
     def reserve_ports(self, *locations):
         """ Reserve ports only if ports are released.
 
@@ -74,31 +143,81 @@ class XenaRobot():
 
         :param locations: list <ip/module/port> of port locations.
         """
-        self.ports = self.xm.session.reserve_ports(locations, force=False)
+        self._set_ports(self.xm.session.reserve_ports(locations, force=False))
 
     def reserve_ports_by_force(self, *locations):
         """ Reserve ports forcefully even if ports are reserved by other user.
 
         :param locations: list <ip/module/port> of port locations.
         """
-        self.ports = self.xm.session.reserve_ports(locations, force=True)
+        self._set_ports(self.xm.session.reserve_ports(locations, force=True))
 
     def release_ports(self, *ports):
-        """ Reserve list of ports.
+        """ Release list of ports.
 
-        :param ports: ports indices (zero based) or ports locations as used in reserve command. If empty - clear stats
-                      for all ports.
+        :param ports: ports indices (zero based) or ports locations as used in reserve command. If empty - release
+                      all ports.
         """
-        for port in self._port_names_or_indices_to_objects(*ports):
+        for port in self._port_names_or_indices_to_objects(*ports) if ports else list(self.ports.values()):
             port.release()
+            self._invalidate_streams(port)
 
     def load_config(self, port, config_file_name):
         """ Load configuration file onto port.
 
+        Configuration commands are pipelined, failed commands are logged as warnings.
+
         :param port: port index (zero based) or port location as used in reserve command.
         :param config_file_name: full path to configuration file name (xpc).
         """
-        self._port_name_or_index_to_object(port).load_config(config_file_name)
+        port_object = self._port_name_or_index_to_object(port)
+        config = get_xpc_config(config_file_name)
+        errors = self._send_port_lines(port_object, config.commands)
+        port_object.objects = OrderedDict()
+        self._invalidate_streams(port_object)
+        if not errors:
+            self._ports_state[port_object] = config
+
+    def load_config_incremental(self, port, config_file_name, refresh=False):
+        """ Load configuration file onto port, send only the commands that differ from the current port configuration.
+
+        Current port configuration is the last configuration loaded by Load Config or Load Config Incremental, as long
+        as the port was not changed since by other keywords. If it is unknown and refresh is True, it is read from the
+        port (single p_fullconfig query), else the configuration is fully loaded.
+        Incremental load does not reset the port, so if the current port configuration has settings that the new
+        configuration does not set, the configuration is fully loaded as well.
+
+        | &{result} = | Load Config Incremental | ${PORT} | ${CONFIG_FILE} |
+
+        :param port: port index (zero based) or port location as used in reserve command.
+        :param config_file_name: full path to configuration file name (xpc).
+        :param refresh: True - read port configuration if it is unknown, False - full load if it is unknown.
+        :return: dictionary {mode: full/incremental, sent: number of commands sent, skipped: number of commands
+            skipped}.
+        """
+        port_object = self._port_name_or_index_to_object(port)
+        config = get_xpc_config(config_file_name)
+        state = self._ports_state.get(port_object)
+        if state is None and refresh:
+            state = XpcConfig(line.split(' ', 1)[1] for line in
+                              port_object.send_command_return_multilines('p_fullconfig', '?'))
+        lines = config.diff(state) if state is not None else None
+        if lines is None:
+            self.load_config(port, config_file_name)
+            return OrderedDict([('mode', 'full'), ('sent', len(config.commands)), ('skipped', 0)])
+
+        errors = self._send_port_lines(port_object, lines)
+        if any(line.upper().startswith('PS_') for line in lines):
+            port_object.objects = OrderedDict()
+            self._invalidate_streams(port_object)
+        if not errors:
+            self._ports_state[port_object] = config
+        else:
+            self._invalidate_config(port_object)
+        self.logger.info('load %s on %s - sent %d, skipped %d', config_file_name, port_object, len(lines),
+                         len(config.commands) - len(lines))
+        return OrderedDict([('mode', 'incremental'), ('sent', len(lines)),
+                            ('skipped', len(config.commands) - len(lines))])
 
     def save_config(self, port, config_file_name):
         """ Save configuration file from port.
@@ -108,29 +227,120 @@ class XenaRobot():
         """
         self._port_name_or_index_to_object(port).save_config(config_file_name)
 
+    def load_configs(self, configs, *ports, workers=8, incremental=False):
+        """ Load configuration files onto multiple ports concurrently.
+
+        | Load Configs | ${CONFIG_FILE} | @{PORTS} |
+        | Load Configs | ${PORTS_CONFIGS} |
+        | Load Configs | ${CONFIG_FILE} | incremental=True |
+
+        :param configs: configuration file name (xpc) to load on all ports or dictionary {port: configuration file}.
+        :param ports: ports indices (zero based) or ports locations as used in reserve command. Used only when configs
+                      is a single file. If empty - load configuration on all ports.
+        :param workers: maximum number of ports to load concurrently.
+        :param incremental: True - load with Load Config Incremental, False - full load.
+        :return: dictionary {elapsed: load time}.
+        """
+        operation = self.load_config_incremental if incremental else self.load_config
+        return self._run_per_port(operation, self._ports_configs(configs, *ports), workers, 'load')
+
+    def save_configs(self, configs, *ports, workers=8):
+        """ Save configuration files from multiple ports concurrently.
+
+        :param configs: configuration file name (xpc) template, with {} as port index placeholder, or dictionary
+                        {port: configuration file}.
+        :param ports: ports indices (zero based) or ports locations as used in reserve command. Used only when configs
+                      is a single file template. If empty - save configuration from all ports.
+        :param workers: maximum number of ports to save concurrently.
+        :return: dictionary {elapsed: save time}.
+        """
+        return self._run_per_port(self.save_config, self._ports_configs(configs, *ports), workers, 'save')
+
     def clear_statistics(self, *ports):
         """ Clear statistics for list of ports.
 
         :param ports: ports indices (zero based) or ports locations as used in reserve command. If empty - clear stats
                       for all ports.
         """
-        self.xm.session.clear_stats(*self._port_names_or_indices_to_objects(*ports))
+        self._run_per_chassis(lambda _, chassis_ports: [p.clear_stats() for p in chassis_ports], *ports)
 
     def start_traffic(self, *ports):
         """ Start traffic on list of ports and return immediately.
 
+        On multi chassis sessions traffic is started on all chassis at the same time - one thread per chassis, all
+        threads are released together to send the start command.
+
         :param ports: ports indices (zero based) or ports locations as used in reserve command. If empty - start
                       traffic on all ports.
+        :return: start skew in seconds - difference between the first and last chassis start command time.
         """
-        self.xm.session.start_traffic(False, *self._port_names_or_indices_to_objects(*ports))
+        return self._traffic_command('on', *ports)
 
     def run_traffic_blocking(self, *ports):
         """ Start traffic on list of ports and wait until all traffic is finished.
 
         :param ports: ports indices (zero based) or ports locations as used in reserve command. If empty - start
                       traffic on all ports.
+        :return: start skew in seconds - difference between the first and last chassis start command time.
+        """
+        skew = self._traffic_command('on', *ports)
+        self.wait_for_traffic(*ports)
+        return skew
+
+    def wait_for_traffic(self, *ports, timeout=None, interval=0.1, max_interval=2, views=(), snapshot_interval=1):
+        """ Wait until traffic stops on all ports.
+
+        Traffic state of all ports is polled with single pipelined query per chassis. Polling starts every interval
+        seconds and backs off up to max_interval seconds while no port stops, once a port stops polling returns to
+        interval.
+
+        | Start Traffic |
+        | &{result} = | Wait For Traffic | timeout=600 | views=port tpld | snapshot_interval=10 |
+        | Log Dictionary | ${result}[stop_times] |
+
+        :param ports: ports indices (zero based) or ports locations as used in reserve command. If empty - wait for
+                      all ports.
+        :param timeout: maximum time to wait in seconds, None - wait forever.
+        :param interval: initial (and minimum) polling interval in seconds.
+        :param max_interval: maximum polling interval in seconds.
+        :param views: list (or space separated string) of statistics views (port/stream/tpld) to read while waiting.
+        :param snapshot_interval: interval between statistics snapshots in seconds.
+        :return: dictionary {elapsed: wait time, stop_times: {port: seconds since traffic start},
+            snapshots: list of {time: seconds since traffic start, view: statistics}}. Last snapshot is taken after
+            traffic stopped.
         """
-        self.xm.session.start_traffic(True, *self._port_names_or_indices_to_objects(*ports))
+        port_objects = self._port_names_or_indices_to_objects(*ports) if ports else list(self._ports_list)
+        views = views.split() if isinstance(views, str) else list(views)
+        start = time.time()
+        origin = self._traffic_start if self._traffic_start else start
+        deadline = start + float(timeout) if timeout is not None else None
+        interval = min_interval = float(interval)
+        next_snapshot = start
+        stop_times = OrderedDict()
+        snapshots = []
+        running = port_objects
+        while running:
+            now = time.time()
+            if views and now >= next_snapshot:
+                snapshots.append(self._statistics_snapshot(views, origin))
+                next_snapshot = now + float(snapshot_interval)
+            states = self._get_traffic_states(running)
+            now = time.time()
+            stopped = [p for p in running if states[p].lower() == 'off']
+            for port in stopped:
+                stop_times[str(port)] = now - origin
+            running = [p for p in running if p not in stopped]
+            if not running:
+                break
+            if deadline and now >= deadline:
+                raise TgnError('Traffic still running on {} after {} seconds'.format([str(p) for p in running],
+                                                                                    timeout))
+            interval = min_interval if stopped else min(interval * 2, float(max_interval))
+            wake_up = min(t for t in [now + interval, next_snapshot if views else None, deadline] if t)
+            time.sleep(max(0, wake_up - time.time()))
+        if views:
+            snapshots.append(self._statistics_snapshot(views, origin))
+        return OrderedDict([('elapsed', time.time() - start), ('stop_times', stop_times), ('snapshots', snapshots)])
 
     def stop_traffic(self, *ports):
         """ Stop traffic on list of ports.
@@ -138,7 +348,7 @@ class XenaRobot():
         :param ports: ports indices (zero based) or ports locations as used in reserve command. If empty - stop
                       traffic on all ports.
         """
-        self.xm.session.stop_traffic(*self._port_names_or_indices_to_objects(*ports))
+        self._traffic_command('off', *ports)
 
     def start_capture(self, *ports):
         """ Start capture on list of ports.
@@ -162,8 +372,101 @@ class XenaRobot():
         :param view: port/stream/tpld.
         :return: dictionary of requested statistics.
         """
-        stats = _view_name_2_object[view.lower()](self.xm.session).read_stats()
-        return {k.name: v for k, v in stats.items()}
+        if view.lower() == 'port':
+            stats = self._run_per_chassis(lambda _, ports: [(p, p.read_port_stats()) for p in ports])
+        elif view.lower() == 'tpld':
+            stats = self._run_per_chassis(lambda _, ports: [tpld_stats for p in ports
+                                                            for tpld_stats in p.read_tpld_stats().items()])
+        else:
+            stats = _view_name_2_object(view.lower())(self.xm.session).read_stats()
+            return {k.name: v for k, v in stats.items()}
+        return {k.name: v for chassis_stats in stats.values() for k, v in chassis_stats}
+
+    def get_statistics_for(self, view, objects, *counters):
+        """ Get selected statistics counters for selected ports/streams/TPLDs.
+
+        Only the requested counters groups are read from the chassis, one query per object per group.
+
+        | ${stats} = | Get Statistics For | port | ${PORTS} | pt_total | pr_total_packets |
+        | ${stats} = | Get Statistics For | tpld | ${TPLDS} | pr_tpldtraffic |
+
+        :param view: port/stream/tpld. Stream view returns TX counters (pt_stream), for RX counters use TPLD view.
+        :param objects: port, list of ports or dictionary {port: list of stream/TPLD indices}. For stream/tpld views
+                        if only ports are specified, read all streams/TPLDs of the ports.
+        :param counters: list of counters groups (pt_total) or counters (pt_total_packets). If empty - all groups.
+        :return: dictionary {port name or stream/TPLD index (module/port/index): {group_counter: value}}.
+        """
+
+        captions = _view_name_2_captions(view.lower())
+        groups = OrderedDict()
+        for counter in counters if counters else captions:
+            group = next((g for g in captions if counter == g or counter.startswith(g + '_')), None)
+            if not group:
+                raise ValueError('Unknown {} counter {}, valid groups - {}'.format(view, counter, list(captions)))
+            name = counter[len(group) + 1:] if counter != group else None
+            if name is not None and name not in captions[group]:
+                raise ValueError('Unknown {} counter {}, valid {} counters - {}'.format(view, counter, group,
+                                                                                       captions[group]))
+            groups.setdefault(group, set()).add(name)
+
+        stats = OrderedDict()
+        for obj in self._statistics_objects(view.lower(), objects):
+            obj_stats = OrderedDict()
+            for group, names in groups.items():
+                for name, value in obj.read_stat(captions[group], group).items():
+                    if None in names or name in names:
+                        obj_stats[group + '_' + name] = value
+            stats[obj.name if view.lower() == 'port' else obj.index] = obj_stats
+        return stats
+
+    def start_statistics_sampling(self, interval, *views, size=3600, file_name=None):
+        """ Start sampling statistics in background at fixed interval.
+
+        Samples are kept in memory bounded ring buffer, when the buffer is full the oldest samples are dropped.
+        Counters are queried directly from the chassis for the ports reserved when sampling starts. Stream view samples
+        TX counters (pt_stream), for RX counters sample TPLD view.
+
+        :param interval: sampling interval in seconds.
+        :param views: port/stream/tpld. If empty - sample port statistics.
+        :param size: maximum number of samples to keep per view.
+        :param file_name: optional csv or jsonl file to stream all samples to.
+        """
+        if self._sampler and self._sampler.is_running():
+            raise ValueError('Statistics sampling already running')
+        views = [v.lower() for v in views] if views else ['port']
+        ports = list(self._ports_list)
+        readers = {view: (lambda view=view: self._read_view_counters(view, ports)) for view in views}
+        self._sampler = XenaStatsSampler(self.logger, readers, interval, size, file_name)
+        self._sampler.start()
+
+    def stop_statistics_sampling(self):
+        """ Stop background statistics sampling. Collected samples are kept until next Start Statistics Sampling.
+
+        :return: dictionary {view: number of samples in buffer}.
+        """
+        return self._get_sampler().stop()
+
+    def get_statistics_samples(self, view, name, counter):
+        """ Get all sampled values of single counter.
+
+        :param view: port/stream/tpld.
+        :param name: port name or stream/TPLD index (module/port/index).
+        :param counter: group and counter names joined with '_' (e.g. pt_total_packets).
+        :return: list of (timestamp, value).
+        """
+        return self._get_sampler().get_samples(view.lower(), name, counter)
+
+    def get_statistics_summary(self, view, name, counter, percentile=95, window=None):
+        """ Get min/max/mean/percentile and rate of single sampled counter.
+
+        :param view: port/stream/tpld.
+        :param name: port name or stream/TPLD index (module/port/index).
+        :param counter: group and counter names joined with '_' (e.g. pt_total_packets).
+        :param percentile: requested percentile (0-100).
+        :param window: rate window in seconds (last samples). If None - rate over all samples.
+        :return: dictionary {samples, min, max, mean, percentile, rate}.
+        """
+        return self._get_sampler().get_summary(view.lower(), name, counter, percentile, window)
 
     #
     # Ports
@@ -175,7 +478,9 @@ class XenaRobot():
 
         :param port: port index (zero based) or port location as used in reserve command.
         """
-        self._port_name_or_index_to_object(port).reset()
+        port_object = self._port_name_or_index_to_object(port)
+        port_object.reset()
+        self._invalidate_streams(port_object)
 
     def get_port_attribute(self, port, attribute):
         """ Get port attribute.
@@ -185,7 +490,20 @@ class XenaRobot():
         :return: attribute value.
         :rtype: str
         """
-        return self._port_name_or_index_to_object(port).get_attribute(attribute)
+        port_object = self._port_name_or_index_to_object(port)
+        return self._get_attribute(port_object, None, port_object, attribute)
+
+    def get_port_attributes(self, port, *attributes):
+        """ Get multiple port attributes with single pipelined query.
+
+        | &{attributes} = | Get Port Attributes | ${PORT} | p_speed | p_txmode | p_comment |
+
+        :param port: port index (zero based) or port location as used in reserve command.
+        :param attributes: attributes names.
+        :return: dictionary {attribute: value}.
+        :rtype: dict of (str, str)
+        """
+        return self._get_attributes(self._port_name_or_index_to_object(port), None, attributes)
 
     def set_port_attributes(self, port, **attributes):
         """ Set port attribute.
@@ -193,7 +511,9 @@ class XenaRobot():
         :param port: port index (zero based) or port location as used in reserve command.
         :param attributes: dictionary of {attribute: value} to set
         """
-        return self._port_name_or_index_to_object(port).set_attributes(**attributes)
+        port_object = self._port_name_or_index_to_object(port)
+        self._invalidate_config(port_object)
+        return port_object.set_attributes(**attributes)
 
     def exec_port_command(self, port, command, *arguments):
         """ Execute any port command and return the returned value.
@@ -202,7 +522,9 @@ class XenaRobot():
         :param command: command to execute.
         :param arguments: optional list of command arguments.
         """
-        return self._port_name_or_index_to_object(port).send_command_return(command, *arguments)
+        port_object = self._port_name_or_index_to_object(port)
+        self._invalidate_config(port_object)
+        return port_object.send_command_return(command, *arguments)
 
     #
     # Streams.
@@ -215,7 +537,9 @@ class XenaRobot():
         :param name: stream name.
         :return: stream index.
         """
-        stream = self._port_name_or_index_to_object(port).add_stream(name)
+        port_object = self._port_name_or_index_to_object(port)
+        stream = port_object.add_stream(name)
+        self._invalidate_streams(port_object)
         return stream.id
 
     def remove_stream(self, port, stream):
@@ -224,8 +548,96 @@ class XenaRobot():
         :param port: port index (zero based) or port location as used in reserve command.
         :param stream: stream index (zero based) or stream name.
         """
-        index = self._stream_name_or_index_to_object(port, stream).id
-        self._port_name_or_index_to_object(port).remove_stream(index)
+        port_object = self._port_name_or_index_to_object(port)
+        port_object.remove_stream(self._stream_name_or_index_to_object(port, stream).id)
+        self._invalidate_streams(port_object)
+
+    def add_streams(self, port, count, headers, *fields, name='stream {}', modifiers=(), **attributes):
+        """ Add multiple streams from template.
+
+        All packet headers are built locally and all streams are created with pipelined commands, so the number of
+        round trips does not depend on the number of streams. New streams are enabled and get unique TPLD IDs.
+
+        | Add Streams | ${PORT} | 1000 | vlan ip udp | vlan[0]:vid=100+1 | ip:src_s=10.0.0.1+1 | ps_packetlimit=80 |
+        | Add Streams | ${PORT} | 10 | ip | ip:dst_s=1.1.1.1 | name=flow {} | modifiers=${MODIFIERS} |
+
+        :param port: port index (zero based) or port location as used in reserve command.
+        :param count: number of streams to add.
+        :param headers: list (or space/comma separated string) of header names to add after ethernet header.
+        :param fields: list of header:field=value[+step] to set on all streams, with +step the field value is
+            incremented by step for each stream. Incrementing values can be integers, MAC or IP (v4/v6) addresses.
+        :param name: stream name, {} is replaced with the stream index.
+        :param modifiers: list of modifiers to add to all streams, each modifier is position or dictionary
+            {position, mask, action, repeat, min_val, step, max_val}.
+        :param attributes: dictionary of {attribute: value} to set on all streams.
+        :return: dictionary {indices: new streams indices, elapsed: creation time, streams_per_second}.
+        """
+        start = time.time()
+        port_object = self._port_name_or_index_to_object(port)
+        count = int(count)
+        indices = [int(index) for index in port_object.get_attribute('ps_indices').split()]
+        first = max(indices) + 1 if indices else 0
+
+        # Same as XenaPort.streams - new TPLD IDs start after the highest TPLD ID of the existing streams.
+        xena_stream = _xena('xena_stream')
+        XenaStream, XenaStreamState = xena_stream.XenaStream, xena_stream.XenaStreamState
+        tpld_ids = self._query_port(port_object, ['ps_tpldid [{}]'.format(index) for index in indices])
+        XenaStream.next_tpld_id = max([XenaStream.next_tpld_id] + [int(t) + 1 for t in tpld_ids if t is not None])
+
+        packet_headers = import_module('pypacker.layer12.ethernet').Ethernet()
+        for header in headers.replace(',', ' ').split() if isinstance(headers, str) else headers:
+            header_object = _packet_headers_registry.get_class(header)()
+            if header.lower() == 'vlan':
+                packet_headers.vlan.append(header_object)
+            else:
+                packet_headers += header_object
+        patterns = []
+        for field_edit in fields:
+            header, field_value = field_edit.split(':', 1)
+            field, value = [f.strip() for f in field_value.split('=', 1)]
+            match = re.match(r'^(.+)\+(\d+)$', value)
+            if match:
+                patterns.append((header, field, match.group(1), int(match.group(2))))
+            else:
+                self._set_packet_header_fields(packet_headers, header, **{field: value})
+        ps_headerprotocol = _header_protocol(packet_headers)
+        modifiers = [m if isinstance(m, dict) else {'position': m} for m in modifiers]
+
+        lines = []
+        for index in range(count):
+            sid = first + index
+            for header, field, value, step in patterns:
+                self._set_packet_header_fields(packet_headers, header, **{field: _increment(value, step * index)})
+            lines.extend(['ps_create [{}]'.format(sid),
+                          'ps_comment [{}] "{}"'.format(sid, name.format(sid)),
+                          'ps_tpldid [{}] {}'.format(sid, XenaStream.next_tpld_id + index),
+                          'ps_enable [{}] {}'.format(sid, XenaStreamState.enabled.value),
+                          'ps_headerprotocol [{}] {}'.format(sid, ps_headerprotocol),
+                          'ps_packetheader [{}] 0x{}'.format(sid, binascii.hexlify(packet_headers.bin()).decode())])
+            lines.extend('{} [{}] {}'.format(a, sid, v) for a, v in attributes.items())
+            if modifiers:
+                lines.append('ps_modifiercount [{}] {}'.format(sid, len(modifiers)))
+            for mid, modifier in enumerate(modifiers):
+                lines.extend(_modifier_lines(sid, mid, modifier))
+        XenaStream.next_tpld_id += count
+
+        errors = self._send_port_lines(port_object, lines)
+        if errors:
+            port_object.objects = OrderedDict()
+            self._invalidate_streams(port_object)
+            raise TgnError('Failed to add streams, {} commands failed'.format(errors))
+        # Only new stream indices were created, existing streams objects (and their packet edits) remain valid.
+        if port_object.get_objects_by_type('stream'):
+            for sid in range(first, first + count):
+                XenaStream(parent=port_object, index='{}/{}'.format(port_object.index, sid), name=name.format(sid))
+        self._invalidate_config(port_object)
+        with self._streams_lock:
+            self._streams_index.pop(port_object, None)
+        elapsed = time.time() - start
+        self.logger.info('add %d streams on %s in %.3f seconds', count, port_object, elapsed)
+        return OrderedDict([('indices', list(range(first, first + count))),
+                            ('elapsed', elapsed),
+                            ('streams_per_second', count / elapsed if elapsed else float(count))])
 
     def get_stream_attribute(self, port, stream, attribute):
         """ Get port attribute.
@@ -236,7 +648,22 @@ class XenaRobot():
         :return: attribute value.
         :rtype: str
         """
-        return self._stream_name_or_index_to_object(port, stream).get_attribute(attribute)
+        stream_object = self._stream_name_or_index_to_object(port, stream)
+        return self._get_attribute(stream_object.parent, stream_object.id, stream_object, attribute)
+
+    def get_stream_attributes(self, port, stream, *attributes):
+        """ Get multiple stream attributes with single pipelined query.
+
+        | &{attributes} = | Get Stream Attributes | ${PORT} | 0 | ps_packetlimit | ps_ratepps | ps_comment |
+
+        :param port: port index (zero based) or port location as used in reserve command.
+        :param stream: stream index (zero based) or stream name.
+        :param attributes: attributes names.
+        :return: dictionary {attribute: value}.
+        :rtype: dict of (str, str)
+        """
+        stream_object = self._stream_name_or_index_to_object(port, stream)
+        return self._get_attributes(stream_object.parent, stream_object.id, attributes)
 
     def set_stream_attributes(self, port, stream, **attributes):
         """ Set stream attribute.
@@ -245,7 +672,9 @@ class XenaRobot():
         :param stream: stream index (zero based) or stream name.
         :param attributes: dictionary of {attribute: value} to set
         """
-        return self._stream_name_or_index_to_object(port, stream).set_attributes(**attributes)
+        stream_object = self._stream_name_or_index_to_object(port, stream)
+        self._invalidate_config(stream_object.parent)
+        return stream_object.set_attributes(**attributes)
 
     def exec_stream_command(self, port, stream, command, *arguments):
         """ Execute any stream command and return the returned value.
@@ -255,7 +684,9 @@ class XenaRobot():
         :param command: command to execute.
         :param arguments: optional list of command arguments.
         """
-        return self._stream_name_or_index_to_object(port, stream).send_command_return(command, *arguments)
+        stream_object = self._stream_name_or_index_to_object(port, stream)
+        self._invalidate_config(stream_object.parent)
+        return stream_object.send_command_return(command, *arguments)
 
     #
     # Packet headers.
@@ -268,7 +699,7 @@ class XenaRobot():
         :param stream: stream index (zero based) or stream name.
         :return: string representation of stream packet.
         """
-        return self._stream_name_or_index_to_object(port, stream).get_packet_headers()
+        return self._get_packet_headers(self._stream_name_or_index_to_object(port, stream))
 
     def get_packet_header(self, port, stream, header):
         """ Get packet header.
@@ -276,18 +707,25 @@ class XenaRobot():
         :param port: port index (zero based) or port location as used in reserve command.
         :param stream: stream index (zero based) or stream name.
         :param header: requested packet header.
-        :return: dictionary of <field: value>.
+        :return: dictionary of <field: value>. MAC/IP addresses as strings, integers as decimal, bytes as hex.
         :rtype: dict of (str, str)
         """
-        header_body = self._get_packet_header(port, stream, header)
-        fields_str = re.sub('vlan.*----------', '', header_body._summarize(), re.MULTILINE, re.DOTALL)
-        fields = OrderedDict()
-        for field in fields_str.split("\n"):
-            key_values = field.strip().split('=')
-            if len(key_values) > 1:
-                key = key_values[0].split(" ")[0].strip()
-                fields[key.strip()] = key_values[-1].strip()
-        return fields
+        headers = self._get_packet_headers(self._stream_name_or_index_to_object(port, stream))
+        return _header_fields(self._get_packet_header(headers, header))
+
+    def get_packet_headers(self, port, stream):
+        """ Get all packet headers fields with single read of packet headers.
+
+        | &{headers} = | Get Packet Headers | ${PORT} | 0 |
+        | Should Be Equal | ${headers}[ip][src] | 1.1.1.1 |
+
+        :param port: port index (zero based) or port location as used in reserve command.
+        :param stream: stream index (zero based) or stream name.
+        :return: dictionary of <header: <field: value>>, headers names are ethernet, vlan[0]..vlan[n], ip, ip6, tcp etc.
+        :rtype: dict of (str, dict of (str, str))
+        """
+        headers = self._get_packet_headers(self._stream_name_or_index_to_object(port, stream))
+        return OrderedDict((name, _header_fields(header_body)) for name, header_body in _packet_layers(headers))
 
     def add_packet_headers(self, port, stream, *headers):
         """ Add packet headers.
@@ -300,26 +738,23 @@ class XenaRobot():
         :param headers: list of header names to add (vlan, ip, ip6, tcp, etc.).
         """
 
-        packet_headers = self._stream_name_or_index_to_object(port, stream).get_packet_headers()
+        stream_object = self._stream_name_or_index_to_object(port, stream)
+        packet_headers = self._edit_packet_headers(stream_object)
         for header in headers:
-            if header.lower() == 'vlan':
-                header_py = 'ethernet.py'
-                header_class = 'Dot1Q'
-            else:
-                header_py = header.lower() + '.py'
-                header_class = header.upper()
-            for site_packages_path in site.getsitepackages():
-                pypacker_path = os.path.join(site_packages_path, 'pypacker')
-                for dirpath, _, filenames in os.walk(pypacker_path):
-                    if header_py in filenames:
-                        module_name = dirpath[len(site_packages_path) + 1:]
-            header_module = import_module(module_name.replace(os.path.sep, '.') + '.' + header_py[:-3])
-            header_object = getattr(header_module, header_class)()
+            header_object = _packet_headers_registry.get_class(header)()
             if header.lower() == 'vlan':
                 packet_headers.vlan.append(header_object)
             else:
                 packet_headers += header_object
-        self._stream_name_or_index_to_object(port, stream).set_packet_headers(packet_headers)
+        self._set_packet_headers(stream_object, packet_headers)
+
+    def get_supported_packet_headers(self):
+        """ Get names of all packet headers that can be used with Add Packet Headers.
+
+        :return: sorted list of header names (vlan, ip, ip6, tcp, udp, etc.).
+        :rtype: list of str
+        """
+        return _packet_headers_registry.get_names()
 
     def set_packet_header_fields(self, port, stream, header, **fields):
         """ Set packet header fields.
@@ -331,12 +766,62 @@ class XenaRobot():
         :type fields: dict of (str, str)
         """
 
-        print('header = ' + header)
-        headers = self._stream_name_or_index_to_object(port, stream).get_packet_headers()
-        header_body = self._get_packet_header(header=header, headers=headers)
-        for field, value in fields.items():
-            setattr(header_body, field, int(value) if str(value).isdigit() else value)
-        self._stream_name_or_index_to_object(port, stream).set_packet_headers(headers)
+        stream_object = self._stream_name_or_index_to_object(port, stream)
+        headers = self._edit_packet_headers(stream_object)
+        self._set_packet_header_fields(headers, header, **fields)
+        self._set_packet_headers(stream_object, headers)
+
+    def begin_packet_edit(self, port, stream):
+        """ Begin packet edit transaction.
+
+        Read packet headers from chassis once. Until Commit Packet Edit, all Add Packet Headers and Set Packet Header
+        Fields calls on this stream are applied to the local copy only.
+
+        :param port: port index (zero based) or port location as used in reserve command.
+        :param stream: stream index (zero based) or stream name.
+        """
+        stream_object = self._stream_name_or_index_to_object(port, stream)
+        with self._streams_lock:
+            if stream_object in self._packet_edits:
+                raise ValueError('Packet edit already in progress for stream {}'.format(stream_object.name))
+            self._aborted_packet_edits.discard((stream_object.parent, stream_object.id))
+        headers = self._edit_packet_headers(stream_object)
+        with self._streams_lock:
+            self._packet_edits[stream_object] = headers
+
+    def commit_packet_edit(self, port, stream):
+        """ Commit packet edit transaction - write local copy of packet headers to chassis once.
+
+        :param port: port index (zero based) or port location as used in reserve command.
+        :param stream: stream index (zero based) or stream name.
+        """
+        stream_object = self._stream_name_or_index_to_object(port, stream)
+        self._set_packet_headers(stream_object, self._pop_packet_edit(stream_object))
+
+    def abort_packet_edit(self, port, stream):
+        """ Abort packet edit transaction - discard local copy of packet headers, chassis is not changed.
+
+        :param port: port index (zero based) or port location as used in reserve command.
+        :param stream: stream index (zero based) or stream name.
+        """
+        self._pop_packet_edit(self._stream_name_or_index_to_object(port, stream))
+
+    def edit_packet(self, port, stream, *edits):
+        """ Set multiple packet header fields with single read and single write of packet headers.
+
+        | Edit Packet | ${PORT} | 0 | ethernet:src_s=11:11:11:11:11:11 | ip:src_s=1.1.1.1 | ip:dst_s=2.2.2.2 |
+
+        :param port: port index (zero based) or port location as used in reserve command.
+        :param stream: stream index (zero based) or stream name.
+        :param edits: list of header:field=value to set.
+        """
+        stream_object = self._stream_name_or_index_to_object(port, stream)
+        headers = self._edit_packet_headers(stream_object)
+        for edit in edits:
+            header, field_value = edit.split(':', 1)
+            field, value = field_value.split('=', 1)
+            self._set_packet_header_fields(headers, header, **{field.strip(): value.strip()})
+        self._set_packet_headers(stream_object, headers)
 
     #
     # Modifiers.
@@ -350,8 +835,9 @@ class XenaRobot():
         :param position: requested packet modifier position.
         :param modifier_type: standard/extended
         """
-        self._stream_name_or_index_to_object(port, stream).add_modifier(XenaModifierType[modifier_type.lower()],
-                                                                        position=int(position))
+        stream_object = self._stream_name_or_index_to_object(port, stream)
+        self._invalidate_config(stream_object.parent)
+        stream_object.add_modifier(_xena('xena_stream').XenaModifierType[modifier_type.lower()], position=int(position))
 
     def remove_modifier(self, port, stream, modifier):
         """ Add packet modifier.
@@ -360,7 +846,9 @@ class XenaRobot():
         :param stream: stream index (zero based) or stream name.
         :param modifier: modifier index (zero based).
         """
-        self._stream_name_or_index_to_object(port, stream).remove_modifier(int(modifier))
+        stream_object = self._stream_name_or_index_to_object(port, stream)
+        self._invalidate_config(stream_object.parent)
+        stream_object.remove_modifier(int(modifier))
 
     def get_modifier(self, port, stream, modifier):
         """ Get packet modifier attributes.
@@ -389,28 +877,153 @@ class XenaRobot():
         :param attributes: dictionary of {attribute: value} to set.
         """
 
-        modifier = self._stream_name_or_index_to_object(port, stream).modifiers[int(modifier)]
+        stream_object = self._stream_name_or_index_to_object(port, stream)
+        self._invalidate_config(stream_object.parent)
+        modifier = stream_object.modifiers[int(modifier)]
         for attribute, value in attributes.items():
             if attribute.lower() == 'action':
-                setattr(modifier, attribute.lower(), XenaModifierAction[value.lower()])
+                setattr(modifier, attribute.lower(), _xena('xena_stream').XenaModifierAction[value.lower()])
             else:
                 setattr(modifier, attribute.lower(), value.lower())
+        modifier.set()
+
+    def get_modifiers(self, port, stream):
+        """ Get all packet modifiers (standard and extended) of stream with two batched queries.
+
+        | @{modifiers} = | Get Modifiers | ${PORT} | 0 |
+        | Should Be Equal As Integers | ${modifiers}[0][max_val] | 100 |
+
+        :param port: port index (zero based) or port location as used in reserve command.
+        :param stream: stream index (zero based) or stream name.
+        :return: list of dictionaries {type: standard/extended, index, position, mask, action, repeat, min_val, step,
+            max_val}, range values are not returned for random action.
+        :rtype: list of dict
+        """
+        stream_object = self._stream_name_or_index_to_object(port, stream)
+        port_object, sid = stream_object.parent, stream_object.id
+        counts = self._query_port(port_object, ['ps_modifiercount [{}]'.format(sid),
+                                                'ps_modifierextcount [{}]'.format(sid)])
+        modifiers = [(modifier_type, mid) for modifier_type, count in zip(_modifiers_commands, counts)
+                     for mid in range(int(count) if count else 0)]
+        queries = ['{} [{},{}]'.format(command, sid, mid) for modifier_type, mid in modifiers
+                   for command in _modifiers_commands[modifier_type]]
+        values = iter(self._query_port(port_object, queries))
+        XenaModifierAction = _xena('xena_stream').XenaModifierAction
+        result = []
+        for modifier_type, mid in modifiers:
+            modifier_value, range_value = next(values), next(values)
+            if modifier_value is None:
+                raise TgnError('Failed to read {} modifier {} of stream {}'.format(modifier_type, mid, stream_object))
+            position, mask, action, repeat = modifier_value.split()
+            action = XenaModifierAction(action)
+            modifier = OrderedDict([('type', modifier_type), ('index', mid), ('position', int(position)),
+                                    ('mask', '0x{:x}'.format(int(mask, 16))), ('action', action.name),
+                                    ('repeat', int(repeat))])
+            if action != XenaModifierAction.random and range_value:
+                modifier.update(zip(['min_val', 'step', 'max_val'], [int(v) for v in range_value.split()]))
+            result.append(modifier)
+        return result
+
+    def set_modifiers(self, port, stream, *modifiers):
+        """ Set all packet modifiers of stream in single batched exchange, one modifier and one range command per
+        modifier.
+
+        Standard and extended modifiers are replaced separately, each type only if the list contains modifiers of this
+        type, so Set Modifiers with only extended modifiers keeps the standard modifiers and vice versa.
+
+        | &{modifier} = | Create Dictionary | position=4 | min_val=10 | max_val=100 |
+        | Set Modifiers | ${PORT} | 0 | ${modifier} | ${modifier} |
+
+        :param port: port index (zero based) or port location as used in reserve command.
+        :param stream: stream index (zero based) or stream name.
+        :param modifiers: list of modifiers dictionaries as returned by Get Modifiers, only position is mandatory, index
+            is ignored (modifiers are indexed by order). Defaults - type=standard, mask=0xFFFF0000, action=increment,
+            repeat=1, min_val=0, step=1, max_val=65535.
+        """
+        stream_object = self._stream_name_or_index_to_object(port, stream)
+        sid = stream_object.id
+        by_type = OrderedDict((modifier_type, []) for modifier_type in _modifiers_commands)
+        for modifier in modifiers:
+            modifier_type = modifier.get('type', 'standard').lower()
+            if modifier_type not in by_type:
+                raise ValueError('Invalid modifier type {}, valid types - {}'.format(modifier_type, list(by_type)))
+            by_type[modifier_type].append(modifier)
+        lines = ['{} [{}] {}'.format(count_command, sid, len(by_type[modifier_type]))
+                 for modifier_type, count_command in [('standard', 'ps_modifiercount'),
+                                                      ('extended', 'ps_modifierextcount')] if by_type[modifier_type]]
+        for modifier_type, type_modifiers in by_type.items():
+            for mid, modifier in enumerate(type_modifiers):
+                lines.extend(_modifier_lines(sid, mid, modifier, extended=modifier_type == 'extended'))
+
+        self._invalidate_config(stream_object.parent)
+        errors = self._send_port_lines(stream_object.parent, lines)
+        stream_object.del_objects_by_type('modifier')
+        stream_object.del_objects_by_type('xmodifier')
+        if errors:
+            raise TgnError('Failed to set modifiers, {} commands failed'.format(errors))
 
     #
     # Capture.
     #
 
     def create_tshark(self, wireshark_path):
-        self.tshark = Tshark(wireshark_path)
+        self.tshark = _xena('xena_tshark').Tshark(wireshark_path)
+
+    def save_capture_to_file(self, port, cap_file, cap_type='text', timestamps=False):
+        """ Save captured packets to file.
 
-    def save_capture_to_file(self, port, cap_file, cap_type='text'):
-        self._port_name_or_index_to_object(port).capture.get_packets(cap_type=XenaCaptureBufferType[cap_type],
-                                                                     file_name=cap_file, tshark=self.tshark)
+        pcap and pcapng files are written window by window as packets are read from the chassis with pipelined
+        queries, so memory usage does not depend on the number of captured packets and Wireshark is not required.
+
+        :param port: port index (zero based) or port location as used in reserve command.
+        :param cap_file: full path to capture file.
+        :param cap_type: text/raw/pcap/pcapng.
+        :param timestamps: pcap/pcapng only - True - write packets timestamps, False - all timestamps are 0.
+        """
+        port_object = self._port_name_or_index_to_object(port)
+        if cap_type.lower() in ['pcap', 'pcapng']:
+            with PcapWriter(cap_file) as writer:
+                for packet, timestamp, length in self._read_capture(port_object):
+                    writer.write(packet, timestamp if timestamps else 0, length)
+        else:
+            cap_type = _xena('xena_port').XenaCaptureBufferType[cap_type]
+            port_object.capture.get_packets(cap_type=cap_type, file_name=cap_file, tshark=self.tshark)
+
+    def save_captures_to_files(self, cap_files, *ports, workers=8):
+        """ Save captured packets from multiple ports concurrently, each port to its own pcap/pcapng file.
+
+        :param cap_files: capture file name template, with {} as port index placeholder, or dictionary
+                          {port: capture file}. File type (pcap/pcapng) is set by file extension.
+        :param ports: ports indices (zero based) or ports locations as used in reserve command. Used only when
+                      cap_files is a template. If empty - save capture from all ports.
+        :param workers: maximum number of ports to save concurrently.
+        :return: dictionary {elapsed: save time}.
+        """
+        ports_files = [(port, cap_file, os.path.splitext(cap_file)[1][1:].lower())
+                       for port, cap_file in self._ports_configs(cap_files, *ports)]
+        for _, cap_file, cap_type in ports_files:
+            if cap_type not in ['pcap', 'pcapng']:
+                raise TgnError('Unsupported capture file type of {}, supported types - pcap, pcapng'.format(cap_file))
+        return self._run_per_port(self.save_capture_to_file, ports_files, workers, 'save capture')
 
     def analyze_packets(self, pcap_file, *read_filters):
-        analyser = TsharkAnalyzer()
-        for read_filter in read_filters:
-            analyser.set_read_filter(read_filter)
+        """ Count packets in pcap/pcapng file that match all read filters.
+
+        Common L2-L4 fields (eth, vlan, ip, ipv6, tcp, udp) are analyzed in process, the file is decoded once and
+        decoded file is reused as long as the file is not modified. Filters with other fields require Create Tshark.
+
+        :param pcap_file: full path to pcap/pcapng file.
+        :param read_filters: list of Wireshark like filters - field presence (ip.src), negated presence (!vlan) or
+                             comparison (ip.src == 1.1.1.1, udp.dstport != 53).
+        :return: number of packets that match all filters.
+        """
+        try:
+            return get_pcap_index(pcap_file).count(*read_filters)
+        except PcapFilterError as e:
+            if not self.tshark:
+                raise e
+        analyser = _xena('xena_tshark').TsharkAnalyzer()
+        analyser.set_read_filter(' && '.join('({})'.format(f) for f in read_filters))
         return len(self.tshark.analyze(pcap_file, analyser))
 
     #
@@ -419,20 +1032,93 @@ class XenaRobot():
 
     def send_command(self, chassis, command):
         """ Send command with no output. """
+        self._invalidate_chassis_configs(chassis)
         self.xm.session.chassis_list[chassis].send_command(command)
 
     def send_command_return(self, chassis, command):
         """ Send command and wait for single line output. """
+        self._invalidate_chassis_configs(chassis)
         return self.xm.session.chassis_list[chassis].send_command_return(command)
 
     def send_command_return_multilines(self, chassis, command):
         """ Send command and wait for multiple lines output. """
+        self._invalidate_chassis_configs(chassis)
         return self.xm.session.chassis_list[chassis].send_command_return_multilines(command)
 
+    def send_commands(self, chassis, *commands):
+        """ Send list of commands with no output, pipelined - without waiting for each command to complete.
+
+        All commands are sent even if some fail, failed commands are reported together at the end.
+
+        :param chassis: chassis IP address.
+        :param commands: list of commands to send.
+        """
+        self._invalidate_chassis_configs(chassis)
+        results = send_pipelined(self.xm.session.chassis_list[chassis], commands)
+        errors = ['{} - {}'.format(c, error if error else replies) for c, (replies, error) in zip(commands, results)
+                  if error or replies != [XenaSocket.reply_ok]]
+        if errors:
+            raise TgnError('Failed commands:\n{}'.format('\n'.join(errors)))
+
+    def send_commands_return(self, chassis, *commands, fail_on_error=True):
+        """ Send list of commands pipelined and return all outputs.
+
+        :param chassis: chassis IP address.
+        :param commands: list of commands to send.
+        :param fail_on_error: True - fail if any command failed (after all commands were sent), False - return the
+                              error as the failed command output.
+        :return: list of commands outputs, multiple lines outputs are joined with new line.
+        """
+        self._invalidate_chassis_configs(chassis)
+        results = send_pipelined(self.xm.session.chassis_list[chassis], commands)
+        errors = ['{} - {}'.format(c, error) for c, (_, error) in zip(commands, results) if error]
+        if errors and fail_on_error:
+            raise TgnError('Failed commands:\n{}'.format('\n'.join(errors)))
+        return [error if error else '\n'.join(replies) for replies, error in results]
+
+    #
+    # Performance.
+    #
+
+    def get_attributes_cache_counters(self, reset=False):
+        """ Get attributes cache counters.
+
+        :param reset: True - reset hits and misses counters after reading them.
+        :return: dictionary {hits, misses, size}, size is the number of valid cached values.
+        """
+        counters = self._attributes_cache.get_counters()
+        if reset:
+            self._attributes_cache.reset_counters()
+        return counters
+
+    def get_performance_report(self, reset=False):
+        """ Get per keyword performance counters collected since library import (or last reset).
+
+        Requires instrumentation=True library argument.
+
+        | &{report} = | Get Performance Report |
+        | Log | ${report}[Load Config][commands] |
+
+        :param reset: True - clear all counters after reading the report.
+        :return: dictionary {keyword: {calls, wall, local, wait, commands, bytes_sent, bytes_received, max}}. Times
+            are in seconds, summed over all calls of the keyword. wait is time spent waiting for chassis replies and
+            local is the rest of the keyword time (parsing, conversions etc.).
+        """
+        if not self._profiler:
+            raise ValueError('Performance instrumentation is off, import library with instrumentation=True')
+        report = self._profiler.get_report()
+        if reset:
+            self._profiler.reset()
+        return report
+
     #
     # Private methods.
     #
 
+    def _sockets(self):
+        """ Get all chassis sockets, without creating the session. """
+        return getattr(self._xm.session.api, 'sockets_list', {}).values() if self._xm else []
+
     def _port_names_or_indices_to_objects(self, *names_or_indices):
         """
         :rtype: list of (xenamanager.xena_port.XenaPort)
@@ -443,31 +1129,577 @@ class XenaRobot():
         """
         :rtype: xenamanager.xena_port.XenaPort
         """
-        return (list(self.ports.values())[int(name_or_index)] if name_or_index.isdecimal()
-                else self.ports[name_or_index])
+        if not isinstance(name_or_index, str):
+            return name_or_index
+        try:
+            if name_or_index.isdecimal():
+                return self._ports_list[int(name_or_index)]
+            return self.ports[name_or_index]
+        except (IndexError, KeyError):
+            raise ValueError('Port {} is not reserved, reserved ports - {}'.format(name_or_index, list(self.ports)))
 
     def _stream_name_or_index_to_object(self, port, name_or_index):
         """
-        :rtype: xenamanager.xena_port.XenaPort
+        :rtype: xenamanager.xena_stream.XenaStream
         """
-        if name_or_index.isdecimal():
-            return self._port_name_or_index_to_object(port).streams[int(name_or_index)]
-        else:
-            for stream in self._port_name_or_index_to_object(port).streams.values():
-                if stream.name == name_or_index:
-                    return stream
-
-    def _get_packet_header(self, port=None, stream=None, header=None, headers=None):
-        headers = headers if headers else self._stream_name_or_index_to_object(port, stream).get_packet_headers()
-        if header.lower() == 'ethernet':
-            header_body = headers
-        elif header.lower().startswith('vlan'):
-            header_body = headers.vlan[int(re.findall('vlan\[([\d])\]', header.lower())[0])]
-        else:
-            header_body = headers.upper_layer
-        return header_body
+        port_object = self._port_name_or_index_to_object(port)
+        with self._streams_lock:
+            if port_object not in self._streams_index:
+                streams_by_index = port_object.streams
+                streams_by_name = {}
+                for stream in streams_by_index.values():
+                    streams_by_name.setdefault(stream.name, stream)
+                self._streams_index[port_object] = (streams_by_index, streams_by_name)
+            streams_by_index, streams_by_name = self._streams_index[port_object]
+        try:
+            if name_or_index.isdecimal():
+                return streams_by_index[int(name_or_index)]
+            return streams_by_name[name_or_index]
+        except KeyError:
+            raise ValueError('Stream {} not found on port {}'.format(name_or_index, port_object.name))
+
+    def _ports_configs(self, configs, *ports):
+        """
+        :return: list of (port, configuration file name) pairs.
+        """
+        if isinstance(configs, dict):
+            return list(configs.items())
+        ports = ports if ports else [str(index) for index in range(len(self._ports_list))]
+        return [(port, configs.format(self._port_name_or_index_to_object(port).index.replace('/', '_')))
+                for port in ports]
+
+    def _run_per_port(self, operation, ports_arguments, workers, description):
+        """ Run operation on multiple ports concurrently, collect per port errors.
+
+        Commands of ports on the same chassis share the chassis socket, so concurrency mainly helps across chassis and
+        with operations that do local work (files).
+
+        :param operation: method to run, called as operation(port, *arguments).
+        :param ports_arguments: list of (port, *arguments) tuples.
+        :param workers: maximum number of concurrent operations.
+        :param description: operation description for logging and errors.
+        :return: dictionary {elapsed: total time}.
+        """
+
+        def run_operation(port_arguments):
+            try:
+                operation(*port_arguments)
+            except Exception as e:
+                return e
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, min(int(workers), len(ports_arguments)))) as executor:
+            results = list(executor.map(run_operation, ports_arguments))
+        elapsed = time.time() - start
+        self.logger.info('%s %d ports in %.3f seconds', description, len(ports_arguments), elapsed)
+        errors = ['{} - {}'.format(port_arguments[0], error)
+                  for port_arguments, error in zip(ports_arguments, results) if error]
+        if errors:
+            raise TgnError('Failed to {} ports:\n{}'.format(description, '\n'.join(errors)))
+        return {'elapsed': elapsed}
+
+    def _statistics_objects(self, view, objects):
+        """
+        :return: list of port/stream/TPLD objects for Get Statistics For.
+        """
+        if not isinstance(objects, dict):
+            objects = OrderedDict((port, None) for port in ([objects] if isinstance(objects, str) else objects))
+        view_objects = []
+        for port, indices in objects.items():
+            port_object = self._port_name_or_index_to_object(port)
+            if view == 'port':
+                view_objects.append(port_object)
+            elif view == 'stream':
+                indices = indices if indices else [str(index) for index in port_object.streams]
+                view_objects.extend(self._stream_name_or_index_to_object(port, str(i)) for i in indices)
+            elif indices:
+                XenaTpld = _xena('xena_port').XenaTpld
+                view_objects.extend(XenaTpld(parent=port_object, index='{}/{}'.format(port_object.index, i))
+                                    for i in indices)
+            else:
+                view_objects.extend(port_object.tplds.values())
+        return view_objects
+
+    def _read_view_counters(self, view, ports):
+        """ Read all counters of view with pipelined queries per port, without reading or changing the objects tree.
+
+        Called from the statistics sampler thread, so streams/TPLDs objects are never rebuilt under running keywords.
+
+        :return: dictionary {port name or stream/TPLD index: {group: {counter: value}}}.
+        """
+        captions = _view_name_2_captions(view)
+        stats = OrderedDict()
+        for port in ports:
+            if view == 'port':
+                indices = [None]
+            else:
+                indices = (self._query_port(port, ['ps_indices' if view == 'stream' else 'pr_tplds'])[0] or '').split()
+            queries = [g if i is None else '{} [{}]'.format(g, i) for i in indices for g in captions]
+            values = iter(self._query_port(port, queries))
+            for index in indices:
+                name = port.name if index is None else '{}/{}'.format(port.index, index)
+                stats[name] = OrderedDict()
+                for group, value in zip(captions, values):
+                    if value is not None:
+                        stats[name][group] = OrderedDict(zip(captions[group], [int(v) for v in value.split()]))
+        return stats
+
+    def _read_capture(self, port, window=256):
+        """ Read captured packets in windows, packets and extra information of each window are queried pipelined.
+
+        :param window: number of packets to read per window.
+        :return: generator of (packet bytes, timestamp in nanoseconds, original packet length).
+        """
+        packets = int(port.capture.read_stats()['packets'])
+        for first in range(0, packets, window):
+            indices = range(first, min(first + window, packets))
+            values = self._query_port(port, [q.format(i) for i in indices for q in ['pc_packet [{}]', 'pc_extra [{}]']])
+            for index, packet, extra in zip(indices, values[::2], values[1::2]):
+                if packet is None or extra is None:
+                    raise TgnError('Failed to read captured packet {} from port {}'.format(index, port.name))
+                timestamp, _, _, length = extra.split()[:4]
+                yield bytes.fromhex(packet.split('0x')[1].strip()), int(timestamp), int(length)
+
+    def _get_sampler(self):
+        if not self._sampler:
+            raise ValueError('Statistics sampling was not started')
+        return self._sampler
+
+    def _run_per_chassis(self, operation, *ports):
+        """ Run operation concurrently on all chassis, one thread per chassis.
+
+        :param operation: method to run, called as operation(chassis, list of chassis ports).
+        :param ports: ports indices (zero based) or ports locations as used in reserve command. If empty - all ports.
+        :return: dictionary {chassis: operation return value}.
+        """
+        per_chassis_ports = OrderedDict()
+        for port in self._port_names_or_indices_to_objects(*ports) if ports else self._ports_list:
+            per_chassis_ports.setdefault(port.chassis, []).append(port)
+        if len(per_chassis_ports) < 2:
+            return OrderedDict((c, operation(c, chassis_ports)) for c, chassis_ports in per_chassis_ports.items())
+        with ThreadPoolExecutor(max_workers=len(per_chassis_ports)) as executor:
+            futures = OrderedDict((c, executor.submit(operation, c, chassis_ports))
+                                  for c, chassis_ports in per_chassis_ports.items())
+        return OrderedDict((c, future.result()) for c, future in futures.items())
+
+    def _traffic_command(self, command, *ports):
+        """ Send traffic command to all chassis at the same time and wait for ports to reach the requested state.
+
+        :return: command skew in seconds.
+        """
+        port_objects = self._port_names_or_indices_to_objects(*ports) if ports else list(self._ports_list)
+        barrier = threading.Barrier(len({p.chassis for p in port_objects}) or 1)
+
+        def chassis_traffic(chassis, chassis_ports):
+            try:
+                ports_str = ' '.join([p.index.replace('/', ' ') for p in chassis_ports])
+                barrier.wait(timeout=60)
+                sent = time.time()
+                chassis.send_command('c_traffic', command, ports_str)
+            except Exception:
+                # Release other chassis threads waiting on the barrier now instead of after the barrier timeout.
+                barrier.abort()
+                raise
+            # Estimate command execution time on chassis as the middle between send and acknowledge.
+            return (sent + time.time()) / 2
+
+        commands_times = self._run_per_chassis(chassis_traffic, *port_objects)
+        if not commands_times:
+            return 0
+        self._wait_for_traffic_state(port_objects, command)
+        first = min(commands_times.values())
+        if command == 'on':
+            self._traffic_start = first
+        for chassis, command_time in commands_times.items():
+            self.logger.info('traffic %s on %s at +%.6f seconds', command, chassis, command_time - first)
+        return max(commands_times.values()) - first
+
+    def _wait_for_traffic_state(self, ports, state, timeout=40, interval=0.01, max_interval=0.5):
+        """ Wait until all ports reach traffic state, poll with pipelined queries at growing interval. """
+        deadline = time.time() + timeout
+        while True:
+            states = self._get_traffic_states(ports)
+            ports = [p for p in ports if states[p].lower() != state]
+            if not ports:
+                return
+            if time.time() >= deadline:
+                raise TgnError('Traffic failed to reach state {} on {} after {} seconds'.format(
+                    state, [str(p) for p in ports], timeout))
+            time.sleep(interval)
+            interval = min(interval * 2, max_interval)
+
+    def _get_traffic_states(self, ports):
+        """ Get traffic state of all ports, single pipelined query per chassis.
+
+        :return: dictionary {port: traffic state (on/off)}.
+        """
+
+        def chassis_states(chassis, chassis_ports):
+            if getattr(chassis.api, 'sockets_list', None) is None:
+                return [p.get_attribute('p_traffic') for p in chassis_ports]
+            results = send_pipelined(chassis, ['{} p_traffic ?'.format(p.index) for p in chassis_ports])
+            errors = ['{} - {}'.format(p, error) for p, (_, error) in zip(chassis_ports, results) if error]
+            if errors:
+                raise TgnError('Failed to read traffic state:\n{}'.format('\n'.join(errors)))
+            return [replies[-1].split()[-1] for replies, _ in results]
+
+        states = {}
+        for chassis, values in self._run_per_chassis(chassis_states, *ports).items():
+            states.update(zip([p for p in ports if p.chassis == chassis], values))
+        return states
+
+    def _statistics_snapshot(self, views, origin):
+        return OrderedDict([('time', time.time() - origin)] + [(view, self.get_statistics(view)) for view in views])
+
+    def _set_ports(self, ports):
+        """ Set reserved ports and rebuild ports index. """
+        self.ports = ports
+        self._ports_list = list(ports.values())
+        with self._streams_lock:
+            self._streams_index = {}
+            self._packet_edits = {s: h for s, h in self._packet_edits.items() if s.parent in self._ports_list}
+            self._aborted_packet_edits = set(e for e in self._aborted_packet_edits if e[0] in self._ports_list)
+            self._packet_headers = {}
+        self._ports_state = {}
+        self._attributes_cache.clear()
+
+    def _invalidate_streams(self, port):
+        """ Drop streams index of port so it will be rebuilt on next access, and pending packet edits of port streams
+        that were deleted or recreated (reset, load config...).
+        """
+        self._invalidate_config(port)
+        streams = port.objects.values()
+        with self._streams_lock:
+            self._streams_index.pop(port, None)
+            for stream in [s for s in self._packet_edits if s.parent is port and s not in streams]:
+                del self._packet_edits[stream]
+                self._aborted_packet_edits.add((port, stream.id))
+
+    def _invalidate_config(self, port):
+        """ Drop known configuration of port so next incremental load will not trust it, and decoded packet headers
+        of port streams so they will be read again on next access.
+        """
+        self._ports_state.pop(port, None)
+        self._attributes_cache.invalidate(port)
+        with self._streams_lock:
+            for stream in [s for s in self._packet_headers if s.parent is port]:
+                del self._packet_headers[stream]
+
+    def _invalidate_chassis_configs(self, chassis):
+        for port in [p for p in self.ports.values() if p.chassis.ip == chassis]:
+            self._invalidate_config(port)
 
+    def _send_port_lines(self, port, lines):
+        """ Send configuration lines to port, pipelined over socket API.
 
-_view_name_2_object = {'port': XenaPortsStats,
-                       'stream': XenaStreamsStats,
-                       'tpld': XenaTpldsStats}
+        :return: number of failed commands, failures are logged as warnings (same as full load).
+        """
+        if getattr(port.api, 'sockets_list', None) is None:
+            errors = 0
+            for line in lines:
+                try:
+                    port.send_command(line)
+                except Exception as e:
+                    self.logger.warning(str(e))
+                    errors += 1
+            return errors
+        results = send_pipelined(port.chassis, ['{} {}'.format(port.index, line) for line in lines])
+        errors = ['{} - {}'.format(line, error) for line, (_, error) in zip(lines, results) if error]
+        for error in errors:
+            self.logger.warning(error)
+        return len(errors)
+
+    def _get_attribute(self, port, sid, obj, attribute):
+        """ Get port/stream attribute from attributes cache, read from chassis on cache miss.
+
+        :param sid: stream index, None for port attributes.
+        :param obj: port/stream object to read the attribute from on cache miss.
+        """
+        value = self._attributes_cache.get(port, sid, attribute)
+        if value is None:
+            value = obj.get_attribute(attribute)
+            self._attributes_cache.put(port, sid, attribute, value)
+        return value
+
+    def _get_attributes(self, port, sid, attributes):
+        """ Get port/stream attributes from attributes cache, read all cache misses with single pipelined query.
+
+        :param sid: stream index, None for port attributes.
+        """
+        values = OrderedDict((attribute, self._attributes_cache.get(port, sid, attribute)) for attribute in attributes)
+        missing = [attribute for attribute, value in values.items() if value is None]
+        queries = [attribute if sid is None else '{} [{}]'.format(attribute, sid) for attribute in missing]
+        for attribute, value in zip(missing, self._query_port(port, queries)):
+            if value is None:
+                raise TgnError('Failed to read {} {}'.format(port if sid is None else '{}/{}'.format(port, sid),
+                                                             attribute))
+            if len(value) > 2 and value[0] == '"' and value[-1] == '"':
+                value = value[1:-1]
+            self._attributes_cache.put(port, sid, attribute, value)
+            values[attribute] = value
+        return values
+
+    def _query_port(self, port, queries):
+        """ Send queries to port, pipelined over socket API.
+
+        :param queries: list of queries without port index and '?' (ps_modifier [0,1]).
+        :return: list of replies values (without port index, command and object index), None for failed queries.
+        """
+        if not queries:
+            return []
+        if getattr(port.api, 'sockets_list', None) is None:
+            values = []
+            for query in queries:
+                try:
+                    value = port.send_command_return(*(query.split(None, 1) + ['?']))
+                    values.append(re.sub(r'^\s*\[[^\]]*\]\s*', '', value))
+                except Exception as e:
+                    self.logger.warning(str(e))
+                    values.append(None)
+            return values
+        results = send_pipelined(port.chassis, ['{} {} ?'.format(port.index, query) for query in queries])
+        return [reply_value_re.match(replies[-1]).group(1) if replies and not error else None
+                for replies, error in results]
+
+    def _get_packet_headers(self, stream):
+        """ Get pending packet edit headers if exist, else decoded packet headers, read from chassis only if they are
+        not cached. Returned headers are read only, use _edit_packet_headers to get headers for modification.
+        """
+        with self._streams_lock:
+            if stream in self._packet_edits:
+                return self._packet_edits[stream]
+            headers = self._packet_headers.get(stream)
+        if headers is None:
+            headers = stream.get_packet_headers()
+            with self._streams_lock:
+                self._packet_headers[stream] = headers
+        return headers
+
+    def _edit_packet_headers(self, stream):
+        """ Get packet headers for modification - cached headers are removed from cache until they are set. """
+        with self._streams_lock:
+            if stream in self._packet_edits:
+                return self._packet_edits[stream]
+            headers = self._packet_headers.pop(stream, None)
+        return headers if headers is not None else stream.get_packet_headers()
+
+    def _pop_packet_edit(self, stream):
+        """ Remove pending packet edit of stream.
+
+        :return: pending packet edit headers.
+        """
+        with self._streams_lock:
+            if stream not in self._packet_edits:
+                if (stream.parent, stream.id) in self._aborted_packet_edits:
+                    self._aborted_packet_edits.discard((stream.parent, stream.id))
+                    raise ValueError('Packet edit of stream {} was aborted - port {} streams were reset or reloaded '
+                                     'since Begin Packet Edit'.format(stream.name, stream.parent.name))
+                raise ValueError('No packet edit in progress for stream {}'.format(stream.name))
+            return self._packet_edits.pop(stream)
+
+    def _set_packet_headers(self, stream, headers):
+        """ Write packet headers to chassis unless there is pending packet edit (committed later). """
+        with self._streams_lock:
+            if stream in self._packet_edits:
+                return
+        self._invalidate_config(stream.parent)
+        stream.set_packet_headers(headers)
+        with self._streams_lock:
+            self._packet_headers[stream] = headers
+
+    def _set_packet_header_fields(self, headers, header, **fields):
+        header_body = self._get_packet_header(headers, header)
+        for field, value in fields.items():
+            setattr(header_body, field, int(value) if str(value).isdigit() else value)
+
+    def _get_packet_header(self, headers, header):
+        """ Get header by name - ethernet, vlan[index] (vlan = vlan[0]) or upper layer name (ip, ip6, tcp etc.). """
+        layers = OrderedDict(_packet_layers(headers))
+        name = header.lower() if header.lower() != 'vlan' else 'vlan[0]'
+        if name not in layers:
+            raise ValueError('Packet header {} not found, packet headers - {}'.format(header, list(layers)))
+        return layers[name]
+
+
+class _PacketHeadersRegistry(object):
+    """ Map header names to pypacker header classes.
+
+    pypacker layers directories are listed once per process on first use and imported modules are cached so repeated
+    Add Packet Headers calls cost a dictionary lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modules_names = None
+        self._modules = {}
+
+    def get_class(self, header):
+        """
+        :param header: header name (case insensitive). vlan is mapped to ethernet.Dot1Q.
+        :return: pypacker header class.
+        """
+        header = header.lower()
+        if header == 'vlan':
+            module_name, class_name = 'ethernet', 'Dot1Q'
+        else:
+            module_name, class_name = header, header.upper()
+        try:
+            return getattr(self._get_module(module_name), class_name)
+        except (KeyError, AttributeError):
+            raise ValueError('Unknown packet header {}, supported headers - {}'.format(header, self.get_names()))
+
+    def get_names(self):
+        """
+        :return: sorted list of all supported header names.
+        """
+        names = ['vlan']
+        for module_name in self._get_modules_names():
+            if hasattr(self._get_module(module_name), module_name.upper()):
+                names.append(module_name)
+        return sorted(names)
+
+    def _get_module(self, module_name):
+        if module_name not in self._modules:
+            self._modules[module_name] = import_module(self._get_modules_names()[module_name])
+        return self._modules[module_name]
+
+    def _get_modules_names(self):
+        if self._modules_names is None:
+            with self._lock:
+                if self._modules_names is None:
+                    pypacker = import_module('pypacker')
+                    modules_names = {}
+                    for layer in pkgutil.iter_modules(pypacker.__path__, 'pypacker.'):
+                        if layer.ispkg and layer.name.split('.')[-1].startswith('layer'):
+                            layer_path = [os.path.join(p, layer.name.split('.')[-1]) for p in pypacker.__path__]
+                            for module in pkgutil.iter_modules(layer_path, layer.name + '.'):
+                                modules_names[module.name.split('.')[-1]] = module.name
+                    self._modules_names = modules_names
+        return self._modules_names
+
+
+_packet_headers_registry = _PacketHeadersRegistry()
+
+_modifiers_commands = OrderedDict([('standard', ['ps_modifier', 'ps_modifierrange']),
+                                   ('extended', ['ps_modifierext', 'ps_modifierextrange'])])
+
+# Pipelined reply line - module/port command [index] value.
+reply_value_re = re.compile(r'^\s*\d+/\d+\s+\w+\s*(?:\[[^\]]*\])?\s*(.*?)\s*$')
+
+
+def _header_protocol(headers):
+    """ Get ps_headerprotocol value for packet headers (same as XenaStream.set_packet_headers). """
+    pypacker_2_xena = _xena('xena_stream').pypacker_2_xena
+    Ethernet = import_module('pypacker.layer12.ethernet').Ethernet
+    segments = []
+    body_handler = headers
+    while body_handler:
+        segment = pypacker_2_xena.get(str(body_handler).split('\n')[0].split('.')[-1].lower(), None)
+        if not segment:
+            break
+        segments.append(segment)
+        if type(body_handler) is Ethernet and body_handler.vlan:
+            segments.extend(['vlan'] * len(body_handler.vlan))
+        body_handler = body_handler.upper_layer
+    return ' '.join(segments)
+
+
+def _packet_layers(headers):
+    """ Iterate over packet layers.
+
+    :param headers: packet headers (Ethernet object).
+    :return: (name, header object) for each layer - ethernet, vlan[0]..vlan[n], ip, ip6, tcp etc.
+    """
+    yield 'ethernet', headers
+    for index, vlan in enumerate(headers.vlan or []):
+        yield 'vlan[{}]'.format(index), vlan
+    layer = headers.upper_layer
+    while layer is not None:
+        yield type(layer).__name__.lower(), layer
+        layer = layer.upper_layer
+
+
+def _header_fields(header_body):
+    """ Get header fields values directly from pypacker header object.
+
+    Fields are taken from the public __hdr__ definition of the header class. Sub headers lists (vlan, options) and
+    inactive fields are skipped.
+
+    :return: dictionary of <field: value>. MAC/IP addresses as strings, integers as decimal, bytes as hex.
+    """
+    fields = OrderedDict()
+    for field in (definition[0] for definition in type(header_body).__hdr__):
+        value = getattr(header_body, field)
+        if isinstance(value, bytes):
+            try:
+                fields[field] = getattr(header_body, field + '_s')
+            except (AttributeError, ValueError):
+                fields[field] = '0x' + binascii.hexlify(value).decode()
+        elif isinstance(value, int):
+            fields[field] = str(value)
+    return fields
+
+
+def _modifier_lines(sid, mid, modifier, extended=False):
+    """ Get configuration lines (without port index) to set modifier.
+
+    :param modifier: dictionary {position, mask, action, repeat, min_val, step, max_val}, only position is mandatory.
+    :return: modifier line and range line (unless action is random).
+    """
+    XenaModifierAction = _xena('xena_stream').XenaModifierAction
+    modifier_command, range_command = _modifiers_commands['extended' if extended else 'standard']
+    action = str(modifier.get('action', 'increment'))
+    action = XenaModifierAction[action.lower()] if action.lower() in XenaModifierAction.__members__ \
+        else XenaModifierAction(action.upper())
+    lines = ['{} [{},{}] {} {} {} {}'.format(modifier_command, sid, mid, modifier['position'],
+                                             modifier.get('mask', '0xFFFF0000'), action.value,
+                                             modifier.get('repeat', 1))]
+    if action != XenaModifierAction.random:
+        lines.append('{} [{},{}] {} {} {}'.format(range_command, sid, mid, modifier.get('min_val', 0),
+                                                  modifier.get('step', 1), modifier.get('max_val', 65535)))
+    return lines
+
+
+def _increment(value, step):
+    """ Increment integer, MAC address or IP address by step.
+
+    :param value: integer, MAC address (aa:bb:cc:dd:ee:ff) or IPv4/IPv6 address as string.
+    :param step: value to add.
+    :return: incremented value as string.
+    """
+    if not step:
+        return value
+    try:
+        return str(ipaddress.ip_address(value) + step)
+    except ValueError:
+        pass
+    if re.match(r'^([0-9a-fA-F]{2}[:-]){5}[0-9a-fA-F]{2}$', value):
+        mac = '{:012x}'.format((int(re.sub('[:-]', '', value), 16) + step) % (1 << 48))
+        return ':'.join(mac[i:i + 2] for i in range(0, 12, 2))
+    return str(int(value, 0) + step)
+
+
+def _xena(module_name):
+    """ Import xenavalkyrie module on first use.
+
+    xenavalkyrie modules pull in pypacker, requests and tshark support which dominate the library import time so they
+    are imported only when needed. xena_app is always imported first to resolve xenavalkyrie circular imports.
+
+    :param module_name: module name inside xenavalkyrie package.
+    """
+    import_module('xenavalkyrie.xena_app')
+    return import_module('xenavalkyrie.' + module_name)
+
+
+def _view_name_2_object(view):
+    views = _xena('xena_statistics_view')
+    return {'port': views.XenaPortsStats,
+            'stream': views.XenaStreamsStats,
+            'tpld': views.XenaTpldsStats}[view]
+
+
+def _view_name_2_captions(view):
+    xena_port = _xena('xena_port')
+    return {'port': xena_port.XenaPort.stats_captions,
+            'stream': {'pt_stream': _xena('xena_stream').XenaStream.stats_captions},
+            'tpld': xena_port.XenaTpld.stats_captions}[view]
@@ -0,0 +1,154 @@
+"""
+Background statistics sampler for Xena Robot Framework library.
+
+The sampler reads statistics views at fixed interval in a background thread and keeps the samples in a memory bounded
+ring buffer so tests can query aggregates (min/max/mean/percentile/rate) after or during traffic.
+"""
+
+import os
+import csv
+import math
+import json
+import time
+import threading
+from collections import deque, OrderedDict
+
+
+class XenaStatsSampler(object):
+    """ Collect statistics samples in background thread. """
+
+    def __init__(self, logger, readers, interval=1, size=3600, file_name=None):
+        """
+        :param logger: python logger
+        :param readers: dictionary {view name: method that returns view statistics}
+        :param interval: sampling interval in seconds.
+        :param size: maximum number of samples to keep (per view), older samples are dropped.
+        :param file_name: optional csv/jsonl file to stream all samples to.
+        """
+
+        self.logger = logger
+        self.readers = readers
+        self.interval = float(interval)
+        self.samples = {view: deque(maxlen=int(size)) for view in readers}
+        self.file_name = file_name
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """ Start background sampling. """
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='XenaStatsSampler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """ Stop background sampling and wait for the collector thread to finish.
+
+        :return: number of samples per view.
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        return {view: len(samples) for view, samples in self.samples.items()}
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_samples(self, view, name, counter):
+        """
+        :param view: port/stream/tpld.
+        :param name: port name or stream/TPLD index.
+        :param counter: counter full name - group and counter names joined with '_' (e.g. pt_total_packets).
+        :return: list of (timestamp, value) of all samples in buffer.
+        """
+        with self._lock:
+            samples = list(self.samples[view])
+        return [(timestamp, counters[name][counter]) for timestamp, counters in samples
+                if name in counters and counter in counters[name]]
+
+    def get_summary(self, view, name, counter, percentile=95, window=None):
+        """ Get aggregates over all samples in buffer.
+
+        :param view: port/stream/tpld.
+        :param name: port name or stream/TPLD index.
+        :param counter: counter full name (e.g. pt_total_packets).
+        :param percentile: requested percentile (0-100).
+        :param window: rate window in seconds, if None - rate over all samples in buffer.
+        :return: dictionary {samples, min, max, mean, percentile, rate}
+        """
+        samples = self.get_samples(view, name, counter)
+        if not samples:
+            raise ValueError('No samples for {} {} {}'.format(view, name, counter))
+        values = sorted(value for _, value in samples)
+        rank = max(0, min(len(values) - 1, int(math.ceil(float(percentile) / 100 * len(values))) - 1))
+        if window is not None:
+            samples = [s for s in samples if s[0] >= samples[-1][0] - float(window)]
+        duration = samples[-1][0] - samples[0][0]
+        return OrderedDict([('samples', len(values)),
+                            ('min', values[0]),
+                            ('max', values[-1]),
+                            ('mean', float(sum(values)) / len(values)),
+                            ('percentile', values[rank]),
+                            ('rate', (samples[-1][1] - samples[0][1]) / duration if duration else 0.0)])
+
+    #
+    # Private methods.
+    #
+
+    def _run(self):
+        out_file = open(self.file_name, 'w', newline='') if self.file_name else None
+        writer = None
+        if out_file and os.path.splitext(self.file_name)[1].lower() == '.csv':
+            writer = csv.writer(out_file)
+            writer.writerow(['timestamp', 'view', 'name', 'counter', 'value'])
+        try:
+            next_time = time.time()
+            while not self._stop_event.is_set():
+                for view, reader in self.readers.items():
+                    timestamp = time.time()
+                    try:
+                        counters = _flatten_stats(reader())
+                    except Exception as e:
+                        self.errors += 1
+                        self.logger.warning('Failed to sample %s statistics - %s', view, e)
+                        continue
+                    with self._lock:
+                        self.samples[view].append((timestamp, counters))
+                    if out_file:
+                        self._write_sample(out_file, writer, timestamp, view, counters)
+                next_time += self.interval
+                self._stop_event.wait(max(0, next_time - time.time()))
+        finally:
+            if out_file:
+                out_file.close()
+
+    @staticmethod
+    def _write_sample(out_file, writer, timestamp, view, counters):
+        if writer:
+            for name, name_counters in counters.items():
+                for counter, value in name_counters.items():
+                    writer.writerow([timestamp, view, name, counter, value])
+        else:
+            out_file.write(json.dumps({'timestamp': timestamp, 'view': view, 'counters': counters}) + '\n')
+        out_file.flush()
+
+
+def _flatten_stats(stats):
+    """ Convert statistics view output to {name: {full counter name: value}}.
+
+    :param stats: statistics as returned by readers - {object or name {group {... {stat name: value}}}}
+    """
+
+    def flatten(prefix, values, flat):
+        for key, value in values.items():
+            full_name = '{}_{}'.format(prefix, key) if prefix else str(key)
+            if isinstance(value, dict):
+                flatten(full_name, value, flat)
+            else:
+                flat[full_name] = value
+        return flat
+
+    return {str(obj): flatten('', obj_stats, OrderedDict()) for obj, obj_stats in stats.items()}